@@ -0,0 +1,627 @@
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from constants.csv_table_mapping import CSV_TABLE_MAPPING
+from utils.database.conn import DRIVER_MODULES
+from utils.database.schema import SEARCH_DATABASES
+from utils.helpers import get_config
+from utils.metrics import METRICS, get_peak_rss
+
+# Configuration
+config = get_config()
+BENCHMARK_PATH = config["paths"]["benchmark_path"]
+BASELINE_PATH = config["benchmark"]["baseline_path"]
+COMPANIES = config["benchmark"]["companies"]
+DATABASE = config["benchmark"]["database"]
+REPEATS = config["benchmark"]["repeats"]
+TOLERANCE = config["benchmark"]["tolerance"]
+SEED = config["synthetic"]["seed"]
+MONTH = "2000-01"  # month of the synthetic data, kept apart from the real months
+FIXTURES_PATH = os.path.join(BENCHMARK_PATH, "fixtures")
+RUN_PATH = os.path.join(BENCHMARK_PATH, "run")
+EMBEDDED_DATABASES = ["duckdb", "sqlite"]
+MIN_COMPARED_SECONDS = 0.05  # shorter durations are too noisy to be compared
+SEARCH_TERMS = 50  # name searches timed by the search benchmarks
+CNPJ_LOOKUPS = 100000  # CNPJs looked up at once by the cnpj_lookup benchmark
+
+# Imports main and the step modules, as a run does before any work, and reports the time,
+# the sockets connected and the database drivers imported
+STARTUP_CODE = """
+import json, socket, sys, time
+connections = []
+connect = socket.socket.connect
+def record_connect(sock, address):
+    connections.append(str(address))
+    return connect(sock, address)
+socket.socket.connect = record_connect
+start = time.perf_counter()
+import main
+import extract.extract_data, transform.transform_data, load.load_data
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "connections": connections,
+    "drivers": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def get_overrides() -> dict[str, dict]:
+    """
+    Returns the settings the benchmarks run with: every pipeline path under
+    `{paths.benchmark_path}/run/`, no transform cache, profiling or filter, a full load and,
+    for `benchmark.database: duckdb | sqlite`, a scratch database file.
+    """
+
+    paths = [
+        "delta_path",
+        "download_path",
+        "export_path",
+        "extract_path",
+        "index_path",
+        "manifest_path",
+        "metrics_path",
+        "profile_path",
+        "transform_cache_path",
+        "transformed_path",
+    ]
+    overrides = {
+        "paths": {
+            **{path: os.path.join(RUN_PATH, path.removesuffix("_path")) for path in paths},
+            "synthetic_path": os.path.join(BENCHMARK_PATH, "synthetic"),
+        },
+        "performance": {"transform_cache_size_mb": 0},
+        "settings": {
+            "ask_user": False,
+            "estabelecimentos_apta_only": False,
+            "load_mode": "full",
+            "profile": False,
+        },
+    }
+    if DATABASE in EMBEDDED_DATABASES:
+        overrides["database"] = {
+            "type": DATABASE,
+            "path": os.path.join(RUN_PATH, f"benchmark.{DATABASE}"),
+        }
+    return overrides
+
+
+def get_settings() -> dict:
+    """Returns the settings a result depends on, recorded with the baseline."""
+    return {
+        "companies": COMPANIES,
+        "seed": SEED,
+        "database": DATABASE,
+        "compression": config["performance"]["compression"],
+        "output_format": config["performance"]["output_format"],
+        "read_chunk_size": config["performance"]["read_chunk_size"],
+    }
+
+
+def copy_fixture_files(stage: str, target_dir: str, table_name: str | None = None) -> list[str]:
+    """
+    Copies the fixture files of a stage ("extract" or "cleaned"), or only the ones of a table,
+    to a pipeline directory.
+
+    Returns:
+        list[str]: The paths to the copies, sorted.
+    """
+
+    # Imported here so the benchmark settings are applied first
+    from transform.transform_data import get_table_name
+
+    source_dir = os.path.join(FIXTURES_PATH, stage, MONTH)
+    os.makedirs(target_dir, exist_ok=True)
+    return [
+        shutil.copy(os.path.join(source_dir, name), target_dir)
+        for name in sorted(os.listdir(source_dir))
+        if table_name is None or get_table_name(name) == table_name
+    ]
+
+
+def prepare_fixtures():
+    """
+    Generates the synthetic month (see `synthetic.generate_data`) and the extracted and
+    transformed files the stage benchmarks start from, in `{paths.benchmark_path}/fixtures/`.
+    They are kept while the settings are unchanged.
+    """
+
+    settings_path = os.path.join(FIXTURES_PATH, "settings.json")
+    if os.path.exists(settings_path):
+        with open(settings_path, "r") as file:
+            if json.load(file) == get_settings():
+                return
+
+    # Imported here so the benchmark settings are applied first
+    import extract.extract_data as extract
+    import transform.transform_data as transform
+    from synthetic.generate_data import generate_month
+
+    logging.info("Preparing the benchmark fixtures...")
+    shutil.rmtree(FIXTURES_PATH, ignore_errors=True)
+    shutil.rmtree(RUN_PATH, ignore_errors=True)
+
+    zip_files = generate_month(MONTH, COMPANIES, SEED)
+    download_dir = os.path.join(extract.DOWNLOAD_PATH, MONTH)
+    os.makedirs(download_dir, exist_ok=True)
+    extracted_files = extract.extract_zip_files(
+        [shutil.copy(zip_file, download_dir) for zip_file in zip_files], MONTH
+    )
+    shutil.copytree(
+        os.path.join(extract.EXTRACT_PATH, MONTH), os.path.join(FIXTURES_PATH, "extract", MONTH)
+    )
+
+    os.makedirs(os.path.join(transform.TRANSFORMED_PATH, MONTH), exist_ok=True)
+    for csv_file_path in extracted_files:
+        if transform.process_csv(csv_file_path) is None:
+            raise Exception(f"Failed to transform the fixture {csv_file_path}.")
+    shutil.copytree(
+        os.path.join(transform.TRANSFORMED_PATH, MONTH),
+        os.path.join(FIXTURES_PATH, "cleaned", MONTH),
+    )
+
+    shutil.rmtree(RUN_PATH)
+    with open(settings_path, "w") as file:
+        json.dump(get_settings(), file, indent=2)
+
+
+def benchmark_extract() -> dict:
+    """Times `extract_zip_files` on the synthetic month's ZIP files."""
+
+    import extract.extract_data as extract
+
+    synthetic_dir = os.path.join(config["paths"]["synthetic_path"], MONTH)
+    download_dir = os.path.join(extract.DOWNLOAD_PATH, MONTH)
+    os.makedirs(download_dir, exist_ok=True)
+    zip_files = [
+        shutil.copy(os.path.join(synthetic_dir, name), download_dir)
+        for name in sorted(os.listdir(synthetic_dir))
+        if name.endswith(".zip")
+    ]
+
+    start = time.perf_counter()
+    extract.extract_zip_files(zip_files, MONTH)
+    seconds = time.perf_counter() - start
+
+    totals = METRICS.get_report()["stages"]["extract"]["totals"]
+    return {"seconds": seconds, "rows": None, "bytes": totals["bytes"]}
+
+
+def benchmark_transform(table_name: str) -> dict:
+    """Times `process_csv` on the extracted files of a table."""
+
+    import transform.transform_data as transform
+
+    csv_files_paths = copy_fixture_files(
+        "extract", os.path.join(transform.EXTRACT_PATH, MONTH), table_name
+    )
+    os.makedirs(os.path.join(transform.TRANSFORMED_PATH, MONTH), exist_ok=True)
+
+    start = time.perf_counter()
+    for csv_file_path in csv_files_paths:
+        if transform.process_csv(csv_file_path) is None:
+            raise Exception(f"Failed to transform {csv_file_path}.")
+    seconds = time.perf_counter() - start
+
+    totals = METRICS.get_report()["stages"]["transform"]["totals"]
+    return {"seconds": seconds, "rows": totals["rows_read"], "bytes": totals["bytes"]}
+
+
+def benchmark_chunk(step: str) -> dict:
+    """
+    Times `clean_dataframe` or `enforce_dtypes` on a fixed chunk: the first
+    `performance.read_chunk_size` estabelecimento rows.
+    """
+
+    import pandas as pd
+    import transform.transform_data as transform
+    from constants.table_fields import TABLE_FIELDS
+
+    columns = list(TABLE_FIELDS["estabelecimento"])
+    chunks = []
+    for csv_file_path in copy_fixture_files(
+        "extract", os.path.join(transform.EXTRACT_PATH, MONTH), "estabelecimento"
+    ):
+        chunk = pd.read_csv(
+            csv_file_path,
+            encoding="latin-1",
+            sep=";",
+            dtype=str,
+            header=None,
+            on_bad_lines="skip",
+            nrows=transform.READ_CHUNK_SIZE,
+        )
+        chunks.append(chunk.iloc[:, : len(columns)].set_axis(columns, axis=1))
+    chunk = pd.concat(chunks, ignore_index=True).head(transform.READ_CHUNK_SIZE)
+
+    start = time.perf_counter()
+    if step == "clean_dataframe":
+        transform.clean_dataframe(chunk, "estabelecimento")
+    else:
+        transform.enforce_dtypes(chunk, TABLE_FIELDS["estabelecimento"])
+    seconds = time.perf_counter() - start
+
+    return {"seconds": seconds, "rows": len(chunk), "bytes": None}
+
+
+def benchmark_load() -> dict:
+    """
+    Times the bulk load of the transformed files into freshly created tables, without the keys
+    and indexes: `load_csv_to_db` on MySQL, `copy_csv_to_db` on PostgreSQL, and the DuckDB or
+    SQLite loaders on an embedded database.
+    """
+
+    import load.load_data as load
+
+    file_paths = copy_fixture_files("cleaned", os.path.join(load.TRANSFORMED_PATH, MONTH))
+    tables = [
+        (table, load.get_table_files(table, file_paths))
+        for table in load.TABLES_TO_LOAD.values()
+    ]
+
+    if load.DB_TYPE in EMBEDDED_DATABASES:
+        import load.load_embedded as embedded
+
+        conn = embedded.EMBEDDED_CONN.get_connection()
+        if load.DB_TYPE == "sqlite":
+            conn.execute("PRAGMA journal_mode = OFF;")
+            conn.execute("PRAGMA synchronous = OFF;")
+        embedded.create_tables(conn)
+        load_csv = (
+            embedded.load_csv_duckdb if load.DB_TYPE == "duckdb" else embedded.load_csv_sqlite
+        )
+
+        start = time.perf_counter()
+        rows = sum(load_csv(conn, files, table) for table, files in tables if files)
+        seconds = time.perf_counter() - start
+        embedded.EMBEDDED_CONN.close_connection()
+    elif load.DB_TYPE == "postgresql":
+        import load.load_postgres as postgres
+
+        postgres.reset_tables(postgres.PG_CONN.get_connection())
+
+        start = time.perf_counter()
+        rows = sum(
+            postgres.copy_csv_to_db(file_path, table)
+            for table, files in tables
+            for file_path in files
+        )
+        seconds = time.perf_counter() - start
+        postgres.PG_CONN.close_connection()
+    else:
+        load.drop_and_recreate_tables()
+
+        start = time.perf_counter()
+        rows = sum(load.load_csv_to_db(files, table) for table, files in tables if files)
+        seconds = time.perf_counter() - start
+        load.close_connections()
+
+    return {
+        "seconds": seconds,
+        "rows": rows,
+        "bytes": sum(os.path.getsize(file_path) for file_path in file_paths),
+    }
+
+
+def benchmark_search(indexed: bool) -> dict:
+    """
+    Times `SEARCH_TERMS` name searches (see `load.search_index.search_names`) on each search
+    column, after the bulk load of `benchmark_load`, with the search indexes (built before
+    the timing) or without them. The searched terms are pairs of the words the synthetic
+    names are made of, each matching a few rows. Its rows are the searches run.
+    """
+
+    import load.search_index as search_index
+    from synthetic.generate_data import WORDS
+
+    benchmark_load()
+    if indexed:
+        search_index.build_search_indexes()
+
+    terms = [
+        f"{WORDS[index % len(WORDS)]} {WORDS[index * 7 % len(WORDS)]}"
+        for index in range(SEARCH_TERMS)
+    ]
+    match search_index.DB_TYPE:
+        case "mysql":
+            conn = search_index.MYSQL_CONN.create_new_connection()
+        case "postgresql":
+            conn = search_index.PG_CONN.create_new_connection()
+        case _:
+            conn = search_index.EMBEDDED_CONN.get_connection()
+
+    searches = 0
+    start = time.perf_counter()
+    for table_name, column in search_index.get_search_columns():
+        for term in terms:
+            search_index.search_names(conn, table_name, column, term, indexed)
+            searches += 1
+    seconds = time.perf_counter() - start
+    conn.close()
+
+    return {"seconds": seconds, "rows": searches, "bytes": None}
+
+
+def benchmark_export() -> dict:
+    """Times `export_wide` on the transformed files (see `export.export_wide`)."""
+
+    import export.export_wide as export
+
+    file_paths = copy_fixture_files(
+        "cleaned", os.path.join(config["paths"]["transformed_path"], MONTH)
+    )
+
+    start = time.perf_counter()
+    export.export_wide(file_paths)
+    seconds = time.perf_counter() - start
+
+    totals = METRICS.get_report()["stages"]["export"]["totals"]
+    return {
+        "seconds": seconds,
+        "rows": totals["rows_written"],
+        "bytes": sum(os.path.getsize(file_path) for file_path in file_paths),
+    }
+
+
+def benchmark_cnpj_index(lookup: bool) -> dict:
+    """
+    Times the build of the CNPJ lookup index from the transformed files, or `CNPJ_LOOKUPS`
+    batched estabelecimento lookups on it, a tenth of them misses (see `lookup.cnpj_index`).
+    """
+
+    import lookup.cnpj_index as cnpj_index
+
+    file_paths = copy_fixture_files(
+        "cleaned", os.path.join(config["paths"]["transformed_path"], MONTH)
+    )
+
+    start = time.perf_counter()
+    index_dir = cnpj_index.build_cnpj_index(file_paths)
+    seconds = time.perf_counter() - start
+    if not lookup:
+        totals = METRICS.get_report()["stages"]["index"]["totals"]
+        return {
+            "seconds": seconds,
+            "rows": totals["rows_written"],
+            "bytes": sum(os.path.getsize(file_path) for file_path in file_paths),
+        }
+
+    index = cnpj_index.CnpjIndex("estabelecimento", index_dir)
+    keys = [str(key).zfill(index.key_width) for key in index.keys.tolist()]
+    cnpjs = [
+        keys[number * 7919 % len(keys)] if number % 10 else str(number).zfill(index.key_width)
+        for number in range(CNPJ_LOOKUPS)
+    ]
+
+    start = time.perf_counter()
+    index.get_many(cnpjs)
+    seconds = time.perf_counter() - start
+    index.close()
+
+    return {"seconds": seconds, "rows": CNPJ_LOOKUPS, "bytes": None}
+
+
+def run_case(case: str, overrides: dict[str, dict]) -> dict:
+    """
+    Runs a benchmark in a fresh process, from an empty `{paths.benchmark_path}/run/`.
+
+    Args:
+        case (str): The benchmark name (e.g. "extract", "transform_empresa").
+        overrides (dict[str, dict]): The benchmark settings (see `get_overrides`).
+    Returns:
+        dict: The duration in seconds, the rows and bytes processed (None if not counted) and
+              the peak RSS of the process, in bytes.
+    """
+
+    for section, values in overrides.items():
+        config[section].update(values)
+    shutil.rmtree(RUN_PATH, ignore_errors=True)
+    # The fixtures have malformed lines on purpose, their warnings are expected
+    logging.getLogger().setLevel(logging.ERROR)
+
+    if case == "extract":
+        result = benchmark_extract()
+    elif case.startswith("transform_"):
+        result = benchmark_transform(case.removeprefix("transform_"))
+    elif case in ["clean_dataframe", "enforce_dtypes"]:
+        result = benchmark_chunk(case)
+    elif case in ["search", "search_indexed"]:
+        result = benchmark_search(case == "search_indexed")
+    elif case == "export":
+        result = benchmark_export()
+    elif case in ["cnpj_index", "cnpj_lookup"]:
+        result = benchmark_cnpj_index(case == "cnpj_lookup")
+    else:
+        result = benchmark_load()
+
+    shutil.rmtree(RUN_PATH, ignore_errors=True)
+    return {**result, "peak_rss": get_peak_rss()}
+
+
+def run_startup() -> dict:
+    """
+    Times the import of main and the step modules in a new interpreter, with the configured
+    database, and records the sockets they connect and the database drivers they import.
+    Both must be empty: nothing is opened until a step needs it.
+    """
+
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_CODE % DRIVER_MODULES],
+        env={**os.environ, "PYTHONPATH": "src"},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return {**json.loads(output.splitlines()[-1]), "rows": None, "bytes": None, "peak_rss": None}
+
+
+def summarize(runs: list[dict]) -> dict:
+    """
+    Keeps the fastest of the runs of a benchmark, with the highest peak RSS of them all, and
+    derives its rates.
+    """
+
+    best = min(runs, key=lambda run: run["seconds"])
+    result = {"seconds": round(best["seconds"], 4)}
+    if best["rows"]:
+        result["rows_per_second"] = round(best["rows"] / best["seconds"], 1)
+    if best["bytes"]:
+        result["mb_per_second"] = round(best["bytes"] / (1024 * 1024) / best["seconds"], 2)
+    if best["peak_rss"]:
+        result["peak_rss_mb"] = round(max(run["peak_rss"] for run in runs) / (1024 * 1024), 1)
+    return result
+
+
+def compare(name: str, result: dict, baseline: dict) -> list[str]:
+    """
+    Compares a result with its baseline: it regresses when its duration or peak RSS grew by
+    more than `benchmark.tolerance`. Durations under `MIN_COMPARED_SECONDS` are not compared.
+
+    Returns:
+        list[str]: The regressions found.
+    """
+
+    regressions = []
+    for metric in ["seconds", "peak_rss_mb"]:
+        if metric not in result or metric not in baseline:
+            continue
+        if metric == "seconds" and baseline[metric] < MIN_COMPARED_SECONDS:
+            continue
+        change = result[metric] / baseline[metric] - 1
+        result[f"{metric}_change"] = round(change, 3)
+        if change > TOLERANCE:
+            regressions.append(
+                f"{name}: {metric} {result[metric]} is {change:.0%} over the baseline "
+                f"{baseline[metric]} (tolerance {TOLERANCE:.0%})."
+            )
+    return regressions
+
+
+def run_benchmarks(update_baseline: bool = False) -> bool:
+    """
+    Runs the benchmark suite on a synthetic month and compares it with the committed baseline.
+
+    The benchmarks are:
+    - "startup": importing main and the step modules, which must not connect to anything;
+    - "extract": `extract_zip_files` on every ZIP file of the month;
+    - "transform_{table}": `process_csv` on the extracted files of each table;
+    - "clean_dataframe" and "enforce_dtypes": one `performance.read_chunk_size` chunk;
+    - "load": the bulk load of every transformed file (see `benchmark_load`);
+    - "export": the wide estabelecimento export of the transformed files (see `benchmark_export`);
+    - "cnpj_index" and "cnpj_lookup": the build of the CNPJ lookup index and batched lookups
+      on it (see `benchmark_cnpj_index`);
+    - "search" and "search_indexed": name searches without and with the search indexes
+      (see `benchmark_search`), on the databases supporting them.
+
+    Each benchmark runs `benchmark.repeats` times in a fresh process, the fastest run is kept
+    and its rows/s, MB/s and peak RSS are reported. A result regresses when its duration or
+    peak RSS is over the baseline by more than `benchmark.tolerance`. The results are written
+    to `paths.benchmark_path`, and with `update_baseline` they replace the baseline. Baselines
+    only hold on the machine and settings they were recorded with, so they are not compared
+    when the settings differ.
+
+    Args:
+        update_baseline (bool): Whether to write the results as the new baseline.
+    Returns:
+        bool: Whether every benchmark passed.
+    """
+
+    overrides = get_overrides()
+    for section, values in overrides.items():
+        config[section].update(values)
+    prepare_fixtures()
+
+    cases = [
+        "extract",
+        *(f"transform_{table}" for table in CSV_TABLE_MAPPING.values()),
+        "clean_dataframe",
+        "enforce_dtypes",
+        "load",
+        "export",
+        "cnpj_index",
+        "cnpj_lookup",
+    ]
+    if DATABASE in SEARCH_DATABASES:
+        cases += ["search", "search_indexed"]
+
+    results = {}
+    startup_runs = [run_startup() for _ in range(REPEATS)]
+    results["startup"] = summarize(startup_runs)
+    failures = [
+        f"startup: {key} at import: {', '.join(run[key])}."
+        for run in startup_runs[:1]
+        for key in ["connections", "drivers"]
+        if run[key]
+    ]
+
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        logging.info(f"Benchmarking {case}...")
+        runs = []
+        for _ in range(REPEATS):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(run_case, case, overrides).result())
+        results[case] = summarize(runs)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "r") as file:
+            baseline = json.load(file)
+    if baseline.get("settings") == get_settings():
+        for name, result in results.items():
+            if name in baseline["results"]:
+                failures += compare(name, result, baseline["results"][name])
+    else:
+        logging.warning(
+            f"The baseline {BASELINE_PATH} was recorded with other settings, not comparing."
+        )
+
+    logging.info(
+        f"{'benchmark':<28}{'seconds':>10}{'rows/s':>12}{'MB/s':>10}{'peak MB':>10}{'change':>9}"
+    )
+    for name, result in results.items():
+        change = result.get("seconds_change")
+        logging.info(
+            f"{name:<28}{result['seconds']:>10.3f}{result.get('rows_per_second', ''):>12}"
+            f"{result.get('mb_per_second', ''):>10}{result.get('peak_rss_mb', ''):>10}"
+            f"{'' if change is None else f'{change:+.0%}':>9}"
+        )
+
+    report = {
+        "settings": get_settings(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    os.makedirs(BENCHMARK_PATH, exist_ok=True)
+    results_path = os.path.join(
+        BENCHMARK_PATH, f"results_{datetime.now().strftime('%Y-%m-%dT%H-%M-%S')}.json"
+    )
+    with open(results_path, "w") as file:
+        json.dump(report, file, indent=2)
+    logging.info(f"Benchmark results written to {results_path}.")
+
+    if update_baseline:
+        for result in results.values():
+            result.pop("seconds_change", None)
+            result.pop("peak_rss_mb_change", None)
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(report, file, indent=2)
+            file.write("\n")
+        logging.info(f"Baseline written to {BASELINE_PATH}.")
+
+    for failure in failures:
+        logging.error(failure)
+    return not failures
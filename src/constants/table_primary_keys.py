@@ -0,0 +1,5 @@
+from constants.table_schema import TABLE_SCHEMA
+
+TABLE_PRIMARY_KEYS = {
+    table: schema["primary_key"] for table, schema in TABLE_SCHEMA.items()
+}
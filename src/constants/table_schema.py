@@ -0,0 +1,269 @@
+# Single source of truth for the database schema. Every backend's DDL is generated from it
+# by `utils.database.schema`, and `TABLE_FIELDS`/`TABLE_PRIMARY_KEYS` are derived from it.
+#
+# Column types are backend-neutral:
+# - "char(n)": fixed-width code (e.g. CNPJ parts, lookup codes).
+# - "varchar(n)": variable-width text with a known maximum length.
+# - "text": free text.
+# - "date": a date, written as YYYYMMDD by the transform.
+# - "decimal(p,s)": a fixed-point number.
+# - "integer": a 64-bit integer (e.g. a row count).
+#
+# Columns are listed in the order of the RFB files. Generated columns are computed by the
+# database from other columns and are not present in the files.
+#
+# Exploded tables are not in the RFB files either: the transform builds them from a
+# comma-separated list column of another table, one row per list value, with the other
+# columns copied from the source row.
+#
+# Summary tables are not in the RFB files either: the transform counts the rows of another
+# table by the groups of the summary table, chunk by chunk, and the counts of the month are
+# merged before the load (see `transform.transform_data.count_groups`). A group column is
+# copied from a source column, or cut to its first characters when a length is given.
+#
+# Search columns are the name columns indexed for text search by the optional post-load
+# stage (see `load.search_index`).
+
+COLUMN_DTYPES = {
+    "char": "str",
+    "varchar": "str",
+    "text": "str",
+    "date": "date",
+    "decimal": "float",
+    "integer": "int",
+}
+
+ID_TABLES = [
+    "id_matriz_filial",
+    "id_porte_empresa",
+    "id_situacao_cadastral",
+    "id_socio",
+    "id_faixa_etaria",
+]
+
+# Main tables holding the RFB records of each company. Their codes reference the lookup and
+# id tables, so they are loaded after them when files are loaded one by one.
+FACT_TABLES = [
+    "empresa",
+    "estabelecimento",
+    "estabelecimento_cnae_secundario",
+    "simples",
+    "socio",
+]
+
+# Tables kept for every reference month (`ref_month`) in the "historical" load mode.
+HISTORICAL_TABLES = FACT_TABLES
+
+TABLE_SCHEMA = {
+    # Lookup Tables
+    "pais": {
+        "columns": {"codigo": "char(3)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "municipio": {
+        "columns": {"codigo": "char(4)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "qualificacao_socio": {
+        "columns": {"codigo": "char(2)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "natureza_juridica": {
+        "columns": {"codigo": "char(4)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "cnae": {
+        "columns": {"codigo": "char(7)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "motivo": {
+        "columns": {"codigo": "char(2)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    # Id Tables (filled by default_insert.sql)
+    "id_matriz_filial": {
+        "columns": {"codigo": "char(1)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "id_porte_empresa": {
+        "columns": {"codigo": "char(2)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "id_situacao_cadastral": {
+        "columns": {"codigo": "char(2)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "id_socio": {
+        "columns": {"codigo": "char(1)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    "id_faixa_etaria": {
+        "columns": {"codigo": "char(1)", "descricao": "text"},
+        "primary_key": ["codigo"],
+    },
+    # Main Tables
+    "empresa": {
+        "columns": {
+            "cnpj_basico": "char(8)",
+            "razao_social": "text",
+            "cod_natureza_juridica": "char(4)",
+            "cod_qualificacao_do_responsavel": "char(2)",
+            "capital_social": "decimal(15,2)",
+            "cod_porte": "char(2)",
+            "ente_federativo_responsavel": "text",
+        },
+        "primary_key": ["cnpj_basico"],
+        "indexes": [
+            ["cod_natureza_juridica"],
+            ["cod_qualificacao_do_responsavel"],
+            ["cod_porte"],
+        ],
+        "search": ["razao_social"],
+    },
+    "estabelecimento": {
+        "columns": {
+            "cnpj_basico": "char(8)",
+            "cnpj_ordem": "char(4)",
+            "cnpj_dv": "char(2)",
+            "cod_id_matriz_filial": "char(1)",
+            "nome_fantasia": "text",
+            "cod_situacao_cadastral": "char(2)",
+            "data_situacao_cadastral": "date",
+            "cod_motivo_situacao_cadastral": "char(2)",
+            "nome_cidade_exterior": "text",
+            "cod_pais": "char(3)",
+            "data_inicio_atividade": "date",
+            "cod_cnae_fiscal": "char(7)",
+            "cod_cnae_fiscal_secundario": "text",
+            "tipo_logradouro": "text",
+            "logradouro": "text",
+            "numero": "text",
+            "complemento": "text",
+            "bairro": "text",
+            "cep": "char(8)",
+            "uf": "char(2)",
+            "cod_municipio": "char(4)",
+            "ddd_1": "char(2)",
+            "telefone_1": "varchar(10)",
+            "ddd_2": "char(2)",
+            "telefone_2": "varchar(10)",
+            "ddd_fax": "char(2)",
+            "telefone_fax": "varchar(10)",
+            "correio_eletronico": "text",
+            "situacao_especial": "text",
+            "data_situacao_especial": "date",
+        },
+        "generated": {
+            "cnpj_completo": ("char(14)", ["cnpj_basico", "cnpj_ordem", "cnpj_dv"]),
+        },
+        "primary_key": ["cnpj_basico", "cnpj_ordem", "cnpj_dv", "uf"],
+        "indexes": [
+            ["uf"],
+            ["cod_municipio"],
+            ["cod_cnae_fiscal"],
+            ["cod_pais"],
+            ["cod_id_matriz_filial"],
+            ["cod_situacao_cadastral"],
+            ["cod_motivo_situacao_cadastral"],
+            ["cnpj_completo"],
+        ],
+        "search": ["nome_fantasia"],
+        # MySQL only, replaced by the month partitions in "historical" mode
+        "partition": {
+            "column": "uf",
+            "values": {
+                "p_norte": ["AC", "AP", "AM", "PA", "RO", "RR", "TO"],
+                "p_nordeste": ["AL", "BA", "CE", "MA", "PB", "PE", "PI", "RN", "SE"],
+                "p_centro_oeste": ["DF", "GO", "MT", "MS"],
+                "p_sudeste": ["ES", "MG", "RJ", "SP"],
+                "p_sul": ["PR", "RS", "SC"],
+                "p_exterior": ["EX"],
+            },
+        },
+    },
+    "estabelecimento_cnae_secundario": {
+        "columns": {
+            "cnpj_basico": "char(8)",
+            "cnpj_ordem": "char(4)",
+            "cnpj_dv": "char(2)",
+            "cod_cnae": "char(7)",
+        },
+        "explode": {
+            "table": "estabelecimento",
+            "column": "cod_cnae_fiscal_secundario",
+            "into": "cod_cnae",
+        },
+        "primary_key": ["cnpj_basico", "cnpj_ordem", "cnpj_dv", "cod_cnae"],
+        "indexes": [["cod_cnae"]],
+    },
+    "resumo_estabelecimento": {
+        "columns": {
+            "uf": "char(2)",
+            "cod_municipio": "char(4)",
+            "cod_cnae_fiscal": "char(7)",
+            "cod_situacao_cadastral": "char(2)",
+            "quantidade": "integer",
+        },
+        "aggregate": {
+            "table": "estabelecimento",
+            "group_by": {
+                "uf": ("uf", None),
+                "cod_municipio": ("cod_municipio", None),
+                "cod_cnae_fiscal": ("cod_cnae_fiscal", None),
+                "cod_situacao_cadastral": ("cod_situacao_cadastral", None),
+            },
+        },
+        "primary_key": ["uf", "cod_municipio", "cod_cnae_fiscal", "cod_situacao_cadastral"],
+        "indexes": [["cod_municipio"], ["cod_cnae_fiscal"], ["cod_situacao_cadastral"]],
+    },
+    "resumo_abertura_estabelecimento": {
+        "columns": {
+            "mes_inicio_atividade": "char(6)",
+            "uf": "char(2)",
+            "quantidade": "integer",
+        },
+        "aggregate": {
+            "table": "estabelecimento",
+            "group_by": {
+                "mes_inicio_atividade": ("data_inicio_atividade", 6),
+                "uf": ("uf", None),
+            },
+        },
+        "primary_key": ["mes_inicio_atividade", "uf"],
+        "indexes": [["uf"]],
+    },
+    "simples": {
+        "columns": {
+            "cnpj_basico": "char(8)",
+            "opcao_pelo_simples": "char(1)",
+            "data_opcao_pelo_simples": "date",
+            "data_exclusao_pelo_simples": "date",
+            "opcao_pelo_mei": "char(1)",
+            "data_opcao_pelo_mei": "date",
+            "data_exclusao_pelo_mei": "date",
+        },
+        "primary_key": ["cnpj_basico"],
+    },
+    "socio": {
+        "columns": {
+            "cnpj_basico": "char(8)",
+            "cod_id_socio": "char(1)",
+            "razao_social": "text",
+            "cnpj_cpf_socio": "varchar(14)",
+            "cod_qualificacao_socio": "char(2)",
+            "data_entrada_sociedade": "date",
+            "cod_pais_socio_estrangeiro": "char(3)",
+            "numero_cpf_representante_legal": "char(11)",
+            "nome_representante_legal": "text",
+            "cod_qualificacao_representante_legal": "char(2)",
+            "cod_faixa_etaria": "char(1)",
+        },
+        "primary_key": ["cnpj_basico", "cod_id_socio", "cnpj_cpf_socio"],
+        "indexes": [
+            ["cod_pais_socio_estrangeiro"],
+            ["cod_qualificacao_socio"],
+            ["cod_id_socio"],
+            ["cod_faixa_etaria"],
+        ],
+    },
+}
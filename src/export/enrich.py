@@ -0,0 +1,427 @@
+import csv
+import heapq
+import itertools
+import json
+import logging
+import os
+import shutil
+
+import pandas as pd
+
+from constants.table_fields import TABLE_FIELDS
+from export.export_wide import EXPORT_FORMAT, EXPORT_PATH, NULL, open_export_writer
+from load.load_data import get_latest_transformed_data, get_separated_files
+from lookup.cnpj_index import INDEXED_TABLES, get_key_width
+from utils.external_sort import (
+    KEY_SEPARATOR,
+    merge_sorted_runs,
+    unique_by_key,
+    write_sorted_runs,
+)
+from utils.helpers import COMPRESSION_SUFFIXES, get_config, get_partial_path
+from utils.metrics import METRICS
+import utils.profiling as profiling
+
+# Configuration
+config = get_config()
+SORTED_PATH = config["paths"]["sorted_path"]
+CNPJ_COLUMN = config["enrich"]["cnpj_column"]
+COLUMNS = config["enrich"]["columns"]
+SEPARATOR = config["enrich"]["separator"]
+READ_CHUNK_SIZE = config["performance"]["read_chunk_size"]
+SORT_CHUNK_SIZE = config["performance"]["sort_chunk_size"]
+COMPRESSION = config["performance"]["compression"]
+KEY = "key"
+CNPJ_WIDTH = get_key_width("estabelecimento")
+
+
+def get_enrich_columns() -> dict[str, dict[str, str]]:
+    """
+    Returns the `enrich.columns` ("table.column") by table.
+
+    Raises:
+        ValueError: If a column is not a column of estabelecimento, empresa or simples.
+    """
+
+    columns = {}
+    for name in COLUMNS:
+        table_name, _, column = name.partition(".")
+        if table_name not in INDEXED_TABLES or column not in TABLE_FIELDS[table_name]:
+            raise ValueError(
+                f"Unknown enrichment column {name}, expected estabelecimento, empresa or "
+                "simples columns as 'table.column'."
+            )
+        columns.setdefault(table_name, {})[column] = TABLE_FIELDS[table_name][column]
+    return columns
+
+
+def build_sorted_table(file_paths: list[str], table_name: str, sorted_file: str) -> int:
+    """
+    Writes a copy of a table sorted by its key: the digits of its key columns (e.g. the full
+    CNPJ for estabelecimento, see `lookup.cnpj_index.INDEXED_TABLES`).
+
+    The transformed files are sorted with the external merge sort of `utils.external_sort`, in
+    runs of `performance.sort_chunk_size` rows. The copy is a ";"-separated CSV file with a
+    header, the key first, then the values unescaped with `\\N` for NULL. Rows with a key that
+    is not made of digits are skipped, and the first row of a repeated key is kept, as in the
+    load.
+
+    Args:
+        file_paths (list[str]): The transformed files of the table.
+        table_name (str): The name of the table.
+        sorted_file (str): The path to the sorted copy.
+    Returns:
+        int: The number of rows written.
+    """
+
+    key_width = get_key_width(table_name)
+    run_dir = f"{get_partial_path(sorted_file)}_runs"
+    rows = 0
+    try:
+        run_paths = write_sorted_runs(
+            file_paths, INDEXED_TABLES[table_name], run_dir, SORT_CHUNK_SIZE
+        )
+        with open(sorted_file, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file, delimiter=";")
+            writer.writerow([KEY, *TABLE_FIELDS[table_name]])
+            for row in unique_by_key(merge_sorted_runs(run_paths)):
+                key = row[0].replace(KEY_SEPARATOR, "")
+                if len(key) == key_width and key.isdigit():
+                    writer.writerow([key, *row[2:]])
+                    rows += 1
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return rows
+
+
+def get_source_signature(file_paths: list[str]) -> list[dict]:
+    """
+    Returns the inode, size and modification time of each transformed file a sorted copy is
+    built from.
+
+    The modification time alone does not tell a file was replaced: transform cache hits
+    hard-link older entries into the month (see `transform.transform_cache`), keeping their
+    modification time.
+    """
+
+    signature = []
+    for file_path in sorted(file_paths):
+        stat = os.stat(file_path)
+        signature.append(
+            {
+                "file": os.path.basename(file_path),
+                "inode": stat.st_ino,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+        )
+    return signature
+
+
+def get_sorted_tables(transformed_data: list[str], tables: list[str]) -> dict[str, str]:
+    """
+    Returns the sorted copies of tables at `paths.sorted_path/{month}/{table}.csv`, building
+    the ones that are missing or were built from other transformed files (see
+    `build_sorted_table`). The signature of the files a copy was built from (see
+    `get_source_signature`) is kept next to it, in `{table}.json`.
+
+    Raises:
+        FileNotFoundError: If there are no transformed files of a table.
+    """
+
+    month = os.path.basename(os.path.dirname(transformed_data[0]))
+    sorted_dir = os.path.join(SORTED_PATH, month)
+    os.makedirs(sorted_dir, exist_ok=True)
+
+    sorted_files = {}
+    for table_name in tables:
+        file_paths = get_separated_files(table_name, transformed_data)
+        if not file_paths:
+            raise FileNotFoundError(f"No transformed {table_name} files found for {month}.")
+
+        sorted_file = os.path.join(sorted_dir, f"{table_name}.csv")
+        signature_file = os.path.join(sorted_dir, f"{table_name}.json")
+        signature = get_source_signature(file_paths)
+        built_signature = None
+        if os.path.exists(sorted_file) and os.path.exists(signature_file):
+            with open(signature_file, "r") as file:
+                built_signature = json.load(file)
+
+        if built_signature != signature:
+            logging.info(f"{table_name.upper()} - Sorting the transformed files...")
+            partial_file = get_partial_path(sorted_file)
+            try:
+                with METRICS.timer("enrich", f"sort_{table_name}"):
+                    rows = build_sorted_table(file_paths, table_name, partial_file)
+            except Exception:
+                if os.path.exists(partial_file):
+                    os.remove(partial_file)
+                raise
+            os.replace(partial_file, sorted_file)
+            with open(get_partial_path(signature_file), "w") as file:
+                json.dump(signature, file)
+            os.replace(get_partial_path(signature_file), signature_file)
+            logging.info(f"{table_name.upper()} - Wrote {rows} sorted rows to {sorted_file}.")
+        sorted_files[table_name] = sorted_file
+    return sorted_files
+
+
+def write_input_runs(input_file: str, run_dir: str) -> tuple[list[str], list[str]]:
+    """
+    Splits the input file into runs sorted by CNPJ, of `performance.sort_chunk_size` rows.
+
+    Each row is prefixed with the digits of its `enrich.cnpj_column`, or an empty key if they
+    are not 14 digits, so invalid CNPJs sort first and never match.
+
+    Args:
+        input_file (str): The `enrich.separator`-separated input file, with a header.
+        run_dir (str): The directory the run files are written to.
+    Returns:
+        tuple[list[str], list[str]]: The paths to the run files and the input columns.
+    Raises:
+        ValueError: If the input file has no `enrich.cnpj_column` column.
+    """
+
+    os.makedirs(run_dir, exist_ok=True)
+    run_paths, columns = [], []
+    for chunk in pd.read_csv(
+        input_file,
+        sep=SEPARATOR,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8",
+        chunksize=SORT_CHUNK_SIZE,
+    ):
+        columns = list(chunk.columns)
+        if CNPJ_COLUMN not in columns:
+            raise ValueError(f"{input_file} has no {CNPJ_COLUMN} column (enrich.cnpj_column).")
+        digits = chunk[CNPJ_COLUMN].str.replace(r"\D", "", regex=True)
+        chunk.insert(0, KEY, digits.where(digits.str.len() == CNPJ_WIDTH, ""))
+        chunk.sort_values(KEY, kind="mergesort", inplace=True)
+
+        run_path = os.path.join(run_dir, f"run_{len(run_paths)}.csv")
+        chunk.to_csv(run_path, index=False, header=False, sep=";", encoding="utf-8")
+        run_paths.append(run_path)
+    return run_paths, columns
+
+
+def read_sorted_input(run_paths: list[str], columns: list[str]):
+    """
+    Yields the input rows ordered by CNPJ, in chunks of `performance.read_chunk_size` rows, by
+    merging the runs written by `write_input_runs`.
+    """
+
+    names = [KEY, *columns]
+    if len(run_paths) == 1:
+        # Already sorted, so it is read without the row by row merge
+        yield from pd.read_csv(
+            run_paths[0],
+            sep=";",
+            names=names,
+            dtype=str,
+            keep_default_na=False,
+            encoding="utf-8",
+            chunksize=READ_CHUNK_SIZE,
+        )
+        return
+
+    files = [open(path, "r", encoding="utf-8", newline="") for path in run_paths]
+    try:
+        rows = heapq.merge(
+            *(csv.reader(file, delimiter=";") for file in files), key=lambda row: row[0]
+        )
+        while chunk := list(itertools.islice(rows, READ_CHUNK_SIZE)):
+            yield pd.DataFrame(chunk, columns=names, dtype=str)
+    finally:
+        for file in files:
+            file.close()
+
+
+class SortedTableReader:
+    """
+    Streams the sorted copy of a table (see `build_sorted_table`) through a merge-join with
+    sorted keys.
+
+    Only the key and the requested columns are read, in chunks of `performance.read_chunk_size`
+    rows, and only the rows of the requested keys are kept, so memory stays bounded by the
+    chunk sizes whatever the sizes of the table and input.
+
+    Attributes:
+      key_width (int): The number of digits of the table keys (a prefix of the CNPJ).
+      columns (list[str]): The requested columns.
+      chunks (Iterator[pd.DataFrame]): The remaining chunks of the sorted copy.
+      pending (pd.DataFrame | None): The rows read from the highest key of the last join on,
+                                     since the next join can ask for that key again.
+    """
+
+    def __init__(self, sorted_file: str, table_name: str, columns: list[str]):
+        self.key_width = get_key_width(table_name)
+        self.columns = columns
+        self.chunks = pd.read_csv(
+            sorted_file,
+            sep=";",
+            usecols=[KEY, *columns],
+            dtype=str,
+            keep_default_na=False,
+            encoding="utf-8",
+            chunksize=READ_CHUNK_SIZE,
+        )
+        self.pending = None
+
+    def join(self, cnpjs: pd.Series) -> pd.DataFrame:
+        """
+        Returns the rows of the next sorted CNPJs, aligned with them (NaN where not found).
+
+        Args:
+            cnpjs (pd.Series): CNPJs in ascending order, not lower than the ones of the previous
+                               join (empty for invalid CNPJs).
+        Returns:
+            pd.DataFrame: The requested columns, one row per CNPJ.
+        """
+
+        keys = cnpjs.str[: self.key_width]
+        highest = keys.iloc[-1]
+        wanted = pd.Index(keys.unique())
+
+        matched, kept = [], []
+        while True:
+            chunk = self.pending if self.pending is not None else next(self.chunks, None)
+            if chunk is None:
+                break
+            self.pending = None
+            start = int(chunk[KEY].searchsorted(highest, side="left"))
+            end = int(chunk[KEY].searchsorted(highest, side="right"))
+            head = chunk.iloc[:end]
+            matched.append(head[head[KEY].isin(wanted)])
+            # The rows of the highest key are kept for the next join, which can start with
+            # the same key (e.g. another establishment of the same company)
+            kept.append(chunk.iloc[start:])
+            if end < len(chunk):
+                break
+
+        kept = [rows for rows in kept if len(rows)]
+        if kept:
+            self.pending = pd.concat(kept) if len(kept) > 1 else kept[0]
+
+        rows = (
+            pd.concat(matched)
+            if matched
+            else pd.DataFrame(columns=[KEY, *self.columns], dtype=str)
+        )
+        return rows.set_index(KEY).reindex(keys).reset_index(drop=True)
+
+
+def get_enriched_file_path(input_file: str, month: str) -> str:
+    """Returns the path of the enriched copy of an input file, in `export.format`."""
+    name = os.path.splitext(os.path.basename(input_file))[0]
+    if EXPORT_FORMAT == "parquet":
+        return os.path.join(EXPORT_PATH, f"{name}_enriched_{month}.parquet")
+    return os.path.join(
+        EXPORT_PATH, f"{name}_enriched_{month}.csv{COMPRESSION_SUFFIXES[COMPRESSION]}"
+    )
+
+
+def enrich_file(input_file: str, transformed_data: list[str] = []) -> dict:
+    """
+    Adds the `enrich.columns` of the CNPJs of a file, from the transformed files of a month,
+    without going through the database.
+
+    The enrichment is a sorted merge-join with bounded memory:
+    1. estabelecimento, empresa and simples are copied sorted by key to `paths.sorted_path`,
+       once per month (see `get_sorted_tables`).
+    2. The input rows are sorted by the digits of their `enrich.cnpj_column` with an external
+       merge sort (see `write_input_runs`).
+    3. The sorted input is streamed in chunks through each sorted table (see
+       `SortedTableReader`): the full CNPJ is joined with estabelecimento and its
+       `cnpj_basico` with empresa and simples.
+    The input columns are written, followed by the requested columns (named `table_column` if
+    their name is taken), in CNPJ order, to `paths.export_path` in `export.format` (csv or
+    parquet). Input CNPJs that are not 14 digits are kept, with no columns added.
+
+    Args:
+        input_file (str): The `enrich.separator`-separated input file, with a header.
+        transformed_data (list[str], optional): Paths to the transformed files. Defaults to the
+                                                files of the latest (or user-selected) month.
+    Returns:
+        dict: The enriched file, the rows, the invalid CNPJs and the matches and misses of
+              each table.
+    Raises:
+        ValueError: If a requested column or the CNPJ column is unknown.
+        FileNotFoundError: If there are no transformed files of a joined table.
+    """
+
+    columns = get_enrich_columns()
+    transformed_data = transformed_data or get_latest_transformed_data()
+    month = os.path.basename(os.path.dirname(transformed_data[0]))
+    METRICS.set_month(month)
+    sorted_files = get_sorted_tables(transformed_data, list(columns))
+
+    enriched_file = get_enriched_file_path(input_file, month)
+    os.makedirs(EXPORT_PATH, exist_ok=True)
+    run_dir = f"{get_partial_path(enriched_file)}_runs"
+    stats = {"rows": 0, "invalid": 0, **{f"{table}_matches": 0 for table in columns}}
+    try:
+        logging.info(f"Sorting {input_file}...")
+        with METRICS.timer("enrich", "sort_input"):
+            run_paths, input_columns = write_input_runs(input_file, run_dir)
+
+        fields = {column: "str" for column in input_columns}
+        names = {}
+        for table_name, table_columns in columns.items():
+            for column, dtype in table_columns.items():
+                name = column if column not in fields else f"{table_name}_{column}"
+                names[(table_name, column)] = name
+                fields[name] = dtype
+        readers = {
+            table_name: SortedTableReader(sorted_files[table_name], table_name, list(table_columns))
+            for table_name, table_columns in columns.items()
+        }
+
+        logging.info(f"Enriching {input_file} into {enriched_file}...")
+        with METRICS.timer("enrich", "join"), profiling.profile_unit(
+            "enrich", os.path.basename(input_file)
+        ), open_export_writer(get_partial_path(enriched_file), fields) as write:
+            for number, chunk in enumerate(read_sorted_input(run_paths, input_columns)):
+                profiling.sample_chunk(number)
+                chunk = chunk.reset_index(drop=True)
+                valid = chunk[KEY] != ""
+                stats["rows"] += len(chunk)
+                stats["invalid"] += int((~valid).sum())
+
+                for table_name, reader in readers.items():
+                    with profiling.section(f"join_{table_name}"):
+                        rows = reader.join(chunk[KEY])
+                    found = rows.notna().any(axis=1) & valid
+                    stats[f"{table_name}_matches"] += int(found.sum())
+                    for column, dtype in columns[table_name].items():
+                        values = rows[column].mask(rows[column] == NULL)
+                        if dtype == "date":
+                            values = pd.to_datetime(values, format="%Y%m%d", errors="coerce")
+                        elif dtype in ["float", "int"]:
+                            values = pd.to_numeric(values, errors="coerce")
+                        chunk[names[(table_name, column)]] = values
+                with profiling.section("write"):
+                    write(chunk[list(fields)])
+        os.replace(get_partial_path(enriched_file), enriched_file)
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        if os.path.exists(get_partial_path(enriched_file)):
+            os.remove(get_partial_path(enriched_file))
+
+    valid_rows = stats["rows"] - stats["invalid"]
+    for table_name in columns:
+        stats[f"{table_name}_misses"] = valid_rows - stats[f"{table_name}_matches"]
+    file_name = os.path.basename(enriched_file)
+    for name, value in stats.items():
+        METRICS.add("enrich", name, value, file_name)
+    logging.info(
+        f"Enriched {stats['rows']} rows ({stats['invalid']} invalid CNPJs) into "
+        f"{enriched_file}: "
+        + ", ".join(
+            f"{table_name} {stats[f'{table_name}_matches']} matches / "
+            f"{stats[f'{table_name}_misses']} misses"
+            for table_name in columns
+        )
+        + "."
+    )
+    return {"file": enriched_file, **stats}
@@ -0,0 +1,352 @@
+import contextlib
+import csv
+import logging
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from constants.table_fields import TABLE_FIELDS
+from constants.table_schema import TABLE_SCHEMA
+from load.load_data import get_latest_transformed_data, get_separated_files
+from utils.helpers import (
+    COMPRESSION_SUFFIXES,
+    get_config,
+    get_file_format,
+    get_partial_path,
+    open_compressed,
+    unescape_tsv_value,
+)
+from utils.metrics import METRICS
+import utils.profiling as profiling
+
+# Configuration
+config = get_config()
+EXPORT_PATH = config["paths"]["export_path"]
+EXPORT_FORMAT = config["export"]["format"]
+PARTITIONS = config["export"]["partitions"]
+READ_CHUNK_SIZE = config["performance"]["read_chunk_size"]
+COMPRESSION = config["performance"]["compression"]
+COMPRESSION_LEVEL = config["performance"]["compression_level"]
+NULL = r"\N"
+JOIN_KEY = "cnpj_basico"
+# Tables joined to each estabelecimento row by JOIN_KEY, in output order
+JOINED_TABLES = ["empresa", "simples"]
+# Lookup descriptions added to each row: (code column, lookup table, description column)
+LOOKUP_COLUMNS = [
+    ("cod_natureza_juridica", "natureza_juridica", "natureza_juridica"),
+    ("cod_qualificacao_do_responsavel", "qualificacao_socio", "qualificacao_do_responsavel"),
+    ("cod_motivo_situacao_cadastral", "motivo", "motivo_situacao_cadastral"),
+    ("cod_pais", "pais", "pais"),
+    ("cod_cnae_fiscal", "cnae", "cnae_fiscal"),
+    ("cod_municipio", "municipio", "municipio"),
+]
+
+
+class LookupTable:
+    """
+    A lookup table held as dictionary-encoded arrays: its codes, and for each code the
+    position of its description among the distinct descriptions.
+
+    Attributes:
+      codes (pd.Index): The codes, in file order (the first row of a repeated code is kept).
+      descriptions (pd.Index): The distinct descriptions.
+      positions (np.ndarray): The position of each code's description, followed by -1 for
+                              codes that are not found (or have no description).
+    """
+
+    def __init__(self, file_paths: list[str]):
+        df = pd.concat(
+            [read_transformed_file(file_path) for file_path in file_paths]
+            or [pd.DataFrame(columns=["codigo", "descricao"], dtype=str)],
+            ignore_index=True,
+        ).drop_duplicates("codigo")
+        positions, self.descriptions = pd.factorize(
+            df["descricao"].replace(NULL, None), use_na_sentinel=True
+        )
+        self.codes = pd.Index(df["codigo"])
+        self.positions = np.append(positions, -1)
+
+    def decode(self, codes: pd.Series) -> pd.Categorical:
+        """Returns the descriptions of the codes, dictionary-encoded (NaN if not found)."""
+        return pd.Categorical.from_codes(
+            self.positions[self.codes.get_indexer(codes)], categories=self.descriptions
+        )
+
+
+def read_transformed_file(file_path: str, chunk_size: int | None = None):
+    """
+    Reads a transformed file as strings, NULLs kept as `\\N`, all at once or in chunks.
+
+    TSV values are unescaped, so both output formats give the same values.
+
+    Args:
+        file_path (str): The path to the transformed file.
+        chunk_size (int | None): The rows per chunk, or None to read the whole file.
+    Returns:
+        pd.DataFrame | Iterator[pd.DataFrame]: The file, or an iterator over its chunks.
+    """
+
+    is_tsv = get_file_format(file_path) == "tsv"
+    reader = pd.read_csv(
+        file_path,
+        sep="\t" if is_tsv else ";",
+        quoting=csv.QUOTE_NONE if is_tsv else csv.QUOTE_MINIMAL,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8",
+        chunksize=chunk_size,
+    )
+    if not is_tsv:
+        return reader
+    if chunk_size is None:
+        return reader.map(unescape_tsv_value)
+    return (chunk.map(unescape_tsv_value) for chunk in reader)
+
+
+def read_partition(file_path: str, table_name: str, chunk_size: int | None = None):
+    """Reads a partition file written by `partition_table` (see `read_transformed_file`)."""
+    return pd.read_csv(
+        file_path,
+        sep=";",
+        names=list(TABLE_FIELDS[table_name]),
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8",
+        chunksize=chunk_size,
+    )
+
+
+def partition_table(file_paths: list[str], table_name: str, partitions_dir: str) -> list[str]:
+    """
+    Splits the transformed files of a table into `export.partitions` files by a hash of
+    `cnpj_basico`, so the rows of a company land in the same partition in every table.
+
+    Args:
+        file_paths (list[str]): The transformed files of the table.
+        table_name (str): The name of the table.
+        partitions_dir (str): The directory the partition files are written to.
+    Returns:
+        list[str]: The paths to the partition files, by partition number.
+    """
+
+    paths = [
+        os.path.join(partitions_dir, f"{table_name}_{partition}.csv")
+        for partition in range(PARTITIONS)
+    ]
+    with contextlib.ExitStack() as stack, METRICS.timer("export", f"partition_{table_name}"):
+        files = [
+            stack.enter_context(open(path, "w", encoding="utf-8", newline=""))
+            for path in paths
+        ]
+        for file_path in file_paths:
+            for chunk in read_transformed_file(file_path, READ_CHUNK_SIZE):
+                keys = pd.util.hash_array(chunk[JOIN_KEY].to_numpy(dtype=object))
+                for partition, rows in chunk.groupby(keys % PARTITIONS, sort=False):
+                    rows.to_csv(files[partition], header=False, index=False, sep=";")
+    return paths
+
+
+def get_wide_fields() -> dict[str, str]:
+    """
+    Returns the columns of the wide record with their `TABLE_FIELDS` data types: the
+    estabelecimento columns and generated columns, the columns of the joined tables, then the
+    lookup descriptions ("category").
+    """
+
+    fields = dict(TABLE_FIELDS["estabelecimento"])
+    fields.update(
+        {column: "str" for column in TABLE_SCHEMA["estabelecimento"].get("generated", {})}
+    )
+    for table_name in JOINED_TABLES:
+        fields.update(
+            {
+                column: dtype
+                for column, dtype in TABLE_FIELDS[table_name].items()
+                if column != JOIN_KEY
+            }
+        )
+    fields.update({column: "category" for _, _, column in LOOKUP_COLUMNS})
+    return fields
+
+
+def build_wide_chunk(
+    chunk: pd.DataFrame,
+    joined: dict[str, pd.DataFrame],
+    lookups: dict[str, LookupTable],
+    fields: dict[str, str],
+) -> pd.DataFrame:
+    """
+    Joins a chunk of estabelecimento rows with the rows of the joined tables of the same
+    partition and decodes the lookup descriptions.
+
+    Args:
+        chunk (pd.DataFrame): The estabelecimento rows.
+        joined (dict[str, pd.DataFrame]): The rows of each joined table, indexed by `cnpj_basico`.
+        lookups (dict[str, LookupTable]): The lookup tables, by name.
+        fields (dict[str, str]): The wide record columns (see `get_wide_fields`).
+    Returns:
+        pd.DataFrame: The wide rows, with NULLs as NaN, dates as datetimes and decimals as floats.
+    """
+
+    for table_name in JOINED_TABLES:
+        chunk = chunk.join(joined[table_name], on=JOIN_KEY)
+    chunk = chunk.mask(chunk == NULL)
+
+    for column, (_, sources) in TABLE_SCHEMA["estabelecimento"].get("generated", {}).items():
+        chunk[column] = chunk[sources[0]].str.cat(chunk[sources[1:]])
+    for code_column, lookup_table, column in LOOKUP_COLUMNS:
+        chunk[column] = lookups[lookup_table].decode(chunk[code_column])
+
+    for column, dtype in fields.items():
+        if dtype == "date":
+            chunk[column] = pd.to_datetime(chunk[column], format="%Y%m%d", errors="coerce")
+        elif dtype in ["float", "int"]:
+            chunk[column] = pd.to_numeric(chunk[column], errors="coerce")
+    return chunk[list(fields)]
+
+
+@contextlib.contextmanager
+def open_export_writer(path: str, fields: dict[str, str]):
+    """
+    Opens the wide export file for writing, in `export.format`.
+
+    CSV files are ";"-separated with a header, empty NULLs and ISO dates, and compressed
+    with `performance.compression`. Parquet files are written one row group per chunk, with
+    the lookup descriptions dictionary-encoded and the same compression codec.
+
+    Args:
+        path (str): The path to the export file.
+        fields (dict[str, str]): The wide record columns (see `get_wide_fields`).
+    Yields:
+        Callable[[pd.DataFrame], None]: A function writing a chunk of wide rows.
+    """
+
+    if EXPORT_FORMAT == "parquet":
+        # Imported here because only the parquet format needs it
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            "str": pa.string(),
+            "date": pa.date32(),
+            "float": pa.float64(),
+            "int": pa.int64(),
+            "category": pa.dictionary(pa.int32(), pa.string()),
+        }
+        schema = pa.schema([(column, types[dtype]) for column, dtype in fields.items()])
+        writer = pq.ParquetWriter(path, schema, compression=COMPRESSION)
+        try:
+            yield lambda chunk: writer.write_table(
+                pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            )
+        finally:
+            writer.close()
+    else:
+        with open_compressed(
+            path, "wt", COMPRESSION_LEVEL, encoding="utf-8", newline=""
+        ) as file:
+            header = [True]
+
+            def write(chunk: pd.DataFrame):
+                chunk.to_csv(
+                    file, header=header[0], index=False, sep=";", date_format="%Y-%m-%d"
+                )
+                header[0] = False
+
+            yield write
+
+
+def get_export_file_path(month: str) -> str:
+    """Returns the path of the wide export file of a month, in `export.format`."""
+    if EXPORT_FORMAT == "parquet":
+        return os.path.join(EXPORT_PATH, f"estabelecimento_wide_{month}.parquet")
+    return os.path.join(
+        EXPORT_PATH, f"estabelecimento_wide_{month}.csv{COMPRESSION_SUFFIXES[COMPRESSION]}"
+    )
+
+
+def export_wide(transformed_data: list[str] = []) -> str:
+    """
+    Exports a denormalized estabelecimento file from the transformed files of a month.
+
+    Each establishment becomes one flat record with its company (`empresa`) and Simples/MEI
+    (`simples`) columns and the descriptions of its codes (legal nature, qualification of the
+    person in charge, reason for the registration status, country, main CNAE and
+    municipality), without going through the database. The join is a partitioned hash join
+    with bounded memory:
+    1. The small lookup tables are read into dictionary-encoded arrays (see `LookupTable`).
+    2. empresa, simples and estabelecimento are split into `export.partitions` files by a
+       hash of `cnpj_basico` (see `partition_table`).
+    3. For each partition, the empresa and simples rows are indexed in memory (the first row of
+       a repeated key is kept, as in the load) and the estabelecimento rows are streamed
+       through them in `performance.read_chunk_size` chunks.
+    Only one partition of empresa and simples is held in memory at a time, so more partitions
+    use less memory. Rows are exported as transformed, in partition order. The file is written
+    to `paths.export_path` in `export.format` (csv or parquet).
+
+    Args:
+        transformed_data (list[str], optional): Paths to the transformed files. Defaults to the
+                                                files of the latest (or user-selected) month.
+    Returns:
+        str: The path to the export file.
+    Raises:
+        FileNotFoundError: If there are no transformed estabelecimento files.
+    """
+
+    transformed_data = transformed_data or get_latest_transformed_data()
+    month = os.path.basename(os.path.dirname(transformed_data[0]))
+    METRICS.set_month(month)
+    estabelecimento_files = get_separated_files("estabelecimento", transformed_data)
+    if not estabelecimento_files:
+        raise FileNotFoundError(f"No transformed estabelecimento files found for {month}.")
+
+    lookups = {
+        lookup_table: LookupTable(get_separated_files(lookup_table, transformed_data))
+        for lookup_table in {lookup_table for _, lookup_table, _ in LOOKUP_COLUMNS}
+    }
+    fields = get_wide_fields()
+
+    export_file = get_export_file_path(month)
+    partitions_dir = os.path.join(EXPORT_PATH, f".partitions_{month}")
+    os.makedirs(partitions_dir, exist_ok=True)
+    rows = 0
+    try:
+        logging.info(f"Partitioning the transformed files of {month}...")
+        partitions = {
+            table_name: partition_table(
+                get_separated_files(table_name, transformed_data), table_name, partitions_dir
+            )
+            for table_name in ["estabelecimento", *JOINED_TABLES]
+        }
+
+        logging.info(f"Exporting {export_file}...")
+        with METRICS.timer("export", "join"), profiling.profile_unit(
+            "export", month
+        ), open_export_writer(get_partial_path(export_file), fields) as write:
+            for partition in range(PARTITIONS):
+                profiling.sample_chunk(partition)
+                joined = {
+                    table_name: read_partition(partitions[table_name][partition], table_name)
+                    .drop_duplicates(JOIN_KEY)
+                    .set_index(JOIN_KEY)
+                    for table_name in JOINED_TABLES
+                }
+                for chunk in read_partition(
+                    partitions["estabelecimento"][partition], "estabelecimento", READ_CHUNK_SIZE
+                ):
+                    with profiling.section("build_wide_chunk"):
+                        wide = build_wide_chunk(chunk, joined, lookups, fields)
+                    with profiling.section("write"):
+                        write(wide)
+                    rows += len(wide)
+        os.replace(get_partial_path(export_file), export_file)
+    finally:
+        shutil.rmtree(partitions_dir, ignore_errors=True)
+        if os.path.exists(get_partial_path(export_file)):
+            os.remove(get_partial_path(export_file))
+
+    METRICS.add("export", "rows_written", rows, os.path.basename(export_file))
+    logging.info(f"Exported {rows} rows to {export_file}.")
+    return export_file
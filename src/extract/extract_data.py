@@ -1,3 +1,5 @@
+import functools
+import hashlib
 import logging
 import os
 import re
@@ -5,7 +7,17 @@ import requests
 import zipfile
 from bs4 import BeautifulSoup
 from requests.adapters import HTTPAdapter
-from utils.helpers import ask_month, create_logfile, load_config
+from utils.helpers import (
+    COMPRESSION_SUFFIXES,
+    ask_month,
+    create_logfile,
+    get_config,
+    get_partial_path,
+    open_compressed,
+)
+from utils.manifest import RunManifest, get_file_checksum
+from utils.metrics import METRICS
+import utils.profiling as profiling
 from urllib.parse import urljoin
 
 """
@@ -16,17 +28,23 @@ TODO : generate logs for each operation
 
 
 # Configuration
-config = load_config()
+config = get_config()
 BASE_URL = config["data_source"]["base_url"]
 DOWNLOAD_PATH = config["paths"]["download_path"]
 EXTRACT_PATH = config["paths"]["extract_path"]
+COMPRESSION = config["performance"]["compression"]
+COMPRESSION_LEVEL = config["performance"]["compression_level"]
 
 
-# Create a session
-session = requests.Session()
 session_retries = 3
 
 
+@functools.cache
+def get_session() -> requests.Session:
+    """Returns the HTTP session shared by the requests, created on first use."""
+    return requests.Session()
+
+
 def request_retry_get(
     url: str, show_attempts: bool = False, **kwargs
 ) -> requests.Response:
@@ -43,7 +61,7 @@ def request_retry_get(
     """
     for attempt in range(1, session_retries + 1):
         try:
-            response = session.get(url, **kwargs)
+            response = get_session().get(url, **kwargs)
             response.raise_for_status()
             if show_attempts:
                 logging.info(f"Attempt {attempt} successful: {url}")
@@ -106,12 +124,18 @@ def get_zip_files(month: str) -> list[str]:
     ]
 
 
-def download_zip_file(url: str, save_path: str):
+def download_zip_file(url: str, save_path: str) -> str | None:
     """
     Downloads a ZIP file from the given URL and saves it to the specified path.
+
+    The file is downloaded to a hidden partial file renamed once complete, so an interrupted
+    download never leaves a truncated ZIP behind.
+
     Args:
         url (str): The URL of the ZIP file.
         save_path (str): The local file path to save the downloaded ZIP.
+    Returns:
+        str | None: The SHA-256 hex digest of the file, or None if the download failed.
     Raises:
         requests.RequestException: If the download fails.
     """
@@ -119,36 +143,93 @@ def download_zip_file(url: str, save_path: str):
         response = request_retry_get(url, stream=True)
     except requests.RequestException as e:
         logging.error(f"Failed to download {url}: {e}")
-        return
+        return None
 
-    with open(save_path, "wb") as file:
+    name = os.path.basename(save_path)
+    partial_path = get_partial_path(save_path)
+    digest = hashlib.sha256()
+    size = 0
+    with METRICS.timer("download", name), open(partial_path, "wb") as file:
         for chunk in response.iter_content(chunk_size=65536):  # 64KB chunks
             file.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    os.replace(partial_path, save_path)
+    METRICS.add("download", "bytes", size, name)
     logging.info(f"Downloaded: {save_path}")
 
+    return digest.hexdigest()
+
+
+def download_zip(url: str, month_dir: str, manifest: RunManifest) -> str | None:
+    """
+    Downloads a ZIP file of a month, unless it was already downloaded.
+
+    Complete downloads (according to the run manifest) are reused, and each download is
+    recorded in the manifest with its size and checksum.
+
+    Args:
+        url (str): The URL of the ZIP file.
+        month_dir (str): The directory the month's ZIP files are saved to.
+        manifest (RunManifest): The run manifest of the month.
+    Returns:
+        str | None: The path to the downloaded ZIP file, or None if the download failed.
+    """
+    name = os.path.basename(url)
+    filename = os.path.join(month_dir, name)
+    record = manifest.get("downloaded", name)
+
+    if record and os.path.exists(filename) and os.path.getsize(filename) == record["size"]:
+        logging.info(f"Skipping {filename}, already downloaded.")
+    elif not record and os.path.exists(filename) and zipfile.is_zipfile(filename):
+        # Downloaded before the manifest existed; the central directory is at the end
+        # of the file, so a truncated download is not a valid ZIP
+        logging.info(f"Skipping {filename}, already exists.")
+        manifest.mark_done(
+            "downloaded",
+            name,
+            size=os.path.getsize(filename),
+            sha256=get_file_checksum(filename),
+        )
+    else:
+        logging.info(f"Downloading {filename}...")
+        checksum = download_zip_file(url, filename)
+        if checksum is None:
+            return None
+        manifest.mark_done(
+            "downloaded", name, size=os.path.getsize(filename), sha256=checksum
+        )
+
+    return filename
+
 
 def download_all_zips(month: str) -> list[str]:
     """
     Downloads all ZIP files for a given month.
+
+    ZIP files already extracted (according to the run manifest) are not downloaded again
+    (see `download_zip`).
+
     Args:
         month (str): The selected year-month directory.
     Returns:
-        list[str]: A list of file paths for the downloaded ZIP files.
+        list[str]: A list of file paths for the downloaded ZIP files still to be extracted.
     """
     zip_urls = get_zip_files(month)
     # zip_urls = zip_urls[:1] + zip_urls[2:3] + zip_urls[12:13] + zip_urls[21:27] + zip_urls[28:29]  # TESTING
     month_dir = os.path.join(DOWNLOAD_PATH, month)
     os.makedirs(month_dir, exist_ok=True)
+    manifest = RunManifest(month)
 
     downloaded_files = []
     for url in zip_urls:
-        filename = os.path.join(month_dir, os.path.basename(url))
-        if os.path.exists(filename):
-            logging.info(f"Skipping {filename}, already exists.")
-        else:
-            logging.info(f"Downloading {filename}...")
-            download_zip_file(url, filename)
-        downloaded_files.append(filename)
+        if manifest.is_done("extracted", os.path.basename(url)):
+            logging.info(f"Skipping {url}, already extracted.")
+            continue
+
+        filename = download_zip(url, month_dir, manifest)
+        if filename:
+            downloaded_files.append(filename)
 
     return downloaded_files
 
@@ -175,49 +256,103 @@ def clean_filename(filename: str, zip_filename: str) -> str:
     return re.sub(r"[^a-zA-Z0-9_.-]", "_", filename)
 
 
-def extract_zip_files(zip_files: list[str], month: str) -> list[str]:
+def extract_zip_members(zip_file: str, extract_path: str) -> dict[str, dict]:
     """
-    Extract all ZIP files and return a list of cleaned extracted files.
+    Extracts the files of a ZIP file, compressing them according to `performance.compression`.
+
+    Each file is written to a hidden partial file renamed once complete, and files already
+    extracted are skipped. The ZIP file is left in place.
 
     Args:
-        zip_files (list[str]): A list of paths to the ZIP files to extract.
-        month (str): The year-month directory to extract files to.
+        zip_file (str): The path to the ZIP file.
+        extract_path (str): The directory to extract the files to.
 
     Returns:
-        list[str]: A list of paths to the extracted files.
+        dict[str, dict]: The extracted file names, with their uncompressed size and CRC-32.
     """
-    extract_path = os.path.join(EXTRACT_PATH, month)
-    os.makedirs(extract_path, exist_ok=True)
-
-    extracted_files = []
-
-    for zip_file in zip_files:
-        with zipfile.ZipFile(zip_file, "r") as zip_ref:
-            for name in zip_ref.namelist():
-                cleaned_name = clean_filename(name, zip_ref.filename)
-                cleaned_path = os.path.join(extract_path, cleaned_name)
-
-                if os.path.exists(cleaned_path):
-                    logging.info(f"Skipping {cleaned_path}, already exists.")
-                else:
-                    with zip_ref.open(name) as source, open(
-                        cleaned_path, "wb"
+    extracted_files = {}
+
+    with profiling.profile_unit("extract", os.path.basename(zip_file)), zipfile.ZipFile(
+        zip_file, "r"
+    ) as zip_ref:
+        for info in zip_ref.infolist():
+            name = info.filename
+            cleaned_name = clean_filename(name, zip_ref.filename)
+            cleaned_path = os.path.join(
+                extract_path, cleaned_name + COMPRESSION_SUFFIXES[COMPRESSION]
+            )
+
+            if os.path.exists(cleaned_path):
+                logging.info(f"Skipping {cleaned_path}, already exists.")
+            else:
+                partial_path = get_partial_path(cleaned_path)
+                file_name = os.path.basename(cleaned_path)
+                with METRICS.timer("extract", file_name):
+                    with zip_ref.open(name) as source, open_compressed(
+                        partial_path, "wb", COMPRESSION_LEVEL
                     ) as target:
                         # Read and write file in 64KB chunks to handle large files efficiently
                         for chunk in iter(lambda: source.read(65536), b""):
                             target.write(chunk)
+                os.replace(partial_path, cleaned_path)
+                METRICS.add("extract", "bytes", info.file_size, file_name)
 
-                    logging.info(f"Extracted and cleaned {name} to {cleaned_path}")
+                logging.info(f"Extracted and cleaned {name} to {cleaned_path}")
 
-                extracted_files.append(cleaned_path)
+            extracted_files[os.path.basename(cleaned_path)] = {
+                "size": info.file_size,
+                "crc": info.CRC,
+            }
 
-        # Remove the original zip file after extraction
-        os.remove(zip_file)
-        logging.info(f"Removed ZIP: {zip_file}")
+    return extracted_files
+
+
+def commit_extraction(zip_file: str, extracted_files: dict[str, dict], manifest: RunManifest):
+    """
+    Records an extracted ZIP file in the run manifest, then removes it.
+
+    Args:
+        zip_file (str): The path to the ZIP file.
+        extracted_files (dict[str, dict]): The files extracted from it (see `extract_zip_members`).
+        manifest (RunManifest): The run manifest of the month.
+    """
+    manifest.mark_done("extracted", os.path.basename(zip_file), files=extracted_files)
+
+    # Remove the original zip file after extraction
+    os.remove(zip_file)
+    logging.info(f"Removed ZIP: {zip_file}")
+
+
+def extract_zip_files(zip_files: list[str], month: str) -> list[str]:
+    """
+    Extract all ZIP files and return a list of cleaned extracted files.
+
+    The extracted files are compressed on the fly according to `performance.compression`
+    (e.g. "Empresas0_K3241.EMPRECSV.csv.gz" with gzip). A ZIP file is recorded in the run
+    manifest once all of its files are extracted, and only then removed.
 
+    Args:
+        zip_files (list[str]): A list of paths to the ZIP files to extract.
+        month (str): The year-month directory to extract files to.
+
+    Returns:
+        list[str]: A list of paths to the extracted files of the month, including the ones
+                   extracted by previous runs (which may have been transformed since).
+    """
+    extract_path = os.path.join(EXTRACT_PATH, month)
+    os.makedirs(extract_path, exist_ok=True)
+    manifest = RunManifest(month)
+
+    for zip_file in zip_files:
+        extracted_files = extract_zip_members(zip_file, extract_path)
+        commit_extraction(zip_file, extracted_files, manifest)
         logging.info(f"Extracted {zip_file} to {extract_path}")
 
-    return extracted_files
+    return [
+        os.path.join(extract_path, file)
+        for record in manifest.entries("extracted").values()
+        for file in record["files"]
+    ]
 
 
 def extract_data() -> list[str]:
@@ -227,11 +362,11 @@ def extract_data() -> list[str]:
     This function performs the following steps:
     1. Retrieves the available months for download.
     2. Prompts the user to select a month or automatically selects the latest month.
-    3. Downloads the ZIP files for the selected month.
+    3. Downloads the ZIP files for the selected month not extracted yet (see `RunManifest`).
     4. Extracts the downloaded ZIP files.
 
     Returns:
-      list[str]: A list of paths to the extracted files.
+      list[str]: A list of paths to the extracted files of the month.
 
     Raises:
       Exception: If no available months are found.
@@ -243,6 +378,7 @@ def extract_data() -> list[str]:
         raise Exception("No available months found.")
 
     selected_month = ask_month(months) if config["settings"]["ask_user"] else months[0]
+    METRICS.set_month(selected_month)
 
     logging.info(f"Downloading data for: {selected_month}")
     downloaded_files = download_all_zips(selected_month)
@@ -0,0 +1,290 @@
+import csv
+import logging
+import os
+import shutil
+from typing import Iterator
+
+from constants.table_fields import TABLE_FIELDS
+from constants.table_primary_keys import TABLE_PRIMARY_KEYS
+from load.load_data import (
+    TABLES_TO_LOAD,
+    TRANSFORMED_PATH,
+    WRITE_CHUNK_SIZE,
+    get_last_loaded_month,
+    get_table_files,
+    log_dataload,
+)
+from utils.database.conn import MYSQL_CONN
+from utils.external_sort import merge_sorted_runs, unique_by_key, write_sorted_runs
+from utils.helpers import get_config
+
+# Configuration
+config = get_config()
+DELTA_PATH = config["paths"]["delta_path"]
+SORT_CHUNK_SIZE = config["performance"]["sort_chunk_size"]
+CHANGE_TYPES = ["insert", "update", "delete"]
+
+
+def get_previous_month(month: str) -> str | None:
+    """
+    Returns the latest month before `month` that still has transformed outputs.
+
+    Args:
+        month (str): The year and month in the format 'YYYY-MM'.
+    Returns:
+        str | None: The previous month, or None if there is none.
+    """
+
+    months = sorted(
+        (m for m in os.listdir(TRANSFORMED_PATH) if m < month), reverse=True
+    )
+    return months[0] if months else None
+
+
+def diff_sorted_rows(
+    previous_rows: Iterator[list[str]], current_rows: Iterator[list[str]]
+) -> Iterator[tuple[str, list[str]]]:
+    """
+    Compares two key-ordered row streams with a sorted merge.
+
+    Args:
+        previous_rows (Iterator[list[str]]): Previous month rows as `[key, row_hash, *values]`, unique and ordered by key.
+        current_rows (Iterator[list[str]]): Current month rows in the same layout.
+    Yields:
+        tuple[str, list[str]]: The change type ("insert", "update" or "delete") and the
+        affected row (the current row for inserts and updates, the previous row for deletes).
+    """
+
+    previous = next(previous_rows, None)
+    current = next(current_rows, None)
+
+    while previous is not None or current is not None:
+        if current is None or (previous is not None and previous[0] < current[0]):
+            yield "delete", previous
+            previous = next(previous_rows, None)
+        elif previous is None or current[0] < previous[0]:
+            yield "insert", current
+            current = next(current_rows, None)
+        else:
+            if previous[1] != current[1]:
+                yield "update", current
+            previous = next(previous_rows, None)
+            current = next(current_rows, None)
+
+
+def build_table_delta(
+    previous_files: list[str], current_files: list[str], table_name: str, delta_dir: str
+) -> dict[str, int]:
+    """
+    Writes the insert, update and delete sets of a table between two months.
+
+    Both months are externally sorted by primary key (see `utils.external_sort`) and
+    merged. Rows whose hash differs are updates. The sets are written to
+    `{delta_dir}/{table_name}_{change_type}.csv`; inserts and updates hold full rows and
+    deletes hold only the primary key values.
+
+    Args:
+        previous_files (list[str]): The previous month's transformed files for the table.
+        current_files (list[str]): The current month's transformed files for the table.
+        table_name (str): The name of the table.
+        delta_dir (str): Directory where the sets and the temporary sort runs are written.
+    Returns:
+        dict[str, int]: Number of rows per change type.
+    """
+
+    key_columns = TABLE_PRIMARY_KEYS[table_name]
+    key_positions = [
+        list(TABLE_FIELDS[table_name].keys()).index(column) for column in key_columns
+    ]
+    run_dir = os.path.join(delta_dir, "runs", table_name)
+
+    previous_runs = write_sorted_runs(
+        previous_files, key_columns, os.path.join(run_dir, "previous"), SORT_CHUNK_SIZE
+    )
+    current_runs = write_sorted_runs(
+        current_files, key_columns, os.path.join(run_dir, "current"), SORT_CHUNK_SIZE
+    )
+
+    counts = dict.fromkeys(CHANGE_TYPES, 0)
+    files = {
+        change_type: open(
+            os.path.join(delta_dir, f"{table_name}_{change_type}.csv"),
+            "w",
+            encoding="utf-8",
+            newline="",
+        )
+        for change_type in CHANGE_TYPES
+    }
+    try:
+        writers = {
+            change_type: csv.writer(file, delimiter=";")
+            for change_type, file in files.items()
+        }
+        for change_type, row in diff_sorted_rows(
+            unique_by_key(merge_sorted_runs(previous_runs)),
+            unique_by_key(merge_sorted_runs(current_runs)),
+        ):
+            values = row[2:]
+            if change_type == "delete":
+                values = [values[position] for position in key_positions]
+            writers[change_type].writerow(values)
+            counts[change_type] += 1
+    finally:
+        for file in files.values():
+            file.close()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    return counts
+
+
+def read_batches(file_path: str, batch_size: int) -> Iterator[list[tuple]]:
+    """
+    Reads a change set file in batches, converting `\\N` markers to NULL.
+
+    Args:
+        file_path (str): Path to the change set file.
+        batch_size (int): Number of rows per batch.
+    Yields:
+        list[tuple]: The rows of each batch.
+    """
+
+    with open(file_path, "r", encoding="utf-8", newline="") as file:
+        batch = []
+        for row in csv.reader(file, delimiter=";"):
+            batch.append(tuple(None if value == r"\N" else value for value in row))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def get_upsert_sql(table_name: str) -> str:
+    """
+    Builds the `INSERT ... ON DUPLICATE KEY UPDATE` statement for the inserts and updates.
+
+    It uses the row alias form (`VALUES (...) AS new ... col = new.col`) that replaces
+    `VALUES(col)`, deprecated since MySQL 8.0.20; it requires MySQL 8.0.19 or later.
+    The `YYYYMMDD` dates are converted by the server with `STR_TO_DATE`, as in
+    `load.load_data.get_load_data_sql`, with empty values stored as NULL.
+
+    Args:
+        table_name (str): The name of the table.
+    Returns:
+        str: The statement, with one `%s` placeholder per column.
+    """
+
+    fields = TABLE_FIELDS[table_name]
+    placeholders = [
+        "STR_TO_DATE(NULLIF(%s, ''), '%%Y%%m%%d')" if dtype == "date" else "%s"
+        for dtype in fields.values()
+    ]
+    return (
+        f"INSERT INTO {table_name} ({', '.join(fields)}) "
+        f"VALUES ({', '.join(placeholders)}) AS new "
+        f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = new.{c}' for c in fields)}"
+    )
+
+
+def apply_table_delta(table_name: str, delta_dir: str):
+    """
+    Applies the change sets of a table in a single transaction.
+
+    Deletes are issued as batched `DELETE ... WHERE (pk) IN (...)` statements, inserts and
+    updates as batched upserts (see `get_upsert_sql`). Any error rolls the whole table back.
+
+    Args:
+        table_name (str): The name of the table.
+        delta_dir (str): Directory holding the change sets written by `build_table_delta`.
+    Raises:
+        mysql.connector.Error: If any MySQL error occurs while applying the changes.
+    """
+
+    key_columns = TABLE_PRIMARY_KEYS[table_name]
+    key_placeholder = f"({', '.join(['%s'] * len(key_columns))})"
+    upsert_sql = get_upsert_sql(table_name)
+
+    conn = MYSQL_CONN.create_new_connection()
+    cursor = conn.cursor()
+    try:
+        for batch in read_batches(
+            os.path.join(delta_dir, f"{table_name}_delete.csv"), WRITE_CHUNK_SIZE
+        ):
+            cursor.execute(
+                f"DELETE FROM {table_name} WHERE ({', '.join(key_columns)}) IN "
+                f"({', '.join([key_placeholder] * len(batch))})",
+                [value for row in batch for value in row],
+            )
+
+        for change_type in ["insert", "update"]:
+            for batch in read_batches(
+                os.path.join(delta_dir, f"{table_name}_{change_type}.csv"),
+                WRITE_CHUNK_SIZE,
+            ):
+                cursor.executemany(upsert_sql, batch)
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def load_delta(transformed_data: list[str], month: str) -> bool:
+    """
+    Loads a month by applying only its changes since the previously loaded month.
+
+    The delta load is only possible when the latest month recorded in `load_log` is the
+    month right before `month` in `TRANSFORMED_PATH`, and its transformed outputs are still
+    there for every table being loaded. Otherwise nothing is changed and False is returned.
+
+    Args:
+        transformed_data (list[str]): The transformed data file paths of the month to load.
+        month (str): The year and month in the format 'YYYY-MM'.
+    Returns:
+        bool: True if the month was loaded, False if a full load is needed instead.
+    """
+
+    previous_month = get_previous_month(month)
+    if previous_month is None or get_last_loaded_month() != previous_month:
+        logging.warning(
+            f"Previous month {previous_month} is not the latest loaded month."
+        )
+        return False
+
+    previous_path = os.path.join(TRANSFORMED_PATH, previous_month)
+    previous_data = [
+        os.path.join(previous_path, file) for file in sorted(os.listdir(previous_path))
+    ]
+
+    tables = {}
+    for table in TABLES_TO_LOAD.values():
+        files = get_table_files(table, transformed_data)
+        if not files:
+            continue
+        previous_files = get_table_files(table, previous_data)
+        if not previous_files:
+            logging.warning(f"No retained {table} outputs for {previous_month}.")
+            return False
+        tables[table] = (previous_files, files)
+
+    delta_dir = os.path.join(DELTA_PATH, month)
+    os.makedirs(delta_dir, exist_ok=True)
+
+    for table, (previous_files, files) in tables.items():
+        logging.info(f"Computing {table} changes since {previous_month}...")
+        counts = build_table_delta(previous_files, files, table, delta_dir)
+        logging.info(
+            f"{table}: {counts['insert']} inserts, {counts['update']} updates, {counts['delete']} deletes."
+        )
+
+        apply_table_delta(table, delta_dir)
+        logging.info(f"{table} changes applied successfully.")
+
+    logging.info("Saving load log...")
+    log_dataload(month)
+
+    logging.info("Delta loading complete.")
+    return True
@@ -1,15 +1,42 @@
 import logging
 import os
+import re
+import shutil
+import threading
 
 from constants.table_fields import TABLE_FIELDS
-from transform.transform_data import TRANSFORMED_PATH
-from utils.helpers import ask_month, create_logfile, load_config
-from utils.database.conn import MYSQL_CONN, SQL_ALCHEMY_MYSQL_CONN
+from constants.table_schema import HISTORICAL_TABLES, TABLE_SCHEMA
+from transform.transform_data import (
+    TRANSFORMED_PATH,
+    is_summary_table,
+    merge_summary_files,
+)
+from utils.database.schema import get_create_tables_sql
+from utils.helpers import (
+    ask_month,
+    create_logfile,
+    get_config,
+    get_file_format,
+    is_compressed,
+    open_compressed,
+    open_fifo_for_writing,
+    strip_compression_suffix,
+)
+from utils.manifest import RunManifest
+from utils.metrics import METRICS
+import utils.profiling as profiling
 
 # Configuration
-config = load_config()
+config = get_config()
+DB_TYPE = config["database"]["type"]
 READ_CHUNK_SIZE = config["performance"]["read_chunk_size"]
 WRITE_CHUNK_SIZE = config["performance"]["write_chunk_size"]
+LOAD_MODE = config["settings"]["load_mode"]
+SHADOW_MIN_ROW_RATIO = config["settings"]["shadow_min_row_ratio"]
+HISTORICAL_RETENTION_MONTHS = config["settings"]["historical_retention_months"]
+SHADOW_SUFFIX = "_new"
+PREVIOUS_SUFFIX = "_old"
+EXPIRED_SUFFIX = "_expired"
 TABLES_TO_LOAD = {
     "cnae": "cnae",
     "motivo": "motivo",
@@ -19,73 +46,571 @@ TABLES_TO_LOAD = {
     "qualifica": "qualificacao_socio",
     "empresa": "empresa",
     "estabelecimento": "estabelecimento",
+    "estabelecimento_cnae_secundario": "estabelecimento_cnae_secundario",
+    "resumo_estabelecimento": "resumo_estabelecimento",
+    "resumo_abertura_estabelecimento": "resumo_abertura_estabelecimento",
     "socio": "socio",
     "simples": "simples",
 }
 
-# Database connections
-mysql_conn = MYSQL_CONN.get_connection()
-sql_alchemy_conn = SQL_ALCHEMY_MYSQL_CONN.get_session()
+# Database connections, opened on first use
+match (DB_TYPE):
+    case "mysql":
+        from utils.database.conn import MYSQL_CONN, SQL_ALCHEMY_MYSQL_CONN
+
+
+def get_mysql_conn():
+    """Returns the shared MySQL connection, connecting on first use."""
+    return MYSQL_CONN.get_connection()
+
+
+def close_connections():
+    """Closes the shared MySQL connection and SQLAlchemy engine, if they were opened."""
+    MYSQL_CONN.close_connection()
+    SQL_ALCHEMY_MYSQL_CONN.close_connection()
+
 
 def get_separated_files(name: str, data: list[str]) -> list[str]:
     """
-    Filters and returns a list of file paths from the given data that start with the specified name.
+    Filters and returns the transformed files of a table from the given data.
+
+    Transformed files are named after their table, with an optional file number
+    (e.g. "empresa_0.csv"), so a table never gets the files of another table whose name
+    starts with its own (e.g. "estabelecimento" and "estabelecimento_cnae_secundario").
 
     Args:
-        name (str): The prefix to filter the file names.
+        name (str): The table name.
         data (list[str]): A list of file paths.
     Returns:
-        list[str]: A list of file paths that start with the specified name.
+        list[str]: A list of file paths of the table.
+    """
+
+    pattern = re.compile(rf"^{re.escape(name)}(_\d+)?\.")
+    return [file for file in data if pattern.match(os.path.basename(file).lower())]
+
+
+def get_table_files(table_name: str, data: list[str]) -> list[str]:
+    """
+    Returns the transformed files to load into a table (see `get_separated_files`).
+
+    The partial outputs of a summary table (one per source file) are merged into a single
+    file first (see `transform.transform_data.merge_summary_files`), so each group is
+    loaded once.
+
+    Args:
+        table_name (str): The table name.
+        data (list[str]): A list of file paths.
+    Returns:
+        list[str]: A list of file paths of the table.
+    """
+
+    files = get_separated_files(table_name, data)
+    if files and is_summary_table(table_name):
+        return [merge_summary_files(files, table_name)]
+    return files
+
+
+def get_managed_tables() -> list[str]:
+    """
+    Returns the tables that are (re)created on every load.
+
+    Returns:
+        list[str]: The `TABLE_SCHEMA` tables (main, lookup and id tables), excluding `load_log`.
     """
 
-    return [file for file in data if file.lower().split("/")[-1].startswith(name)]
+    return list(TABLE_SCHEMA)
+
+
+def add_table_suffix(statement: str, suffix: str) -> str:
+    """
+    Appends a suffix to the managed table names created or filled by a SQL statement.
+
+    Only `CREATE TABLE` and `INSERT INTO` targets are renamed, so statements touching
+    other tables (e.g. `load_log`) are left untouched.
+
+    Args:
+        statement (str): The SQL statement.
+        suffix (str): The suffix to append to the table names (e.g. "_new").
+    Returns:
+        str: The statement targeting the suffixed tables.
+    """
+
+    if not suffix:
+        return statement
+
+    pattern = r"\b(CREATE TABLE|INSERT INTO)\s+(" + "|".join(get_managed_tables()) + r")\b"
+    return re.sub(
+        pattern,
+        lambda match: f"{match.group(1)} {match.group(2)}{suffix}",
+        statement,
+        flags=re.IGNORECASE,
+    )
+
+
+def table_exists(table_name: str) -> bool:
+    """
+    Checks if a table exists in the current database.
+
+    Args:
+        table_name (str): The name of the table.
+    Returns:
+        bool: True if the table exists, otherwise False.
+    """
+
+    cursor = get_mysql_conn().cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s;",
+        (table_name,),
+    )
+    exists = cursor.fetchone()[0] > 0
+    cursor.close()
+
+    return exists
+
+
+def count_rows(table_name: str) -> int:
+    """
+    Counts the rows of a table.
+
+    Args:
+        table_name (str): The name of the table.
+    Returns:
+        int: The number of rows in the table.
+    """
+
+    cursor = get_mysql_conn().cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM {table_name};")
+    count = cursor.fetchone()[0]
+    cursor.close()
+
+    return count
 
 
 def drop_and_recreate_tables():
     """
-    Drops existing tables and recreates them based on the SQL script.
+    Drops existing tables and recreates them from the schema registry.
 
     This function performs the following steps:
     1. Disables foreign key checks.
-    2. Drops existing tables listed in the `TABLE_FIELDS` dictionary and additional tables.
+    2. Drops the managed tables (see `get_managed_tables`).
     3. Re-enables foreign key checks.
-    4. Reads and executes SQL statements from the `create_tables.sql` script to recreate the tables.
+    4. Recreates the tables from the DDL generated by `utils.database.schema`.
 
     Note:
-        The function assumes that `mysql_conn` is a valid MySQL connection object and `TABLE_FIELDS` is a dictionary
-        containing table names as keys.
+        The function assumes that the MySQL connection (see `get_mysql_conn`) is valid.
     Raises:
         mysql.connector.Error: If any MySQL error occurs during the execution of SQL statements.
     """
 
-    cursor = mysql_conn.cursor()
+    cursor = get_mysql_conn().cursor()
 
     logging.info("Dropping existing tables...")
     cursor.execute("SET FOREIGN_KEY_CHECKS = 0;")
-    # tables = ["socio", "simples", "estabelecimento", "empresa",
-    #           "cnae", "motivo", "municipio", "natureza_juridica", "pais", "qualificacao_socio",
-    #           "id_matriz_filial", "id_porte_empresa", "id_situacao_cadastral", "id_socio", "id_faixa_etaria"]
-    tables = list(TABLE_FIELDS.keys()) + [
-        "id_matriz_filial",
-        "id_porte_empresa",
-        "id_situacao_cadastral",
-        "id_socio",
-        "id_faixa_etaria",
-    ]
-
-    for table in tables:
+    for table in get_managed_tables():
         cursor.execute(f"DROP TABLE IF EXISTS {table};")
 
     cursor.execute("SET FOREIGN_KEY_CHECKS = 1;")
 
     logging.info("Recreating tables...")
-    read_sql_file("src/sql/create_tables.sql")
+    execute_statements(get_create_tables_sql("mysql"))
 
-    mysql_conn.commit()
+    get_mysql_conn().commit()
     cursor.close()
 
 
-def load_csv_to_db(file_paths: list[str], table_name: str):
+def create_shadow_tables():
+    """
+    Creates empty `*_new` copies of the managed tables next to the live ones.
+
+    The shadow tables are built from the same generated DDL, so they carry
+    their primary keys, indexes and partitions before any data is loaded. Leftovers from
+    a previous failed shadow load are dropped first. The live tables are not touched.
+
+    Raises:
+        mysql.connector.Error: If any MySQL error occurs during the execution of SQL statements.
+    """
+
+    cursor = get_mysql_conn().cursor()
+
+    logging.info("Dropping leftover shadow tables...")
+    for table in get_managed_tables():
+        cursor.execute(f"DROP TABLE IF EXISTS {table}{SHADOW_SUFFIX};")
+
+    logging.info("Creating shadow tables...")
+    execute_statements(get_create_tables_sql("mysql", table_suffix=SHADOW_SUFFIX))
+
+    get_mysql_conn().commit()
+    cursor.close()
+
+
+def verify_shadow_tables(loaded_rows: dict[str, int]) -> bool:
+    """
+    Checks the row counts of the shadow tables before they are swapped in.
+
+    A shadow table fails the check when it is empty although files were loaded into it,
+    or when it holds fewer rows than `SHADOW_MIN_ROW_RATIO` times the live table.
+
+    Args:
+        loaded_rows (dict[str, int]): Number of rows loaded per (unsuffixed) table name.
+    Returns:
+        bool: True if every shadow table passed the checks, otherwise False.
+    """
+
+    valid = True
+
+    for table in loaded_rows:
+        shadow_count = count_rows(f"{table}{SHADOW_SUFFIX}")
+        live_count = count_rows(table) if table_exists(table) else 0
+
+        if shadow_count == 0:
+            logging.error(f"{table}{SHADOW_SUFFIX} is empty.")
+            valid = False
+        elif shadow_count < live_count * SHADOW_MIN_ROW_RATIO:
+            logging.error(
+                f"{table}{SHADOW_SUFFIX} has {shadow_count} rows, less than {SHADOW_MIN_ROW_RATIO:.0%} of the {live_count} live rows."
+            )
+            valid = False
+        else:
+            logging.info(
+                f"{table}{SHADOW_SUFFIX} has {shadow_count} rows (live: {live_count})."
+            )
+
+    return valid
+
+
+def swap_shadow_tables():
+    """
+    Swaps the shadow tables in with a single atomic `RENAME TABLE` statement.
+
+    The live tables become the `*_old` generation, which is kept for `rollback_shadow_swap`.
+    The generation kept by the previous swap is renamed to `*_expired` by the same statement
+    and only dropped once it succeeded, so a failed swap leaves every table in place.
+
+    Raises:
+        mysql.connector.Error: If any MySQL error occurs during the execution of SQL statements.
+    """
+
+    cursor = get_mysql_conn().cursor()
+    renames = []
+    expired = []
+
+    # Leftovers of a swap interrupted before its expired tables were dropped
+    for table in get_managed_tables():
+        cursor.execute(f"DROP TABLE IF EXISTS {table}{EXPIRED_SUFFIX};")
+
+    for table in get_managed_tables():
+        if table_exists(f"{table}{PREVIOUS_SUFFIX}"):
+            renames.append(f"{table}{PREVIOUS_SUFFIX} TO {table}{EXPIRED_SUFFIX}")
+            expired.append(f"{table}{EXPIRED_SUFFIX}")
+        if table_exists(table):
+            renames.append(f"{table} TO {table}{PREVIOUS_SUFFIX}")
+        renames.append(f"{table}{SHADOW_SUFFIX} TO {table}")
+
+    logging.info("Swapping shadow tables...")
+    cursor.execute(f"RENAME TABLE {', '.join(renames)};")
+
+    logging.info("Dropping the expired generation...")
+    for table in expired:
+        cursor.execute(f"DROP TABLE {table};")
+
+    get_mysql_conn().commit()
+    cursor.close()
+
+
+def rollback_shadow_swap():
+    """
+    Restores the previous generation kept by the last shadow swap.
+
+    The current tables are moved back to `*_new` and the `*_old` tables become live again,
+    in a single atomic `RENAME TABLE` statement. Run with `python src/main.py --rollback-swap`.
+
+    Raises:
+        ValueError: If the database is not MySQL, the only one loaded with shadow swaps.
+        Exception: If there is no previous generation to restore.
+    """
+
+    if DB_TYPE != "mysql":
+        raise ValueError(
+            f"Shadow swaps are only supported with database.type: mysql, not {DB_TYPE}."
+        )
+
+    tables = [
+        table
+        for table in get_managed_tables()
+        if table_exists(f"{table}{PREVIOUS_SUFFIX}")
+    ]
+    if not tables:
+        logging.error("No previous generation found.")
+        raise Exception("No previous generation found.")
+
+    cursor = get_mysql_conn().cursor()
+    renames = []
+
+    for table in tables:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}{SHADOW_SUFFIX};")
+        renames.append(f"{table} TO {table}{SHADOW_SUFFIX}")
+        renames.append(f"{table}{PREVIOUS_SUFFIX} TO {table}")
+
+    logging.info("Restoring previous generation...")
+    cursor.execute(f"RENAME TABLE {', '.join(renames)};")
+
+    get_mysql_conn().commit()
+    cursor.close()
+    logging.info(f"Restored the previous generation of {len(tables)} tables.")
+
+
+def recreate_lookup_tables():
+    """
+    Drops and recreates every managed table except the historical main tables.
+
+    Used in "historical" mode, where the lookup and id tables only hold the latest month
+    while the main tables keep every month side by side.
+
+    Raises:
+        mysql.connector.Error: If any MySQL error occurs during the execution of SQL statements.
+    """
+
+    cursor = get_mysql_conn().cursor()
+
+    logging.info("Dropping existing lookup tables...")
+    for table in get_managed_tables():
+        if table not in HISTORICAL_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table};")
+
+    logging.info("Recreating lookup tables...")
+    execute_statements(
+        get_create_tables_sql(
+            "mysql",
+            [table for table in get_managed_tables() if table not in HISTORICAL_TABLES],
+        )
+    )
+
+    get_mysql_conn().commit()
+    cursor.close()
+
+
+def is_historical_table(table_name: str) -> bool:
+    """
+    Checks if a table was created for historical loads, i.e. has the `ref_month` column
+    and the `p000000` placeholder partition (see `get_create_tables_sql`).
+
+    Args:
+        table_name (str): The name of the table.
+    Returns:
+        bool: True if the table has both, otherwise False.
+    """
+
+    cursor = get_mysql_conn().cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'ref_month';",
+        (table_name,),
+    )
+    has_column = cursor.fetchone()[0] > 0
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME = 'p000000';",
+        (table_name,),
+    )
+    has_placeholder = cursor.fetchone()[0] > 0
+    cursor.close()
+
+    return has_column and has_placeholder
+
+
+def check_historical_tables():
+    """
+    Checks that the existing main tables can hold a historical load.
+
+    Tables left by a "full" or "shadow" load have no `ref_month` column and are partitioned
+    by `uf`, and are not converted automatically since that would discard their data.
+
+    Raises:
+        Exception: If a main table exists but was not created for historical loads.
+    """
+
+    for table in HISTORICAL_TABLES:
+        if table_exists(table) and not is_historical_table(table):
+            logging.error(f"{table} was not created for historical loads.")
+            raise Exception(
+                f"{table} has no ref_month column or p000000 partition, it was created by a "
+                f'non-historical load. Drop the tables (or reset the database) before loading in "historical" mode.'
+            )
+
+
+def get_month_partitions(table_name: str) -> dict[int, str]:
+    """
+    Returns the month partitions of a historical table.
+
+    Args:
+        table_name (str): The name of the table.
+    Returns:
+        dict[int, str]: Partition names by reference month (YYYYMM), excluding the placeholder partition.
+    """
+
+    cursor = get_mysql_conn().cursor()
+    cursor.execute(
+        """
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL;
+        """,
+        (table_name,),
+    )
+    # Only the month partitions, whose description is their YYYYMM value
+    partitions = {
+        int(description): name
+        for name, description in cursor.fetchall()
+        if description and description.isdigit() and int(description) > 0
+    }
+    cursor.close()
+
+    return partitions
+
+
+def prepare_month_partition(table_name: str, ref_month: int) -> str:
+    """
+    Makes sure a historical table has an empty partition for a month.
+
+    A new partition is added for a month loaded for the first time, while the partition
+    of a month loaded before is truncated so the month can be reloaded.
+
+    Args:
+        table_name (str): The name of the table.
+        ref_month (int): The reference month (YYYYMM).
+    Returns:
+        str: The partition name.
+    Raises:
+        mysql.connector.Error: If any MySQL error occurs during the execution of SQL statements.
+    """
+
+    partition = f"p{ref_month}"
+    cursor = get_mysql_conn().cursor()
+
+    if ref_month in get_month_partitions(table_name):
+        logging.info(f"Truncating partition {partition} of {table_name}...")
+        cursor.execute(f"ALTER TABLE {table_name} TRUNCATE PARTITION {partition};")
+    else:
+        logging.info(f"Adding partition {partition} to {table_name}...")
+        cursor.execute(
+            f"ALTER TABLE {table_name} ADD PARTITION (PARTITION {partition} VALUES IN ({ref_month}));"
+        )
+
+    get_mysql_conn().commit()
+    cursor.close()
+    return partition
+
+
+def drop_expired_partitions(table_name: str, retention_months: int):
+    """
+    Drops the month partitions of a historical table beyond the retention window.
+
+    Old months are removed with `ALTER TABLE ... DROP PARTITION`, which discards whole
+    partitions instead of deleting rows one by one.
+
+    Args:
+        table_name (str): The name of the table.
+        retention_months (int): Number of most recent months to keep.
+    Raises:
+        mysql.connector.Error: If any MySQL error occurs during the execution of SQL statements.
+    """
+
+    partitions = get_month_partitions(table_name)
+    expired = [
+        partitions[month] for month in sorted(partitions, reverse=True)[retention_months:]
+    ]
+    if not expired:
+        return
+
+    logging.info(f"Dropping expired partitions {', '.join(expired)} of {table_name}...")
+    cursor = get_mysql_conn().cursor()
+    cursor.execute(f"ALTER TABLE {table_name} DROP PARTITION {', '.join(expired)};")
+    get_mysql_conn().commit()
+    cursor.close()
+
+
+def get_load_data_sql(
+    file_path: str, table_name: str, ref_month: int | None = None
+) -> str:
+    """
+    Builds the `LOAD DATA LOCAL INFILE` statement for a transformed file.
+
+    The columns are listed explicitly from `TABLE_FIELDS`, and the statement follows the
+    file format (see `utils.helpers.get_file_format`):
+    - csv: ";"-separated fields enclosed by '"'.
+    - tsv: tab-separated unquoted fields with the default `LOAD DATA` escaping. The
+      `YYYYMMDD` dates are read into user variables and converted by the server with
+      `STR_TO_DATE`.
+
+    Args:
+        file_path (str): The path to the transformed file (or a named pipe streaming it).
+        table_name (str): The name of the database table into which the data will be loaded.
+        ref_month (int | None): In "historical" mode, the reference month (YYYYMM) stored in
+                                the `ref_month` column. The rows go to that month's partition.
+    Returns:
+        str: The SQL statement.
+    """
+
+    partition_clause = f"PARTITION (p{ref_month})" if ref_month is not None else ""
+    fields = TABLE_FIELDS[table_name.removesuffix(SHADOW_SUFFIX)]
+    columns = list(fields)
+    assignments = []
+
+    if get_file_format(file_path) == "tsv":
+        fields_clause = "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'"
+        for index, (column, dtype) in enumerate(fields.items()):
+            if dtype == "date":
+                columns[index] = f"@{column}"
+                assignments.append(f"{column} = STR_TO_DATE(@{column}, '%Y%m%d')")
+    else:
+        fields_clause = "FIELDS TERMINATED BY ';' ENCLOSED BY '\"'"
+
+    if ref_month is not None:
+        assignments.append(f"ref_month = {ref_month}")
+
+    columns_clause = f"({', '.join(columns)})"
+    if assignments:
+        columns_clause += f" SET {', '.join(assignments)}"
+
+    return f"""
+    LOAD DATA LOCAL INFILE '{file_path}'
+    INTO TABLE {table_name} {partition_clause}
+    {fields_clause}
+    LINES TERMINATED BY '\\n'
+    IGNORE 1 LINES
+    {columns_clause};
+    """
+
+
+def decompress_to_fifo(
+    file_path: str, fifo_path: str, stop_event: threading.Event, failed: threading.Event
+):
+    """
+    Writes the decompressed content of a file into a named pipe read by `LOAD DATA`.
+
+    Args:
+        file_path (str): The path to the compressed file.
+        fifo_path (str): The path to the named pipe.
+        stop_event (threading.Event): Set when the reader failed or is done.
+        failed (threading.Event): Set by this function if decompression fails.
+    """
+
+    try:
+        with open_compressed(file_path, "rb") as source, open_fifo_for_writing(
+            fifo_path, stop_event, mode="wb"
+        ) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+    except Exception as e:
+        failed.set()
+        if not stop_event.is_set():
+            logging.error(f"Failed to decompress {file_path}: {e}")
+
+
+def load_csv_to_db(
+    file_paths: list[str],
+    table_name: str,
+    ref_month: int | None = None,
+    manifest: RunManifest | None = None,
+    conn=None,
+    failed_files: list[str] | None = None,
+) -> int:
     """
     Load CSV files into a specified database table.
 
@@ -93,9 +618,25 @@ def load_csv_to_db(file_paths: list[str], table_name: str):
     into a specified database table. The first file in the list is assumed to have
     headers, which will be ignored during the loading process.
 
+    Compressed files (".gz", ".zst") are decompressed on the fly into a named pipe read by
+    `LOAD DATA`, in a transaction that is rolled back if decompression fails.
+
+    With a run manifest, each file is recorded once its transaction is committed, and the
+    files already recorded are skipped. A file that fails to load is logged and rolled back,
+    and the next files are still loaded: callers find the failures in `failed_files` (or in
+    the manifest, see `check_files_loaded`).
+
     Args:
         file_paths (list[str]): A list of file paths to the CSV files to be loaded.
         table_name (str): The name of the database table into which the data will be loaded.
+        ref_month (int | None): In "historical" mode, the reference month (YYYYMM) stored in
+                                the `ref_month` column. The rows go to that month's partition.
+        manifest (RunManifest | None): The run manifest of the month, if any.
+        conn: The MySQL connection to load with. Defaults to the module connection.
+        failed_files (list[str] | None): If given, the paths of the files that failed to
+                                         load are appended to it.
+    Returns:
+        int: The number of rows loaded.
     Raises:
         Exception: If there is an error during the loading process, an exception will be raised
                    and the error message will be printed.
@@ -103,64 +644,154 @@ def load_csv_to_db(file_paths: list[str], table_name: str):
         load_csv_to_db(['/path/to/file1.csv', '/path/to/file2.csv'], 'my_table')
     """
 
-    cursor = mysql_conn.cursor()
+    conn = conn or get_mysql_conn()
+    cursor = conn.cursor()
+    loaded_rows = 0
 
     for index, file_path in enumerate(file_paths):
-        if not file_path.endswith(".csv"):
+        if get_file_format(file_path) is None:
             logging.warning(f"Skipping invalid file: {file_path}")
             continue
+        if manifest is not None and manifest.is_done("loaded", os.path.basename(file_path)):
+            logging.info(f"Skipping {file_path}, already loaded.")
+            continue
 
         logging.info(
             f"{table_name.upper()} ({index + 1}/{len(file_paths)}) - Loading {file_path} into {table_name} table..."
         )
 
-        sql = f"""
-        LOAD DATA LOCAL INFILE '{file_path}'
-        INTO TABLE {table_name}
-        FIELDS TERMINATED BY ';'
-        ENCLOSED BY '"'
-        LINES TERMINATED BY '\\n'
-        IGNORE 1 LINES;
-        """
+        decompressor = None
+        if is_compressed(file_path):
+            fifo_path = f"{strip_compression_suffix(file_path)}.fifo"
+            if os.path.exists(fifo_path):
+                os.remove(fifo_path)
+            os.mkfifo(fifo_path)
+
+            stop_event = threading.Event()
+            decompress_failed = threading.Event()
+            decompressor = threading.Thread(
+                target=decompress_to_fifo,
+                args=(file_path, fifo_path, stop_event, decompress_failed),
+            )
+            decompressor.start()
+            sql = get_load_data_sql(fifo_path, table_name, ref_month)
+        else:
+            sql = get_load_data_sql(file_path, table_name, ref_month)
+
+        file_name = os.path.basename(file_path)
         try:
-            cursor.execute(sql)
-            mysql_conn.commit()
+            with METRICS.timer("load", file_name), profiling.profile_unit("load", file_name):
+                conn.start_transaction()
+                try:
+                    cursor.execute(sql)
+                finally:
+                    if decompressor is not None:
+                        stop_event.set()
+                        decompressor.join()
+                        os.remove(fifo_path)
+                if decompressor is not None and decompress_failed.is_set():
+                    raise Exception("Decompression failed.")
+                conn.commit()
+            loaded_rows += cursor.rowcount
+            METRICS.add("load", "rows_written", cursor.rowcount, file_name)
+            if manifest is not None:
+                manifest.mark_done(
+                    "loaded",
+                    file_name,
+                    table=table_name,
+                    rows=cursor.rowcount,
+                )
             logging.info(
                 f"{table_name.upper()} ({index + 1}/{len(file_paths)}) - Successfully loaded {file_path} into {table_name} table."
             )
         except Exception as e:
-            mysql_conn.rollback()
+            conn.rollback()
             logging.error(
                 f"{table_name.upper()} ({index + 1}/{len(file_paths)}) - Failed to load {file_path}: {e}"
             )
+            if failed_files is not None:
+                failed_files.append(file_path)
+
+    cursor.close()
+    return loaded_rows
+
+
+def check_files_loaded(manifest: RunManifest, file_paths: list[str]):
+    """
+    Checks that every file of a load is recorded as loaded in the run manifest.
+
+    Called before the month is recorded in `load_log` and its manifest is closed, so a load
+    with failed files stays open and the next run resumes it.
+
+    Args:
+        manifest (RunManifest): The run manifest of the month.
+        file_paths (list[str]): The paths to the files of the load.
+    Raises:
+        Exception: If any file is not recorded as loaded.
+    """
+
+    names = [
+        os.path.basename(file_path)
+        for file_path in file_paths
+        if get_file_format(file_path) is not None
+    ]
+    pending = manifest.get_pending("loaded", names)
+    if pending:
+        logging.error(f"{len(pending)} files were not loaded: {', '.join(pending)}")
+        raise Exception(
+            f"{len(pending)} files of {manifest.month} were not loaded, the load can be resumed."
+        )
+
+
+def execute_statements(statements: list[str]):
+    """
+    Executes SQL statements in order and commits them.
+
+    Args:
+        statements (list[str]): The SQL statements.
+    Raises:
+        mysql.connector.Error: If there is an error executing any of the SQL statements.
+    """
 
+    cursor = get_mysql_conn().cursor()
+    for statement in statements:
+        cursor.execute(statement)
+
+    get_mysql_conn().commit()
     cursor.close()
 
 
-def read_sql_file(url: str, delimiter: str = ";", multiple: bool = False):
+def read_sql_file(
+    url: str,
+    delimiter: str = ";",
+    multiple: bool = False,
+    table_suffix: str = "",
+):
     """
     Reads and executes SQL statements from a file.
     Args:
         url (str): The file path to the SQL file.
         delimiter (str): The delimiter used to separate SQL statements.
         multiple (bool): If True, executes multiple SQL statements in a single call.
+        table_suffix (str): Suffix appended to the managed tables created or filled by the script.
     Raises:
         IOError: If the file cannot be opened.
         mysql.connector.Error: If there is an error executing any of the SQL statements.
     """
 
-    cursor = mysql_conn.cursor()
+    cursor = get_mysql_conn().cursor()
 
     with open(url, "r") as f:
-        sql_script = f.read()
+        sql_script = add_table_suffix(f.read(), table_suffix)
         if not multiple:
             for statement in sql_script.split(delimiter):
-                if statement.strip():
-                    cursor.execute(statement)
+                if not statement.strip():
+                    continue
+                cursor.execute(statement)
         else:
             cursor.execute(sql_script, multi=True)
 
-    mysql_conn.commit()
+    get_mysql_conn().commit()
     cursor.close()
 
 
@@ -189,6 +820,25 @@ def get_latest_transformed_data():
     ]
 
 
+def get_last_loaded_month() -> str | None:
+    """
+    Returns the month recorded by the latest data load.
+
+    Returns:
+        str | None: The year and month in the format 'YYYY-MM', or None if nothing was loaded yet.
+    """
+
+    if not table_exists("load_log"):
+        return None
+
+    cursor = get_mysql_conn().cursor()
+    cursor.execute("SELECT selected_year_month FROM load_log ORDER BY id DESC LIMIT 1;")
+    row = cursor.fetchone()
+    cursor.close()
+
+    return row[0] if row else None
+
+
 def log_dataload(month: str):
     """
     Logs the data load operation for a specific month into the database.
@@ -201,12 +851,12 @@ def log_dataload(month: str):
         or the execution of the query.
     """
     
-    cursor = mysql_conn.cursor()
+    cursor = get_mysql_conn().cursor()
     
     query = "INSERT INTO load_log (selected_year_month) VALUES (%s);"
-    cursor.execute(query, month)
+    cursor.execute(query, (month,))
 
-    mysql_conn.commit()
+    get_mysql_conn().commit()
     cursor.close()
     
     
@@ -215,45 +865,137 @@ def load_data(transformed_data: list[str] = None):
     Loads transformed data into the database.
 
     This function performs the following steps:
-    1. Drops and recreates the necessary tables.
+    0. In "delta" mode, applies only the changes since the previously loaded month, when possible
+       (see `load.delta_load.load_delta`), and falls back to a full load otherwise.
+    1. Drops and recreates the necessary tables, or creates empty shadow tables in "shadow" mode.
+       In "full" mode, an interrupted load of the month (see `RunManifest`) is resumed instead:
+       the tables are kept and the files already loaded are skipped.
+       In "historical" mode only the lookup tables are recreated, and the main tables get an
+       empty partition for the month.
     2. Iterates over the tables to load, retrieves the corresponding files from the transformed data,
        and loads the CSV files into the database.
-    3. Prints a completion message.
-    4. Closes the database connections.
+    3. In "shadow" mode, checks that every file was loaded and the row counts, and swaps the
+       shadow tables in atomically.
+       In "historical" mode, drops the partitions beyond `HISTORICAL_RETENTION_MONTHS`.
+    4. Prints a completion message.
+    5. Closes the database connections.
+
+    With `database.type: postgresql`, the load is delegated to `load.load_postgres.load_data_postgres`,
+    and with `database.type: duckdb` or `sqlite` to `load.load_embedded.load_data_embedded`.
 
     Args:
         transformed_data (list[str]): A list of transformed data file paths.
     Returns:
         None
+    Raises:
+        Exception: If any file failed to load into the shadow tables, or they fail the row-count
+                   checks. The live tables are left untouched.
+        Exception: In "historical" mode, if the main tables were created by another load mode
+                   (see `check_historical_tables`).
+        Exception: If any file failed to load. The month is not recorded and its manifest is
+                   left open, so the next run resumes the load.
     """
 
     # Get latest transformed data
     transformed_data = transformed_data or get_latest_transformed_data()
-    month = transformed_data[0].split("/")
+    month = os.path.basename(os.path.dirname(transformed_data[0]))
+    manifest = RunManifest(month)
+    METRICS.set_month(month)
+
+    if DB_TYPE == "postgresql":
+        # Imported here because load_postgres depends on this module
+        from load.load_postgres import load_data_postgres
+
+        manifest.start_load(resumable=False)
+        load_data_postgres(transformed_data, month)
+        return manifest.finish_load()
+
+    if DB_TYPE in ("duckdb", "sqlite"):
+        # Imported here because load_embedded depends on this module
+        from load.load_embedded import load_data_embedded
+
+        manifest.start_load(resumable=False)
+        load_data_embedded(transformed_data, month)
+        return manifest.finish_load()
+
+    if LOAD_MODE == "delta":
+        # Imported here because delta_load depends on this module
+        from load.delta_load import load_delta
+
+        manifest.start_load(resumable=False)
+        if load_delta(transformed_data, month):
+            manifest.finish_load()
+            close_connections()
+            return
+        logging.warning("Delta load not possible, falling back to a full load.")
 
     # Resetting database state
-    drop_and_recreate_tables()
-    
-    # Insert data for id_tables
-    logging.info("Inserting default data...")
-    read_sql_file("src/sql/default_insert.sql")
+    ref_month = None
+    resuming = manifest.start_load(resumable=LOAD_MODE == "full")
+    if resuming:
+        table_suffix = ""
+    elif LOAD_MODE == "shadow":
+        table_suffix = SHADOW_SUFFIX
+        create_shadow_tables()
+    elif LOAD_MODE == "historical":
+        table_suffix = ""
+        ref_month = int(month.replace("-", ""))
+        check_historical_tables()
+        recreate_lookup_tables()
+        execute_statements(
+            get_create_tables_sql("mysql", HISTORICAL_TABLES, historical=True)
+        )
+        for table in HISTORICAL_TABLES:
+            prepare_month_partition(table, ref_month)
+    else:
+        table_suffix = ""
+        drop_and_recreate_tables()
+
+    if not resuming:
+        # Insert data for id_tables
+        logging.info("Inserting default data...")
+        read_sql_file("src/sql/default_insert.sql", table_suffix=table_suffix)
 
-    # Insert missing data on RFB
-    logging.info("Inserting missing data...")
-    read_sql_file("src/sql/missing_data.sql")
+        # Insert missing data on RFB
+        logging.info("Inserting missing data...")
+        read_sql_file("src/sql/missing_data.sql", table_suffix=table_suffix)
 
     # Insert data from CSV
-    for prefix, table in TABLES_TO_LOAD.items():
-        files = get_separated_files(prefix, transformed_data)
+    loaded_rows = {}
+    loaded_files = []
+    failed_files = []
+    for table in TABLES_TO_LOAD.values():
+        files = get_table_files(table, transformed_data)
         if files:
-            load_csv_to_db(files, table)
+            loaded_rows[table] = load_csv_to_db(
+                files,
+                f"{table}{table_suffix}",
+                ref_month=ref_month if table in HISTORICAL_TABLES else None,
+                manifest=manifest,
+                failed_files=failed_files,
+            )
+            loaded_files += files
             logging.info(f"{table} loaded successfully.")
-    
+
+    if LOAD_MODE == "shadow":
+        if failed_files:
+            raise Exception(
+                f"{len(failed_files)} files failed to load into the shadow tables, live tables kept."
+            )
+        if not verify_shadow_tables(loaded_rows):
+            raise Exception("Shadow tables failed the row-count checks, live tables kept.")
+        swap_shadow_tables()
+    elif LOAD_MODE == "historical":
+        for table in HISTORICAL_TABLES:
+            drop_expired_partitions(table, HISTORICAL_RETENTION_MONTHS)
+
+    check_files_loaded(manifest, loaded_files)
+
     logging.info("Saving load log...")
     log_dataload(month)
-    
+    manifest.finish_load()
+
     logging.info("Data loading complete.")
 
     # Close connections
-    mysql_conn.close()
-    sql_alchemy_conn.close()
+    close_connections()
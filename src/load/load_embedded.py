@@ -0,0 +1,288 @@
+import csv
+import datetime
+import logging
+
+from constants.table_fields import TABLE_FIELDS
+from constants.table_primary_keys import TABLE_PRIMARY_KEYS
+from constants.table_schema import TABLE_SCHEMA
+from load.load_data import (
+    DB_TYPE,
+    TABLES_TO_LOAD,
+    WRITE_CHUNK_SIZE,
+    get_managed_tables,
+    get_table_files,
+)
+from utils.database.conn import EMBEDDED_CONN
+from utils.database.schema import (
+    get_column_type,
+    get_create_tables_sql,
+    get_index_sql,
+    get_primary_key_sql,
+)
+from utils.helpers import (
+    get_file_format,
+    open_compressed,
+    split_sql_statements,
+    unescape_tsv_value,
+)
+from utils.metrics import METRICS
+import utils.profiling as profiling
+
+
+def quote_literal(value: str) -> str:
+    """Quotes a string as a SQL literal."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def execute_sql_file(conn, url: str):
+    """
+    Reads and executes SQL statements from a file on the embedded database.
+
+    Args:
+        conn: The DuckDB or SQLite connection.
+        url (str): The file path to the SQL file.
+    """
+
+    with open(url, "r") as f:
+        for statement in split_sql_statements(f.read()):
+            conn.execute(statement)
+    conn.commit()
+
+
+def create_tables(conn):
+    """
+    Drops and recreates the managed tables without keys or indexes.
+
+    The DDL for the current engine is generated by `utils.database.schema`. The keys and
+    indexes are built after the load by `build_keys_and_indexes`.
+
+    Args:
+        conn: The DuckDB or SQLite connection.
+    """
+
+    logging.info("Recreating tables...")
+    for table in get_managed_tables():
+        conn.execute(f"DROP TABLE IF EXISTS {table};")
+
+    for statement in get_create_tables_sql(DB_TYPE, with_keys=False):
+        conn.execute(statement)
+    conn.commit()
+
+
+def get_duckdb_unescape_sql(column: str) -> str:
+    """
+    Returns a DuckDB expression reverting the `LOAD DATA` escaping of a TSV column.
+
+    The value is split on escaped backslashes, so the remaining "\\t", "\\n" and "\\r"
+    sequences are always escapes, and joined back with single backslashes.
+    """
+
+    unescaped = "replace(replace(replace(x, '\\t', chr(9)), '\\n', chr(10)), '\\r', chr(13))"
+    return (
+        f"CASE WHEN contains({column}, '\\') THEN array_to_string(list_transform("
+        f"string_split({column}, '\\\\'), x -> {unescaped}), '\\') ELSE {column} END"
+    )
+
+
+def load_csv_duckdb(conn, file_paths: list[str], table_name: str) -> int:
+    """
+    Loads transformed files into a DuckDB table with its native CSV reader.
+
+    The files of each format are read in a single `INSERT ... SELECT ... FROM read_csv(...)`,
+    converting the `YYYYMMDD` dates and numbers on the fly. Values that cannot be converted
+    become NULL. TSV files are read unquoted and their text columns are unescaped.
+
+    Args:
+        conn (duckdb.DuckDBPyConnection): The DuckDB connection.
+        file_paths (list[str]): A list of file paths to the transformed files to be loaded.
+        table_name (str): The name of the table into which the data will be loaded.
+    Returns:
+        int: The number of rows loaded.
+    """
+
+    reader_options = {
+        "csv": "delim = ';', quote = '\"', escape = '\"'",
+        "tsv": "delim = '\\t', quote = '', escape = ''",
+    }
+    loaded_rows = 0
+
+    for file_format, options in reader_options.items():
+        format_paths = [path for path in file_paths if get_file_format(path) == file_format]
+        if not format_paths:
+            continue
+
+        columns = []
+        for column, dtype in TABLE_FIELDS[table_name].items():
+            if dtype == "date":
+                columns.append(f"TRY_STRPTIME({column}, '%Y%m%d')::DATE")
+            elif dtype == "str":
+                columns.append(
+                    get_duckdb_unescape_sql(column) if file_format == "tsv" else column
+                )
+            else:
+                column_type = TABLE_SCHEMA[table_name]["columns"][column]
+                columns.append(
+                    f"TRY_CAST({column} AS {get_column_type(column_type, 'duckdb')})"
+                )
+
+        files = ", ".join(quote_literal(file_path) for file_path in format_paths)
+        loaded_rows += conn.execute(
+            f"""
+            INSERT INTO {table_name}
+            SELECT {', '.join(columns)}
+            FROM read_csv([{files}], {options}, header = true,
+                          nullstr = '\\N', all_varchar = true);
+            """
+        ).fetchone()[0]
+
+    return loaded_rows
+
+
+def convert_sqlite_value(value: str, dtype: str):
+    """
+    Converts a transformed CSV value to the value stored in SQLite.
+
+    Args:
+        value (str): The value as read from the CSV file.
+        dtype (str): The `TABLE_FIELDS` data type of the column.
+    Returns:
+        The converted value: None for `\\N`, an ISO date string for dates, a float or an int
+        for numbers, otherwise the value itself. Invalid dates and numbers become None, as
+        with DuckDB's `TRY_STRPTIME` and `TRY_CAST`.
+    """
+
+    if value == r"\N":
+        return None
+    try:
+        if dtype == "date":
+            if len(value) != 8:
+                return None
+            return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8])).isoformat()
+        if dtype in ["float", "int"]:
+            return float(value) if dtype == "float" else int(value)
+    except ValueError:
+        return None
+    return value
+
+
+def load_csv_sqlite(conn, file_paths: list[str], table_name: str) -> int:
+    """
+    Loads transformed files into a SQLite table with batched inserts.
+
+    Each file is inserted in one transaction, `WRITE_CHUNK_SIZE` rows per `executemany`.
+    The values of TSV files are unescaped before conversion.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite connection.
+        file_paths (list[str]): A list of file paths to the CSV files to be loaded.
+        table_name (str): The name of the table into which the data will be loaded.
+    Returns:
+        int: The number of rows loaded.
+    """
+
+    dtypes = list(TABLE_FIELDS[table_name].values())
+    sql = f"INSERT INTO {table_name} VALUES ({', '.join(['?'] * len(dtypes))});"
+    loaded_rows = 0
+
+    for file_path in file_paths:
+        is_tsv = get_file_format(file_path) == "tsv"
+        with open_compressed(file_path, "rt", encoding="utf-8", newline="") as file:
+            if is_tsv:
+                reader = csv.reader(file, delimiter="\t", quoting=csv.QUOTE_NONE)
+            else:
+                reader = csv.reader(file, delimiter=";")
+            next(reader, None)  # header
+
+            batch = []
+            for row in reader:
+                if is_tsv:
+                    row = [unescape_tsv_value(value) for value in row]
+                batch.append(
+                    [convert_sqlite_value(value, dtype) for value, dtype in zip(row, dtypes)]
+                )
+                if len(batch) == WRITE_CHUNK_SIZE:
+                    conn.executemany(sql, batch)
+                    loaded_rows += len(batch)
+                    batch = []
+            if batch:
+                conn.executemany(sql, batch)
+                loaded_rows += len(batch)
+
+        conn.commit()
+
+    return loaded_rows
+
+
+def build_keys_and_indexes(conn):
+    """
+    Removes duplicated keys and builds the primary key and secondary indexes of every table.
+
+    Duplicated keys are resolved by keeping the first loaded row, matching the MySQL
+    `LOAD DATA LOCAL` behaviour. Primary keys are built as unique indexes.
+
+    Args:
+        conn: The DuckDB or SQLite connection.
+    """
+
+    for table in get_managed_tables():
+        keys = ", ".join(TABLE_PRIMARY_KEYS[table])
+
+        logging.info(f"Building {table} keys and indexes...")
+        conn.execute(
+            f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table} GROUP BY {keys});"
+        )
+        conn.execute(get_primary_key_sql(table, DB_TYPE))
+
+        for statement in get_index_sql(table, DB_TYPE):
+            conn.execute(statement)
+
+    conn.commit()
+
+
+def load_data_embedded(transformed_data: list[str], month: str):
+    """
+    Loads transformed data into an embedded DuckDB or SQLite database file.
+
+    This function performs the following steps:
+    1. Drops and recreates the tables from the schema registry.
+    2. Inserts the default and missing data from the same scripts used by the MySQL loader.
+    3. Bulk-loads the transformed files, with DuckDB's CSV reader or SQLite batched inserts.
+    4. Removes duplicated keys and builds the keys and indexes.
+    5. Records the month in `load_log` and closes the connection.
+
+    Args:
+        transformed_data (list[str]): A list of transformed data file paths.
+        month (str): The year and month in the format 'YYYY-MM' being loaded.
+    """
+
+    conn = EMBEDDED_CONN.get_connection()
+    if DB_TYPE == "sqlite":
+        conn.execute("PRAGMA journal_mode = OFF;")
+        conn.execute("PRAGMA synchronous = OFF;")
+
+    create_tables(conn)
+
+    logging.info("Inserting default data...")
+    execute_sql_file(conn, "src/sql/default_insert.sql")
+
+    logging.info("Inserting missing data...")
+    execute_sql_file(conn, "src/sql/missing_data.sql")
+
+    load_csv = load_csv_duckdb if DB_TYPE == "duckdb" else load_csv_sqlite
+    for table in TABLES_TO_LOAD.values():
+        files = get_table_files(table, transformed_data)
+        if files:
+            logging.info(f"{table.upper()} - Loading {len(files)} files...")
+            with METRICS.timer("load", table), profiling.profile_unit("load", table):
+                loaded_rows = load_csv(conn, files, table)
+            METRICS.add("load", "rows_written", loaded_rows, table)
+            logging.info(f"{table} loaded successfully ({loaded_rows} rows).")
+
+    build_keys_and_indexes(conn)
+
+    logging.info("Saving load log...")
+    conn.execute("INSERT INTO load_log (selected_year_month) VALUES (?);", (month,))
+    conn.commit()
+
+    logging.info("Data loading complete.")
+    EMBEDDED_CONN.close_connection()
@@ -0,0 +1,300 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from constants.table_fields import TABLE_FIELDS
+from constants.table_primary_keys import TABLE_PRIMARY_KEYS
+from load.load_data import LOAD_MODE, TABLES_TO_LOAD, get_managed_tables, get_table_files
+from utils.database.conn import PG_CONN
+from utils.database.schema import (
+    get_create_tables_sql,
+    get_index_sql,
+    get_primary_key_sql,
+)
+from utils.helpers import (
+    get_config,
+    get_file_format,
+    open_compressed,
+    split_sql_statements,
+)
+from utils.metrics import METRICS
+import utils.profiling as profiling
+
+# Configuration
+config = get_config()
+LOAD_WORKERS = config["performance"]["load_workers"]
+
+
+def execute_sql_file(conn, url: str):
+    """
+    Reads and executes SQL statements from a file on a PostgreSQL connection.
+
+    Args:
+        conn (psycopg2.extensions.connection): The connection to execute the statements on.
+        url (str): The file path to the SQL file.
+    Raises:
+        psycopg2.Error: If there is an error executing any of the SQL statements.
+    """
+
+    with open(url, "r") as f:
+        statements = split_sql_statements(f.read())
+
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+    conn.commit()
+
+
+def reset_tables(conn):
+    """
+    Drops the managed tables and recreates them as UNLOGGED tables without keys or indexes.
+
+    The id tables and the missing RFB rows are filled right away, from the same scripts
+    used by the MySQL loader.
+
+    Args:
+        conn (psycopg2.extensions.connection): The connection to execute the statements on.
+    Raises:
+        psycopg2.Error: If there is an error executing any of the SQL statements.
+    """
+
+    logging.info("Dropping existing tables...")
+    with conn.cursor() as cursor:
+        for table in get_managed_tables():
+            cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE;")
+    conn.commit()
+
+    logging.info("Recreating tables...")
+    with conn.cursor() as cursor:
+        for statement in get_create_tables_sql(
+            "postgresql", with_keys=False, unlogged=True
+        ):
+            cursor.execute(statement)
+    conn.commit()
+
+    logging.info("Inserting default data...")
+    execute_sql_file(conn, "src/sql/default_insert.sql")
+
+    logging.info("Inserting missing data...")
+    execute_sql_file(conn, "src/sql/missing_data.sql")
+
+
+def copy_csv_to_db(file_path: str, table_name: str) -> int:
+    """
+    Streams a transformed file into a table with `COPY ... FROM STDIN`.
+
+    Each call uses its own connection, so several files can be copied in parallel.
+    Compressed files are decompressed on the fly.
+    CSV files are copied in CSV format, reading the quoted `\\N` markers as NULL through
+    `FORCE_NULL`. TSV files already use the escaping of the COPY text format, so they are
+    copied as is after skipping their header.
+
+    Args:
+        file_path (str): The path to the transformed file.
+        table_name (str): The name of the table into which the data will be loaded.
+    Returns:
+        int: The number of rows loaded.
+    Raises:
+        psycopg2.Error: If the copy fails. Nothing from the file is kept in that case.
+    """
+
+    is_tsv = get_file_format(file_path) == "tsv"
+    file_name = os.path.basename(file_path)
+    conn = PG_CONN.create_new_connection()
+    try:
+        with METRICS.timer("load", file_name), profiling.profile_unit(
+            "load", file_name
+        ), conn.cursor() as cursor:
+            columns = ", ".join(TABLE_FIELDS[table_name])
+            if is_tsv:
+                sql = f"COPY {table_name} ({columns}) FROM STDIN WITH (ENCODING 'UTF8')"
+            else:
+                sql = (
+                    f"COPY {table_name} ({columns}) FROM STDIN WITH ("
+                    f"FORMAT csv, DELIMITER ';', HEADER true, NULL '\\N', "
+                    f"FORCE_NULL ({columns}), ENCODING 'UTF8')"
+                )
+            with open_compressed(file_path, "rb") as file:
+                if is_tsv:
+                    file.readline()  # header
+                cursor.copy_expert(sql, file)
+            loaded_rows = cursor.rowcount
+        conn.commit()
+        METRICS.add("load", "rows_written", loaded_rows, file_name)
+        return loaded_rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def finalize_table(table_name: str):
+    """
+    Removes duplicated keys from a table, makes it LOGGED and adds its primary key.
+
+    Duplicated keys are resolved by keeping the first copied row, matching the MySQL
+    `LOAD DATA LOCAL` behaviour.
+
+    Args:
+        table_name (str): The name of the table.
+    Raises:
+        psycopg2.Error: If there is an error executing any of the SQL statements.
+    """
+
+    conn = PG_CONN.create_new_connection()
+    try:
+        with conn.cursor() as cursor:
+            keys = ", ".join(TABLE_PRIMARY_KEYS[table_name])
+            cursor.execute(
+                f"""
+                DELETE FROM {table_name} WHERE ctid IN (
+                    SELECT ctid FROM (
+                        SELECT ctid, ROW_NUMBER() OVER (PARTITION BY {keys} ORDER BY ctid) AS rn
+                        FROM {table_name}
+                    ) duplicated WHERE duplicated.rn > 1
+                );
+                """
+            )
+            if cursor.rowcount:
+                logging.warning(
+                    f"Removed {cursor.rowcount} rows with duplicated keys from {table_name}."
+                )
+
+            cursor.execute(f"ALTER TABLE {table_name} SET LOGGED;")
+            cursor.execute(get_primary_key_sql(table_name, "postgresql"))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def execute_statement(statement: str):
+    """
+    Executes a single SQL statement on its own connection.
+
+    Args:
+        statement (str): The SQL statement.
+    Raises:
+        psycopg2.Error: If there is an error executing the statement.
+    """
+
+    conn = PG_CONN.create_new_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def build_keys_and_indexes():
+    """
+    Builds the primary keys and indexes generated by `utils.database.schema` after the load.
+
+    Tables are finalized in parallel (see `finalize_table`), then every index is built in
+    parallel on its own connection, up to `LOAD_WORKERS` at a time.
+
+    Raises:
+        psycopg2.Error: If there is an error executing any of the SQL statements.
+    """
+
+    tables = get_managed_tables()
+    indexes = [
+        statement for table in tables for statement in get_index_sql(table, "postgresql")
+    ]
+
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        logging.info("Adding primary keys...")
+        for future in as_completed(
+            executor.submit(finalize_table, table) for table in tables
+        ):
+            future.result()
+
+        logging.info("Building indexes...")
+        for future in as_completed(
+            executor.submit(execute_statement, statement) for statement in indexes
+        ):
+            future.result()
+
+
+def log_dataload(conn, month: str):
+    """
+    Logs the data load operation for a specific month into the `load_log` table.
+
+    Args:
+        conn (psycopg2.extensions.connection): The connection to execute the query on.
+        month (str): The year and month in the format 'YYYY-MM' to be logged.
+    """
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO load_log (selected_year_month) VALUES (%s);", (month,)
+        )
+    conn.commit()
+
+
+def load_data_postgres(transformed_data: list[str], month: str):
+    """
+    Loads transformed data into PostgreSQL.
+
+    This function performs the following steps:
+    1. Drops the tables and recreates them as UNLOGGED tables without keys or indexes.
+    2. Copies every transformed file with `COPY ... FROM STDIN`, `LOAD_WORKERS` files at a time,
+       each on its own connection.
+    3. Removes duplicated keys, makes the tables LOGGED and builds the primary keys and indexes.
+    4. Records the month in `load_log` and closes the connection.
+
+    Args:
+        transformed_data (list[str]): A list of transformed data file paths.
+        month (str): The year and month in the format 'YYYY-MM' being loaded.
+    Raises:
+        ValueError: If `settings.load_mode` is not "full", the only mode of this backend.
+        Exception: If any file failed to load. The month is not recorded in `load_log`.
+    """
+
+    if LOAD_MODE != "full":
+        raise ValueError(
+            f'settings.load_mode "{LOAD_MODE}" is not supported with database.type: postgresql, '
+            'only "full".'
+        )
+
+    conn = PG_CONN.get_connection()
+    reset_tables(conn)
+
+    files = [
+        (file_path, table)
+        for table in TABLES_TO_LOAD.values()
+        for file_path in get_table_files(table, transformed_data)
+    ]
+
+    failed_files = []
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+        futures = {
+            executor.submit(copy_csv_to_db, file_path, table): (file_path, table)
+            for file_path, table in files
+        }
+        for future in as_completed(futures):
+            file_path, table = futures[future]
+            try:
+                logging.info(
+                    f"{table.upper()} - Successfully loaded {future.result()} rows from {file_path}."
+                )
+            except Exception as e:
+                logging.error(f"{table.upper()} - Failed to load {file_path}: {e}")
+                failed_files.append(file_path)
+
+    if failed_files:
+        PG_CONN.close_connection()
+        raise Exception(f"{len(failed_files)} files of {month} failed to load.")
+
+    build_keys_and_indexes()
+
+    logging.info("Saving load log...")
+    log_dataload(conn, month)
+
+    logging.info("Data loading complete.")
+    PG_CONN.close_connection()
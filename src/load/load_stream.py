@@ -0,0 +1,254 @@
+import contextlib
+import logging
+import os
+import threading
+
+from load.load_data import (
+    DB_TYPE,
+    LOAD_MODE,
+    TABLES_TO_LOAD,
+    check_files_loaded,
+    drop_and_recreate_tables,
+    get_load_data_sql,
+    get_table_files,
+    load_csv_to_db,
+    log_dataload,
+    read_sql_file,
+)
+from transform.transform_data import (
+    COMPRESSION_LEVEL,
+    TRANSFORMED_PATH,
+    get_derived_tables,
+    get_latest_extracted_data,
+    get_output_file_path,
+    get_table_name,
+    is_summary_table,
+    write_transformed_csv,
+)
+from utils.helpers import (
+    get_partial_path,
+    open_compressed,
+    open_fifo_for_writing,
+    release_fifo_reader,
+    strip_compression_suffix,
+)
+from utils.manifest import RunManifest
+from utils.metrics import METRICS
+import utils.profiling as profiling
+
+# Database connections
+match (DB_TYPE):
+    case "mysql":
+        from utils.database.conn import MYSQL_CONN
+
+
+def stream_csv_to_db(csv_file_path: str, manifest: RunManifest | None = None) -> int | None:
+    """
+    Transforms an extracted CSV file straight into its table through a named pipe.
+
+    A loader thread runs `LOAD DATA LOCAL INFILE` on the pipe in its own transaction,
+    while the calling thread transforms the file into it, so the file's table is not written
+    to `TRANSFORMED_PATH`. The load is only committed if both sides succeed:
+    - if the transform fails, the pipe is closed early and the load is rolled back;
+    - if the load fails, the transform stops with a broken pipe (or before it starts).
+    The tables derived from the file's table cannot share the pipe, so they are written to
+    intermediate files in `TRANSFORMED_PATH`. Exploded tables are loaded once the load is
+    committed and then removed; summary tables are kept and loaded once every file is
+    streamed (see `stream_data`). The extracted file is recorded in the run manifest once every table is loaded,
+    and only then removed.
+
+    Args:
+        csv_file_path (str): The path to the extracted CSV file.
+        manifest (RunManifest | None): The run manifest of the month, if any.
+    Returns:
+        int | None: The number of rows loaded, or None if the file was skipped or failed.
+    """
+
+    table_name = get_table_name(csv_file_path)
+    if not table_name:
+        logging.warning(f"Could not determine table for {csv_file_path}, skipping.")
+        return None
+
+    fifo_path = f"{strip_compression_suffix(get_output_file_path(csv_file_path, table_name))}.fifo"
+    if os.path.exists(fifo_path):
+        os.remove(fifo_path)
+    os.mkfifo(fifo_path)
+
+    loader_failed = threading.Event()
+    transform_done = threading.Event()
+    transform_failed = threading.Event()
+    result = {}
+
+    def load():
+        conn = MYSQL_CONN.create_new_connection()
+        conn.autocommit = False
+        cursor = conn.cursor()
+        try:
+            cursor.execute(get_load_data_sql(fifo_path, table_name))
+            transform_done.wait()
+            if transform_failed.is_set():
+                conn.rollback()
+                logging.warning(f"Rolled back the load of {csv_file_path}.")
+            else:
+                conn.commit()
+                result["rows"] = cursor.rowcount
+        except Exception as e:
+            loader_failed.set()
+            conn.rollback()
+            logging.error(f"{table_name.upper()} - Failed to load {csv_file_path}: {e}")
+        finally:
+            cursor.close()
+            conn.close()
+
+    logging.info(f"{table_name.upper()} - Streaming {csv_file_path} into {table_name} table...")
+    loader = threading.Thread(target=load, name=f"load-{table_name}")
+    file_name = os.path.basename(csv_file_path)
+
+    derived_files = {
+        table: get_output_file_path(csv_file_path, table)
+        for table in get_derived_tables(table_name)
+    }
+
+    with METRICS.timer("load", file_name), profiling.profile_unit("load", file_name):
+        loader.start()
+        try:
+            with contextlib.ExitStack() as stack:
+                derived_outputs = {
+                    table: stack.enter_context(
+                        open_compressed(
+                            get_partial_path(derived_file),
+                            "wt",
+                            COMPRESSION_LEVEL,
+                            encoding="utf-8",
+                            newline="",
+                        )
+                    )
+                    for table, derived_file in derived_files.items()
+                }
+                output = stack.enter_context(
+                    open_fifo_for_writing(
+                        fifo_path, loader_failed, encoding="utf-8", newline=""
+                    )
+                )
+                write_transformed_csv(csv_file_path, table_name, output, derived_outputs)
+            for derived_file in derived_files.values():
+                os.replace(get_partial_path(derived_file), derived_file)
+        except Exception as e:
+            transform_failed.set()
+            if not loader_failed.is_set():
+                logging.error(f"Error processing {csv_file_path}: {e}")
+        finally:
+            transform_done.set()
+            # The loader can still be blocked opening the pipe if the transform failed first
+            release_fifo_reader(fifo_path, loader)
+            os.remove(fifo_path)
+
+    if "rows" not in result:
+        return None
+
+    METRICS.add("load", "rows_written", result["rows"], file_name)
+
+    for table, derived_file in derived_files.items():
+        if is_summary_table(table):
+            continue
+        load_csv_to_db([derived_file], table, manifest=manifest)
+        if manifest is not None and not manifest.is_done(
+            "loaded", os.path.basename(derived_file)
+        ):
+            return None
+        os.remove(derived_file)
+
+    if manifest is not None:
+        manifest.mark_done("loaded", file_name, table=table_name, rows=result["rows"])
+    os.remove(csv_file_path)
+    logging.info(
+        f"{table_name.upper()} - Successfully streamed {result['rows']} rows and removed {csv_file_path}."
+    )
+    return result["rows"]
+
+
+def check_streaming_supported():
+    """
+    Checks that the configured database and load mode can be streamed into.
+
+    Streaming loads each file into the live MySQL tables as it is transformed, which is a
+    `full` load: it would bypass the shadow tables, drop the stored months of a historical
+    load, and has no delta to apply.
+
+    Raises:
+        ValueError: If `database.type` is not "mysql" or `settings.load_mode` is not "full".
+    """
+
+    if DB_TYPE != "mysql" or LOAD_MODE != "full":
+        raise ValueError(
+            "settings.streaming_load requires database.type: mysql and settings.load_mode: "
+            f"full (got {DB_TYPE} and {LOAD_MODE}). Disable streaming_load to use the others."
+        )
+
+
+def stream_data(csv_files_paths: list[str] = []):
+    """
+    Runs the Transform and Load steps at the same time, file by file, without intermediate files.
+
+    This function performs the following steps:
+    1. Drops and recreates the tables and inserts the default and missing data, unless an
+       interrupted streaming load of the month is resumed (see `RunManifest`).
+    2. Streams every extracted file not loaded yet into its table (see `stream_csv_to_db`),
+       lookup tables first.
+    3. Merges the summary tables counted while streaming and loads them.
+    4. Records the month in `load_log`, once every file is loaded (see `check_files_loaded`).
+
+    Args:
+        csv_files_paths (list[str], optional): Paths to the extracted CSV files. Defaults to the
+                                               files of the latest (or user-selected) extracted month.
+    Raises:
+        ValueError: If the database or load mode cannot be streamed into (see
+                    `check_streaming_supported`).
+    """
+
+    check_streaming_supported()
+    csv_files_paths = csv_files_paths or get_latest_extracted_data()
+    month = os.path.basename(os.path.dirname(csv_files_paths[0]))
+    month_path = os.path.join(TRANSFORMED_PATH, month)
+    os.makedirs(month_path, exist_ok=True)
+    manifest = RunManifest(month)
+    METRICS.set_month(month)
+
+    if not manifest.start_load():
+        # Resetting database state
+        drop_and_recreate_tables()
+
+        logging.info("Inserting default data...")
+        read_sql_file("src/sql/default_insert.sql")
+
+        logging.info("Inserting missing data...")
+        read_sql_file("src/sql/missing_data.sql")
+
+    loaded_files = []
+    for table in TABLES_TO_LOAD.values():
+        if is_summary_table(table):
+            continue
+        table_files = [path for path in csv_files_paths if get_table_name(path) == table]
+        loaded_files += table_files
+        for csv_file_path in table_files:
+            if manifest.is_done("loaded", os.path.basename(csv_file_path)):
+                logging.info(f"Skipping {csv_file_path}, already loaded.")
+                continue
+            stream_csv_to_db(csv_file_path, manifest)
+        logging.info(f"{table} streamed.")
+
+    summary_files = [os.path.join(month_path, name) for name in os.listdir(month_path)]
+    for table in TABLES_TO_LOAD.values():
+        if is_summary_table(table):
+            files = get_table_files(table, summary_files)
+            if files:
+                load_csv_to_db(files, table, manifest=manifest)
+                loaded_files += files
+
+    check_files_loaded(manifest, loaded_files)
+
+    logging.info("Saving load log...")
+    log_dataload(month)
+    manifest.finish_load()
+
+    logging.info("Streaming load complete.")
@@ -0,0 +1,151 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from constants.table_schema import TABLE_SCHEMA
+from utils.database.schema import (
+    SEARCH_DATABASES,
+    SEARCH_SETUP_SQL,
+    get_search_index_sql,
+    get_search_query,
+)
+from utils.helpers import get_config
+from utils.metrics import METRICS
+
+# Configuration
+config = get_config()
+DB_TYPE = config["database"]["type"]
+LOAD_MODE = config["settings"]["load_mode"]
+LOAD_WORKERS = config["performance"]["load_workers"]
+
+# Database connections
+match (DB_TYPE):
+    case "mysql":
+        from utils.database.conn import MYSQL_CONN
+    case "postgresql":
+        from utils.database.conn import PG_CONN
+    case "duckdb" | "sqlite":
+        from utils.database.conn import EMBEDDED_CONN
+
+
+def get_search_columns() -> list[tuple[str, str]]:
+    """Returns the search columns of `TABLE_SCHEMA`, as (table, column) pairs."""
+    return [
+        (table, column)
+        for table, schema in TABLE_SCHEMA.items()
+        for column in schema.get("search", [])
+    ]
+
+
+def execute_statements(statements: list[str]):
+    """
+    Executes SQL statements in order and commits them.
+
+    MySQL and PostgreSQL statements run on their own connection, so several calls can run
+    in parallel. SQLite has a single writer, so they run on the module connection.
+
+    Args:
+        statements (list[str]): The SQL statements.
+    """
+
+    match DB_TYPE:
+        case "mysql":
+            conn = MYSQL_CONN.create_new_connection()
+        case "postgresql":
+            conn = PG_CONN.create_new_connection()
+        case _:
+            conn = EMBEDDED_CONN.get_connection()
+
+    try:
+        cursor = conn.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if DB_TYPE in ["mysql", "postgresql"]:
+            conn.close()
+
+
+def build_search_index(table_name: str, column: str):
+    """
+    Builds (or rebuilds) the text search index of a search column on the loaded table
+    (see `utils.database.schema.get_search_index_sql`).
+
+    Args:
+        table_name (str): The name of the table.
+        column (str): The search column.
+    """
+
+    logging.info(f"{table_name.upper()} - Building the {column} search index...")
+    with METRICS.timer("search_index", f"{table_name}.{column}"):
+        execute_statements(
+            get_search_index_sql(
+                table_name, column, DB_TYPE, historical=LOAD_MODE == "historical"
+            )
+        )
+    logging.info(f"{table_name.upper()} - {column} search index built.")
+
+
+def build_search_indexes():
+    """
+    Builds the text search indexes of the name columns after the data is loaded.
+
+    The indexes of the `TABLE_SCHEMA` search columns (`empresa.razao_social` and
+    `estabelecimento.nome_fantasia`) are built on MySQL and PostgreSQL in parallel, up to
+    `performance.load_workers` at a time, each on its own connection, and one after the
+    other on SQLite. They are rebuilt from scratch on every run, so they should be built
+    again after each load. DuckDB has no search index and is skipped.
+
+    Raises:
+        Exception: If an index could not be built.
+    """
+
+    if DB_TYPE not in SEARCH_DATABASES:
+        logging.warning(f"Search indexes are not supported on {DB_TYPE}, skipping.")
+        return
+
+    execute_statements(SEARCH_SETUP_SQL.get(DB_TYPE, []))
+    columns = get_search_columns()
+
+    if DB_TYPE == "sqlite":
+        for table_name, column in columns:
+            build_search_index(table_name, column)
+        EMBEDDED_CONN.close_connection()
+    else:
+        with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as executor:
+            for future in as_completed(
+                executor.submit(build_search_index, table_name, column)
+                for table_name, column in columns
+            ):
+                future.result()
+
+    logging.info("Search indexes built.")
+
+
+def search_names(
+    conn, table_name: str, column: str, term: str, indexed: bool = True
+) -> list[tuple]:
+    """
+    Searches the rows of a table whose search column contains a term
+    (see `utils.database.schema.get_search_query`).
+
+    Args:
+        conn: The database connection.
+        table_name (str): The name of the table.
+        column (str): The search column.
+        term (str): The searched text.
+        indexed (bool): Whether to use the search index of the column (see `build_search_indexes`).
+    Returns:
+        list[tuple]: The primary keys of the matching rows.
+    """
+
+    sql, parameters = get_search_query(table_name, column, term, DB_TYPE, indexed)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, parameters)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
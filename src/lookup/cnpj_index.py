@@ -0,0 +1,281 @@
+import csv
+import logging
+import mmap
+import os
+import re
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from constants.table_fields import TABLE_FIELDS
+from load.load_data import get_latest_transformed_data, get_separated_files
+from transform.transform_data import escape_tsv_values
+from utils.helpers import get_config, get_file_format, get_partial_path, unescape_tsv_value
+from utils.metrics import METRICS
+
+# Configuration
+config = get_config()
+INDEX_PATH = config["paths"]["index_path"]
+READ_CHUNK_SIZE = config["performance"]["read_chunk_size"]
+# Indexed tables and their key columns, whose digits make up the uint64 key
+INDEXED_TABLES = {
+    "estabelecimento": ["cnpj_basico", "cnpj_ordem", "cnpj_dv"],
+    "empresa": ["cnpj_basico"],
+    "simples": ["cnpj_basico"],
+}
+# Digits of each key column
+KEY_WIDTHS = {"cnpj_basico": 8, "cnpj_ordem": 4, "cnpj_dv": 2}
+NULL = r"\N"
+
+
+def get_index_file_path(index_dir: str, table_name: str, part: str) -> str:
+    """Returns the path of a part ("keys", "starts", "lengths" or "records") of a table index."""
+    extension = "records" if part == "records" else f"{part}.npy"
+    return os.path.join(index_dir, f"{table_name}.{extension}")
+
+
+def get_key_width(table_name: str) -> int:
+    """Returns the number of digits of the keys of an indexed table (14 for a full CNPJ)."""
+    return sum(KEY_WIDTHS[column] for column in INDEXED_TABLES[table_name])
+
+
+def read_records(file_path: str, table_name: str):
+    """
+    Reads a transformed file in chunks of raw values, TSV-escaped with `\\N` for NULL, the way
+    records are stored in the index (see `build_table_index`).
+    """
+
+    is_tsv = get_file_format(file_path) == "tsv"
+    for chunk in pd.read_csv(
+        file_path,
+        sep="\t" if is_tsv else ";",
+        quoting=csv.QUOTE_NONE if is_tsv else csv.QUOTE_MINIMAL,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8",
+        chunksize=READ_CHUNK_SIZE,
+    ):
+        # TSV values are already escaped
+        yield chunk if is_tsv else escape_tsv_values(chunk, table_name)
+
+
+def build_table_index(file_paths: list[str], table_name: str, index_dir: str) -> int:
+    """
+    Builds the index of a table from its transformed files.
+
+    The index is made of four files:
+    - `{table}.records`: the rows, each as its TSV-escaped values joined by tabs, in file order;
+    - `{table}.keys.npy`: the sorted uint64 keys (the digits of the key columns, e.g. the
+      full CNPJ for estabelecimento);
+    - `{table}.starts.npy` and `{table}.lengths.npy`: the byte range of each key's record.
+    Rows with a key that is not made of digits are skipped, and the first row of a repeated key
+    is kept, as in the load. The keys, starts and lengths (20 bytes per row) are sorted in memory.
+
+    Args:
+        file_paths (list[str]): The transformed files of the table.
+        table_name (str): The name of the table.
+        index_dir (str): The directory the index files are written to.
+    Returns:
+        int: The number of rows indexed.
+    """
+
+    key_columns = INDEXED_TABLES[table_name]
+    keys, starts, lengths = [], [], []
+    position = 0
+
+    with open(get_index_file_path(index_dir, table_name, "records"), "wb") as records:
+        for file_path in file_paths:
+            for chunk in read_records(file_path, table_name):
+                key = chunk[key_columns[0]].str.cat(chunk[key_columns[1:]])
+                valid = key.str.fullmatch(rf"\d{{{get_key_width(table_name)}}}").to_numpy(
+                    dtype=bool
+                )
+                chunk = chunk[valid]
+                columns = list(chunk.columns)
+                encoded = (
+                    chunk[columns[0]].str.cat(chunk[columns[1:]], sep="\t").str.encode("utf-8")
+                )
+                chunk_lengths = encoded.str.len().to_numpy(dtype=np.uint32)
+
+                records.write(b"".join(encoded))
+                keys.append(key[valid].to_numpy(dtype=np.uint64))
+                starts.append(position + np.cumsum(chunk_lengths, dtype=np.uint64) - chunk_lengths)
+                lengths.append(chunk_lengths)
+                position += int(chunk_lengths.sum(dtype=np.uint64))
+
+    keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    if not first.all():
+        logging.warning(f"{table_name.upper()} - Skipped {(~first).sum()} duplicated keys.")
+    order = order[first]
+
+    np.save(get_index_file_path(index_dir, table_name, "keys"), keys[first])
+    for part, values, dtype in [("starts", starts, np.uint64), ("lengths", lengths, np.uint32)]:
+        values = np.concatenate(values) if values else np.empty(0, dtype=dtype)
+        np.save(get_index_file_path(index_dir, table_name, part), values[order])
+    return len(order)
+
+
+def build_cnpj_index(transformed_data: list[str] = []) -> str:
+    """
+    Builds the CNPJ lookup index of a month from its transformed files.
+
+    estabelecimento is indexed by the full CNPJ (`cnpj_completo`), and empresa and simples by
+    `cnpj_basico` (see `build_table_index`). The files are written to
+    `paths.index_path/{month}/`, replacing the previous index of the month once complete, and
+    are read with `CnpjIndex`.
+
+    Args:
+        transformed_data (list[str], optional): Paths to the transformed files. Defaults to the
+                                                files of the latest (or user-selected) month.
+    Returns:
+        str: The index directory.
+    Raises:
+        FileNotFoundError: If there are no transformed files of an indexed table.
+    """
+
+    transformed_data = transformed_data or get_latest_transformed_data()
+    month = os.path.basename(os.path.dirname(transformed_data[0]))
+    METRICS.set_month(month)
+
+    index_dir = os.path.join(INDEX_PATH, month)
+    partial_dir = get_partial_path(index_dir)
+    shutil.rmtree(partial_dir, ignore_errors=True)
+    os.makedirs(partial_dir)
+
+    try:
+        for table_name in INDEXED_TABLES:
+            file_paths = get_separated_files(table_name, transformed_data)
+            if not file_paths:
+                raise FileNotFoundError(f"No transformed {table_name} files found for {month}.")
+            logging.info(f"{table_name.upper()} - Building the CNPJ index...")
+            with METRICS.timer("index", table_name):
+                rows = build_table_index(file_paths, table_name, partial_dir)
+            METRICS.add("index", "rows_written", rows, table_name)
+            logging.info(f"{table_name.upper()} - Indexed {rows} rows.")
+    except Exception:
+        shutil.rmtree(partial_dir, ignore_errors=True)
+        raise
+
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(partial_dir, index_dir)
+    logging.info(f"CNPJ index written to {index_dir}.")
+    return index_dir
+
+
+def get_latest_index_dir() -> str:
+    """Returns the index directory of the latest indexed month."""
+    months = sorted(
+        name for name in os.listdir(INDEX_PATH) if not name.startswith(".")
+    ) if os.path.isdir(INDEX_PATH) else []
+    if not months:
+        raise FileNotFoundError(f"No CNPJ index found in {INDEX_PATH}.")
+    return os.path.join(INDEX_PATH, months[-1])
+
+
+class CnpjIndex:
+    """
+    Reads the CNPJ lookup index of a table (see `build_cnpj_index`) from memory-mapped files.
+
+    The keys are searched with a vectorized binary search (`numpy.searchsorted`), and records
+    are read from the page cache, without any database.
+
+    Attributes:
+      table_name (str): The indexed table.
+      columns (list[str]): The columns of the records.
+      key_width (int): The number of digits of the keys.
+      keys (np.ndarray): The sorted keys (memory-mapped).
+      starts (np.ndarray): The byte offset of each key's record (memory-mapped).
+      lengths (np.ndarray): The byte length of each key's record (memory-mapped).
+      records (mmap.mmap): The records file.
+
+    Example:
+        >>> index = CnpjIndex("estabelecimento")
+        >>> index.get("00.337.939/0001-46")["nome_fantasia"]
+    """
+
+    def __init__(self, table_name: str, index_dir: str | None = None):
+        index_dir = index_dir or get_latest_index_dir()
+        self.table_name = table_name
+        self.columns = list(TABLE_FIELDS[table_name])
+        self.key_width = get_key_width(table_name)
+        self.keys, self.starts, self.lengths = (
+            np.load(get_index_file_path(index_dir, table_name, part), mmap_mode="r")
+            for part in ["keys", "starts", "lengths"]
+        )
+        with open(get_index_file_path(index_dir, table_name, "records"), "rb") as file:
+            # An empty file cannot be mapped
+            self.records = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if os.fstat(file.fileno()).st_size
+                else b""
+            )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def close(self):
+        """Unmaps the records file."""
+        if isinstance(self.records, mmap.mmap):
+            self.records.close()
+
+    def read_record(self, position: int) -> dict[str, str | None]:
+        """Returns the record at a position of the keys, by column, with None for NULL."""
+        start = int(self.starts[position])
+        values = self.records[start : start + int(self.lengths[position])].decode("utf-8")
+        return {
+            column: None if value == NULL else unescape_tsv_value(value)
+            for column, value in zip(self.columns, values.split("\t"))
+        }
+
+    def find(self, cnpjs: list[str]) -> np.ndarray:
+        """
+        Returns the positions of CNPJs (formatted or not) in the keys, -1 for the ones not
+        found or with the wrong number of digits, with a single vectorized binary search.
+        """
+
+        digits = pd.Series(cnpjs, dtype=str).str.replace(r"\D", "", regex=True)
+        valid = (digits.str.len() == self.key_width).to_numpy(dtype=bool)
+        searched = np.zeros(len(digits), dtype=np.uint64)
+        searched[valid] = digits[valid].to_numpy(dtype=np.uint64)
+        positions = np.searchsorted(self.keys, searched)
+        found = valid & (positions < len(self.keys))
+        found[found] = self.keys[positions[found]] == searched[found]
+        return np.where(found, positions, -1)
+
+    def get(self, cnpj: str) -> dict[str, str | None] | None:
+        """Returns the record of a CNPJ (formatted or not), or None if it is not found."""
+        digits = re.sub(r"\D", "", str(cnpj))
+        if len(digits) != self.key_width:
+            return None
+        key = np.uint64(int(digits))
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return self.read_record(position)
+        return None
+
+    def get_many(self, cnpjs: list[str]) -> list[dict[str, str | None] | None]:
+        """Returns the records of CNPJs, in order, with None for the ones not found."""
+        return [
+            None if position < 0 else self.read_record(position)
+            for position in self.find(cnpjs).tolist()
+        ]
+
+    def get_by_prefix(self, prefix: str) -> list[dict[str, str | None]]:
+        """
+        Returns the records whose key starts with a prefix, in key order: e.g. every
+        establishment of a company from its `cnpj_basico`.
+        """
+
+        digits = re.sub(r"\D", "", str(prefix))
+        if not digits or len(digits) > self.key_width:
+            return []
+        scale = 10 ** (self.key_width - len(digits))
+        low, high = np.searchsorted(
+            self.keys, np.array([int(digits) * scale, (int(digits) + 1) * scale], dtype=np.uint64)
+        )
+        return [self.read_record(position) for position in range(low, high)]
@@ -0,0 +1,607 @@
+import http.client
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from constants.table_schema import HISTORICAL_TABLES
+from utils.database.conn import (
+    SQL_ALCHEMY_MYSQL_URL,
+    SQL_ALCHEMY_PG_URL,
+    SQL_ALCHEMY_SQLITE_URL,
+    SQLAlchemyConn,
+)
+from utils.helpers import get_config
+
+# Configuration
+config = get_config()
+DB_TYPE = config["database"]["type"]
+LOAD_MODE = config["settings"]["load_mode"]
+HOST = config["service"]["host"]
+PORT = config["service"]["port"]
+POOL_SIZE = config["service"]["pool_size"]
+BATCH_SIZE = config["service"]["batch_size"]
+BATCH_WAIT_SECONDS = config["service"]["batch_wait_ms"] / 1000
+CACHE_SIZE = config["service"]["cache_size"]
+CACHE_TTL_SECONDS = config["service"]["cache_ttl_seconds"]
+MONTH_CHECK_SECONDS = config["service"]["month_check_seconds"]
+LOAD_TEST_CNPJS = config["service"]["load_test_cnpjs"]
+LOAD_TEST_CONCURRENCY = config["service"]["load_test_concurrency"]
+LOAD_TEST_REQUESTS = config["service"]["load_test_requests"]
+BENCHMARK_PATH = config["paths"]["benchmark_path"]
+REQUEST_TIMEOUT = 30  # seconds a request waits for its batch
+SQL_ALCHEMY_URLS = {
+    "mysql": SQL_ALCHEMY_MYSQL_URL,
+    "postgresql": SQL_ALCHEMY_PG_URL,
+    "sqlite": SQL_ALCHEMY_SQLITE_URL,
+}
+NOT_FOUND = object()  # cached marker of a CNPJ that is not in the database
+
+
+class RecordCache:
+    """
+    A bounded LRU cache of records, whose entries expire `ttl` seconds after they are stored.
+
+    Each entry is stored with the state of the data it was read from (see
+    `LookupService.load_state`), and is only returned for that same state.
+
+    Attributes:
+      max_size (int): The maximum number of entries; the least recently used ones are evicted.
+      ttl (float): The lifetime of an entry, in seconds.
+      hits (int): The lookups answered by the cache.
+      misses (int): The lookups not in the cache, or expired.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, state=None):
+        """
+        Returns the value of a key, or None if it is not cached, has expired or was stored
+        for another state.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic() or entry[1] != state:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: str, value, state=None):
+        """
+        Stores the value of a key read at `state`, evicting the least recently used entries
+        beyond `max_size`.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, state, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Removes every entry."""
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class RequestBatcher:
+    """
+    Groups concurrent lookups into batches, each fetched with one query per table.
+
+    `workers` threads take the pending CNPJs from a queue: each waits for a first CNPJ, then
+    up to `wait` seconds for more, up to `batch_size`. Lookups of the same CNPJ in a batch are
+    fetched once.
+
+    Attributes:
+      fetch (Callable[[list[str]], dict[str, dict | None]]): Fetches the records of a batch.
+      batch_size (int): The maximum number of CNPJs per batch.
+      wait (float): The time a batch waits for more CNPJs, in seconds.
+      batches (int): The batches fetched.
+      batched (int): The CNPJs fetched in them.
+    """
+
+    def __init__(self, fetch, batch_size: int, wait: float, workers: int):
+        self.fetch = fetch
+        self.batch_size = batch_size
+        self.wait = wait
+        self.pending = queue.Queue()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.batched = 0
+        for number in range(workers):
+            threading.Thread(target=self.run, name=f"batcher-{number}", daemon=True).start()
+
+    def submit(self, cnpj: str) -> Future:
+        """Queues the lookup of a CNPJ and returns the future of its record."""
+        future = Future()
+        self.pending.put((cnpj, future))
+        return future
+
+    def take_batch(self) -> dict[str, list[Future]]:
+        """Waits for a batch of pending lookups and returns their futures by CNPJ."""
+        cnpj, future = self.pending.get()
+        batch = {cnpj: [future]}
+        deadline = time.monotonic() + self.wait
+        count = 1
+        while count < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                cnpj, future = self.pending.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.setdefault(cnpj, []).append(future)
+            count += 1
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.take_batch()
+            try:
+                records = self.fetch(list(batch))
+            except Exception as e:
+                logging.error(f"Failed to fetch a batch of {len(batch)} CNPJs: {e}")
+                for futures in batch.values():
+                    for future in futures:
+                        future.set_exception(e)
+                continue
+
+            with self.lock:
+                self.batches += 1
+                self.batched += len(batch)
+            for cnpj, futures in batch.items():
+                for future in futures:
+                    future.set_result(records.get(cnpj))
+
+
+def create_pool(pool_size: int) -> SQLAlchemyConn:
+    """
+    Returns a pool of `pool_size` SQLAlchemy connections to the configured database.
+
+    Raises:
+        Exception: If the database type has no SQLAlchemy URL (duckdb).
+    """
+
+    if DB_TYPE not in SQL_ALCHEMY_URLS:
+        raise Exception(f"The lookup service does not support {DB_TYPE} databases.")
+    return SQLAlchemyConn(
+        SQL_ALCHEMY_URLS[DB_TYPE], pool_size=pool_size, max_overflow=0, pool_pre_ping=True
+    )
+
+
+def rows_to_dicts(result) -> list[dict]:
+    """Returns the rows of a SQLAlchemy result as dicts by column."""
+    return [dict(row._mapping) for row in result]
+
+
+class LookupService:
+    """
+    Answers CNPJ lookups from the loaded database, through a pool of `service.pool_size`
+    SQLAlchemy connections.
+
+    A lookup is first searched in a `RecordCache` of `service.cache_size` records (missing
+    CNPJs included) kept for `service.cache_ttl_seconds`. Otherwise it is queued in a
+    `RequestBatcher`, whose `service.pool_size` workers fetch batches of up to
+    `service.batch_size` CNPJs, each on a pooled connection. Every `service.month_check_seconds`,
+    `load_log` is checked, and the cache is cleared when a load was recorded (see
+    `load.load_data.log_dataload`). Cached records are tagged with the load state they were
+    read at, so the records of batches still running when a load is recorded are not served
+    afterwards.
+
+    Attributes:
+      pool (SQLAlchemyConn): The pooled database connections.
+      cache (RecordCache): The cached records.
+      batcher (RequestBatcher): The pending lookups.
+      load_state (tuple | None): The number of loads in `load_log` and the latest month (None
+                                 while no load is recorded).
+      requests (int): The lookups answered.
+    """
+
+    def __init__(self):
+        self.pool = create_pool(POOL_SIZE)
+        self.cache = RecordCache(CACHE_SIZE, CACHE_TTL_SECONDS)
+        self.load_state = None
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.check_load_log()
+        self.batcher = RequestBatcher(self.fetch_records, BATCH_SIZE, BATCH_WAIT_SECONDS, POOL_SIZE)
+        threading.Thread(target=self.watch_load_log, name="load-log", daemon=True).start()
+
+    def check_load_log(self):
+        """Reads the loads recorded in `load_log`, and clears the cache if there is a new one."""
+        from sqlalchemy import text
+
+        with self.pool.get_pooled_connection() as conn:
+            count = conn.execute(text("SELECT COUNT(*) FROM load_log")).scalar()
+            month = conn.execute(
+                text("SELECT selected_year_month FROM load_log ORDER BY processed_at DESC LIMIT 1")
+            ).scalar()
+
+        if (count, month) != self.load_state:
+            if self.load_state is not None:
+                logging.info(f"New load of {month} recorded, clearing the cache.")
+            self.cache.clear()
+            self.load_state = (count, month)
+
+    def watch_load_log(self):
+        while True:
+            time.sleep(MONTH_CHECK_SECONDS)
+            try:
+                self.check_load_log()
+            except Exception as e:
+                logging.warning(f"Could not check load_log: {e}")
+
+    def fetch_records(self, cnpjs: list[str]) -> dict[str, dict]:
+        """
+        Fetches the records of a batch of CNPJs, with one query per table: the establishments,
+        then the companies, partners and Simples options of their `cnpj_basico`.
+
+        In "historical" mode, the main tables are read at the latest loaded month, so no
+        record is found while no load is recorded in `load_log`.
+
+        Args:
+            cnpjs (list[str]): The 14-digit CNPJs.
+        Returns:
+            dict[str, dict]: The records of the CNPJs found, by CNPJ.
+        """
+
+        from sqlalchemy import bindparam, text
+
+        month = self.load_state[1]
+        if LOAD_MODE == "historical" and month is None:
+            return {}
+
+        parameters = {}
+        conditions = []
+        for number, cnpj in enumerate(cnpjs):
+            conditions.append(
+                f"(cnpj_basico = :b{number} AND cnpj_ordem = :o{number} AND cnpj_dv = :d{number})"
+            )
+            parameters.update(
+                {f"b{number}": cnpj[:8], f"o{number}": cnpj[8:12], f"d{number}": cnpj[12:]}
+            )
+
+        def month_filter(table_name: str) -> str:
+            if LOAD_MODE == "historical" and table_name in HISTORICAL_TABLES:
+                parameters["ref_month"] = int(month.replace("-", ""))
+                return " AND ref_month = :ref_month"
+            return ""
+
+        with self.pool.get_pooled_connection() as conn:
+            establishments = rows_to_dicts(
+                conn.execute(
+                    text(
+                        f"SELECT * FROM estabelecimento WHERE ({' OR '.join(conditions)})"
+                        f"{month_filter('estabelecimento')}"
+                    ),
+                    parameters,
+                )
+            )
+            keys = sorted({row["cnpj_basico"] for row in establishments})
+            related = {}
+            if keys:
+                for table_name in ["empresa", "socio", "simples"]:
+                    related[table_name] = {}
+                    for row in rows_to_dicts(
+                        conn.execute(
+                            text(
+                                f"SELECT * FROM {table_name} WHERE cnpj_basico IN :keys"
+                                f"{month_filter(table_name)}"
+                            ).bindparams(bindparam("keys", expanding=True)),
+                            {**parameters, "keys": keys},
+                        )
+                    ):
+                        related[table_name].setdefault(row["cnpj_basico"], []).append(row)
+
+        records = {}
+        for row in establishments:
+            cnpj = f"{row['cnpj_basico']}{row['cnpj_ordem']}{row['cnpj_dv']}"
+            if cnpj in records:
+                continue
+            key = row["cnpj_basico"]
+            records[cnpj] = {
+                "cnpj": cnpj,
+                "month": month,
+                "estabelecimento": row,
+                "empresa": next(iter(related["empresa"].get(key, [])), None),
+                "socios": related["socio"].get(key, []),
+                "simples": next(iter(related["simples"].get(key, [])), None),
+            }
+        return records
+
+    def lookup(self, cnpj: str) -> dict | None:
+        """
+        Returns the record of a 14-digit CNPJ (establishment, company, partners and Simples
+        options), or None if it is not in the database.
+
+        Raises:
+            Exception: If the batch of the CNPJ could not be fetched.
+        """
+
+        with self.lock:
+            self.requests += 1
+        # Read before the batch is fetched, so its records are never older than their tag
+        load_state = self.load_state
+        record = self.cache.get(cnpj, load_state)
+        if record is None:
+            record = self.batcher.submit(cnpj).result(timeout=REQUEST_TIMEOUT)
+            self.cache.put(cnpj, NOT_FOUND if record is None else record, load_state)
+        return None if record is NOT_FOUND else record
+
+    def get_stats(self) -> dict:
+        """Returns the requests answered, the cache and batch counters and the loaded month."""
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_size": len(self.cache),
+            "batches": self.batcher.batches,
+            "average_batch_size": round(self.batcher.batched / max(self.batcher.batches, 1), 2),
+            "month": self.load_state[1],
+        }
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """
+    Serves `GET /cnpj/{cnpj}` (formatted or not) and `GET /stats` of the `LookupService` of
+    the server, as JSON, on persistent connections.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # The headers and body are separate writes, which Nagle's algorithm would delay by ~40ms
+    disable_nagle_algorithm = True
+
+    def send_json(self, status: int, body):
+        data = json.dumps(body, default=str, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.split("?")[0]
+
+        if path == "/stats":
+            self.send_json(200, service.get_stats())
+            return
+
+        match = re.fullmatch(r"/cnpj/([0-9./-]+)", path)
+        if match is None:
+            self.send_json(404, {"error": "Not found."})
+            return
+        cnpj = re.sub(r"\D", "", match.group(1))
+        if len(cnpj) != 14:
+            self.send_json(400, {"error": "A CNPJ has 14 digits."})
+            return
+
+        try:
+            record = service.lookup(cnpj)
+        except Exception as e:
+            logging.error(f"Failed to look up {cnpj}: {e}")
+            self.send_json(500, {"error": "Lookup failed."})
+            return
+        if record is None:
+            self.send_json(404, {"error": f"CNPJ {cnpj} not found."})
+        else:
+            self.send_json(200, record)
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} - {format % args}")
+
+
+def start_server(host: str = HOST, port: int = PORT) -> ThreadingHTTPServer:
+    """
+    Starts the lookup service in a background thread and returns its server (see `serve`).
+
+    Args:
+        host (str): The address to listen on. Defaults to `service.host`.
+        port (int): The port to listen on, 0 for any free port. Defaults to `service.port`.
+    Returns:
+        ThreadingHTTPServer: The server, whose `service` is the `LookupService`.
+    """
+
+    server = ThreadingHTTPServer((host, port), LookupHandler)
+    server.daemon_threads = True
+    server.service = LookupService()
+    threading.Thread(target=server.serve_forever, name="lookup-server", daemon=True).start()
+    return server
+
+
+def serve():
+    """
+    Runs the CNPJ lookup service on `service.host`:`service.port` until interrupted.
+
+    `GET /cnpj/{cnpj}` returns the establishment of a CNPJ with its company, partners and
+    Simples options (404 if it is not loaded), and `GET /stats` the cache and batch counters
+    (see `LookupService`).
+    """
+
+    server = start_server()
+    logging.info(f"Lookup service listening on http://{HOST}:{server.server_address[1]}/.")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        logging.info("Stopping the lookup service...")
+    finally:
+        server.shutdown()
+        server.service.pool.close_connection()
+
+
+def sample_cnpjs(count: int) -> list[str]:
+    """
+    Returns `count` CNPJs to request: loaded ones, about one in ten replaced by a CNPJ that is
+    not loaded, so misses are measured too.
+    """
+
+    from sqlalchemy import text
+
+    pool = create_pool(1)
+    with pool.get_pooled_connection() as conn:
+        cnpjs = [
+            f"{basico}{ordem}{dv}"
+            for basico, ordem, dv in conn.execute(
+                text(
+                    "SELECT cnpj_basico, cnpj_ordem, cnpj_dv FROM estabelecimento LIMIT :count"
+                ),
+                {"count": count},
+            )
+        ]
+    pool.close_connection()
+    if not cnpjs:
+        raise Exception("No establishments loaded to request.")
+    generator = random.Random(42)
+    return [
+        f"99{generator.randrange(10 ** 12):012d}" if generator.random() < 0.1 else cnpj
+        for cnpj in cnpjs
+    ]
+
+
+def request_cnpjs(url: str, cnpjs: list[str], requests: int) -> tuple[list[float], dict]:
+    """
+    Requests random CNPJs of a list on one persistent connection.
+
+    Returns:
+        tuple[list[float], dict[int, int]]: The latency of each request, in seconds, and the
+                                            number of responses by status.
+    """
+
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=REQUEST_TIMEOUT)
+    generator = random.Random()
+    latencies, statuses = [], {}
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            conn.request("GET", f"{parts.path.rstrip('/')}/cnpj/{generator.choice(cnpjs)}")
+            response = conn.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+    finally:
+        conn.close()
+    return latencies, statuses
+
+
+def get_percentile(latencies: list[float], percentile: float) -> float:
+    """Returns a percentile of sorted latencies, in milliseconds."""
+    position = min(int(len(latencies) * percentile / 100), len(latencies) - 1)
+    return round(latencies[position] * 1000, 3)
+
+
+def run_load_test(url: str | None = None) -> dict:
+    """
+    Measures the latency and throughput of the lookup service.
+
+    `service.load_test_concurrency` clients, each on its own persistent connection, request
+    `service.load_test_requests` CNPJs in total, drawn from `service.load_test_cnpjs` CNPJs of
+    the database (see `sample_cnpjs`). Without a URL, the service is started in this process on
+    a free port. The results are logged and written to `paths.benchmark_path`.
+
+    Args:
+        url (str, optional): The URL of a running service, e.g. "http://127.0.0.1:8080/".
+    Returns:
+        dict: The latency percentiles (ms), requests per second, statuses and service stats.
+    """
+
+    cnpjs = sample_cnpjs(LOAD_TEST_CNPJS)
+    server = None
+    if not url:
+        server = start_server(port=0)
+        url = f"http://{HOST}:{server.server_address[1]}/"
+
+    try:
+        logging.info(
+            f"Requesting {LOAD_TEST_REQUESTS} CNPJs from {url} with "
+            f"{LOAD_TEST_CONCURRENCY} clients..."
+        )
+        per_client = [
+            LOAD_TEST_REQUESTS // LOAD_TEST_CONCURRENCY
+            + (number < LOAD_TEST_REQUESTS % LOAD_TEST_CONCURRENCY)
+            for number in range(LOAD_TEST_CONCURRENCY)
+        ]
+        results = [([], {})] * LOAD_TEST_CONCURRENCY
+
+        def client(number: int):
+            try:
+                results[number] = request_cnpjs(url, cnpjs, per_client[number])
+            except Exception as e:
+                logging.error(f"Load test client {number} failed: {e}")
+
+        clients = [
+            threading.Thread(target=client, args=(number,))
+            for number in range(LOAD_TEST_CONCURRENCY)
+        ]
+        start = time.perf_counter()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        parts = urlsplit(url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=REQUEST_TIMEOUT)
+        conn.request("GET", f"{parts.path.rstrip('/')}/stats")
+        stats = json.loads(conn.getresponse().read())
+        conn.close()
+    finally:
+        if server:
+            server.shutdown()
+            server.service.pool.close_connection()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    statuses = {}
+    for result in results:
+        for status, count in result[1].items():
+            statuses[status] = statuses.get(status, 0) + count
+    if not latencies:
+        raise Exception(f"No request to {url} succeeded.")
+    report = {
+        "url": url,
+        "requests": len(latencies),
+        "concurrency": LOAD_TEST_CONCURRENCY,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": get_percentile(latencies, 50),
+        "p90_ms": get_percentile(latencies, 90),
+        "p99_ms": get_percentile(latencies, 99),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "service": stats,
+    }
+
+    os.makedirs(BENCHMARK_PATH, exist_ok=True)
+    report_path = os.path.join(
+        BENCHMARK_PATH, f"load_test_{datetime.now().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    with open(report_path, "w") as file:
+        json.dump(report, file, indent=2)
+
+    logging.info(
+        f"{report['requests']} requests in {report['seconds']}s: "
+        f"{report['requests_per_second']} requests/s, p50 {report['p50_ms']} ms, "
+        f"p90 {report['p90_ms']} ms, p99 {report['p99_ms']} ms, statuses {report['statuses']}."
+    )
+    logging.info(f"Load test report written to {report_path}.")
+    return report
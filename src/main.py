@@ -1,18 +1,35 @@
+import argparse
 import datetime
+import importlib
+import multiprocessing
 import os
-import extract.extract_data as extract
-import transform.transform_data as transform
-import load.load_data as load
 import logging
 import copy
 
-from utils.helpers import load_config, save_config
+from utils.helpers import get_config, save_config
+from utils.metrics import METRICS
 
 # Configuration
-config = load_config()
+config = get_config()
 initial_config = copy.deepcopy(config)  # Store a deep copy of the initial state
 ASK_USER = config["settings"]["ask_user"]
 LOG_FILE_PATH = config["logging"]["log_path"]
+STREAMING_LOAD = config["settings"]["streaming_load"]
+DAG_PIPELINE = config["settings"]["dag_pipeline"]
+SEARCH_INDEXES = config["settings"]["search_indexes"]
+CNPJ_INDEX = config["settings"]["cnpj_index"]
+
+# The steps are imported when they run, so running one step does not import (or connect
+# to the database for) the others.
+STEPS = {
+    1: ("Extract", "extract.extract_data", "extract_data"),
+    2: ("Transform", "transform.transform_data", "transform_data"),
+    3: ("Load", "load.load_data", "load_data"),
+    4: ("Transform + Load (streaming)", "load.load_stream", "stream_data"),
+    5: ("Build search indexes", "load.search_index", "build_search_indexes"),
+    6: ("Export wide estabelecimento file", "export.export_wide", "export_wide"),
+    7: ("Build CNPJ index", "lookup.cnpj_index", "build_cnpj_index"),
+}
 
 def setup_logging():
     """Configure logging settings for the application."""
@@ -29,11 +46,32 @@ def setup_logging():
         ],
     )
 
+def get_step(module_name: str, function_name: str):
+    """Imports a step module and returns its entry point."""
+    return getattr(importlib.import_module(module_name), function_name)
+
 def execute_batch():
     """Run all steps automatically in batch mode."""
-    raw_data = extract.extract_data()
-    transformed_data = transform.transform_data(raw_data)
-    load.load_data(transformed_data)
+    if DAG_PIPELINE:
+        get_step("pipeline.dag_pipeline", "run_dag_pipeline")()
+    else:
+        if STREAMING_LOAD:
+            # Before extracting, so an unsupported setup fails fast
+            get_step("load.load_stream", "check_streaming_supported")()
+        raw_data = get_step("extract.extract_data", "extract_data")()
+        if STREAMING_LOAD:
+            get_step("load.load_stream", "stream_data")(raw_data)
+        else:
+            transformed_data = get_step("transform.transform_data", "transform_data")(raw_data)
+            get_step("load.load_data", "load_data")(transformed_data)
+
+    if SEARCH_INDEXES:
+        get_step("load.search_index", "build_search_indexes")()
+    if CNPJ_INDEX:
+        if STREAMING_LOAD and not DAG_PIPELINE:
+            logging.warning("Streaming keeps no transformed files to index, skipping the CNPJ index.")
+        else:
+            get_step("lookup.cnpj_index", "build_cnpj_index")()
 
 def execute_interactive():
     """Run steps interactively based on user input."""
@@ -42,15 +80,9 @@ def execute_interactive():
     )
     save_config(config)
 
-    steps = {
-        1: ("Extract", extract.extract_data),
-        2: ("Transform", transform.transform_data),
-        3: ("Load", load.load_data),
-    }
-
     while True:
         print("\nSelect a step to execute:")
-        for num, (name, _) in steps.items():
+        for num, (name, _, _) in STEPS.items():
             print(f"{num}. {name}")
         print("0. Exit")
 
@@ -58,23 +90,164 @@ def execute_interactive():
             choice = int(input("Step to execute: ").strip())
             if choice == 0:
                 break
-            elif choice in steps:
-                step_name, step_function = steps[choice]
-                step_function()
+            elif choice in STEPS:
+                step_name, module_name, function_name = STEPS[choice]
+                get_step(module_name, function_name)()
                 logging.info(f"{step_name} completed successfully.")
             else:
                 print("Invalid choice. Please select a valid step.")
         except ValueError:
             print("Invalid input. Please enter a number.")
 
+def run_worker_process(profile: bool):
+    """Runs a queue worker in a child process started by `execute_workers`."""
+    # Spawned processes read the config file again
+    config["settings"]["profile"] = profile
+    setup_logging()
+    get_step("pipeline.queue_worker", "run_worker")()
+
+def execute_workers(workers: int):
+    """Run queue workers until the work queue is drained, in `workers` processes."""
+    if workers == 1:
+        get_step("pipeline.queue_worker", "run_worker")()
+        return
+
+    # Spawned, so each worker opens its own database connections
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker_process, args=(config["settings"]["profile"],))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+def parse_args() -> argparse.Namespace:
+    """Parse the command-line options selecting the run mode."""
+    parser = argparse.ArgumentParser(description="ETL pipeline for the RFB CNPJ open data.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="extract the latest (or selected) month and queue its transform and load work items",
+    )
+    mode.add_argument(
+        "--worker",
+        action="store_true",
+        help="claim and run queued work items until the queue is drained",
+    )
+    mode.add_argument(
+        "--status", action="store_true", help="show the progress of the work queue"
+    )
+    mode.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="run the benchmark suite on a synthetic month and compare it with the baseline",
+    )
+    mode.add_argument(
+        "--synthetic",
+        metavar="YYYY-MM",
+        help="generate a synthetic month of RFB files in paths.synthetic_path (see the synthetic settings)",
+    )
+    mode.add_argument(
+        "--search-index",
+        action="store_true",
+        help="build the name search indexes on the loaded database (see settings.search_indexes)",
+    )
+    mode.add_argument(
+        "--build-index",
+        action="store_true",
+        help="build the CNPJ lookup index of the latest (or selected) transformed month (see settings.cnpj_index)",
+    )
+    mode.add_argument(
+        "--export",
+        action="store_true",
+        help="export the latest (or selected) transformed month as a wide estabelecimento file (see the export settings)",
+    )
+    mode.add_argument(
+        "--enrich",
+        metavar="FILE",
+        help="add the enrich.columns of the CNPJs of FILE from the latest (or selected) transformed month (see the enrich settings)",
+    )
+    mode.add_argument(
+        "--rollback-swap",
+        action="store_true",
+        help="restore the tables replaced by the last shadow swap (settings.load_mode: shadow)",
+    )
+    mode.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve CNPJ lookups (GET /cnpj/{cnpj}) from the loaded database (see the service settings)",
+    )
+    mode.add_argument(
+        "--load-test",
+        nargs="?",
+        const="",
+        metavar="URL",
+        help="measure the latency and throughput of the lookup service at URL (default: started in-process)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile each file processed with cProfile and tracemalloc (see settings.profile)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="write the --benchmark results as the new baseline (benchmark.baseline_path)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes started by --worker (default: 1)",
+    )
+    return parser.parse_args()
+
 def main():
     """Main function to execute the ETL pipeline."""
+    args = parse_args()
     setup_logging()
 
-    if ASK_USER:
-        execute_interactive()
+    if args.profile:
+        # Seen by every step, as they are imported afterwards
+        config["settings"]["profile"] = True
+
+    if args.status:
+        get_step("pipeline.queue_worker", "log_progress")()
+    elif args.worker:
+        execute_workers(args.workers)
+    elif args.benchmark:
+        if not get_step("benchmark.run_benchmarks", "run_benchmarks")(args.update_baseline):
+            raise SystemExit(1)
+    elif args.synthetic:
+        get_step("synthetic.generate_data", "generate_month")(args.synthetic)
+    elif args.search_index:
+        get_step("load.search_index", "build_search_indexes")()
+    elif args.export:
+        get_step("export.export_wide", "export_wide")()
+    elif args.build_index:
+        get_step("lookup.cnpj_index", "build_cnpj_index")()
+    elif args.enrich:
+        get_step("export.enrich", "enrich_file")(args.enrich)
+    elif args.rollback_swap:
+        get_step("load.load_data", "rollback_shadow_swap")()
+    elif args.serve:
+        get_step("lookup.lookup_service", "serve")()
+    elif args.load_test is not None:
+        get_step("lookup.lookup_service", "run_load_test")(args.load_test or None)
     else:
-        execute_batch()
+        try:
+            if args.enqueue:
+                raw_data = get_step("extract.extract_data", "extract_data")()
+                get_step("pipeline.queue_worker", "enqueue_month")(raw_data)
+            elif ASK_USER:
+                execute_interactive()
+            else:
+                execute_batch()
+        finally:
+            METRICS.write_report()
 
     # Restore the initial configuration
     save_config(initial_config)
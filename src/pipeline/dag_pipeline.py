@@ -0,0 +1,312 @@
+import functools
+import logging
+import os
+import threading
+
+from constants.table_schema import FACT_TABLES
+import extract.extract_data as extract
+import load.load_data as load
+from pipeline.task_graph import TaskGraph
+from transform.transform_data import (
+    commit_transform,
+    get_record_outputs,
+    get_table_name,
+    is_summary_table,
+    is_transformed,
+    transform_file,
+)
+from utils.helpers import ask_month, get_config
+from utils.manifest import RunManifest
+from utils.metrics import METRICS
+
+# Configuration
+config = get_config()
+NETWORK_WORKERS = config["performance"]["network_workers"]
+CPU_WORKERS = config["performance"]["cpu_workers"] or os.cpu_count()
+DB_WORKERS = config["performance"]["db_workers"]
+# Loading file by file needs tables that are not rebuilt as a unit by the load
+PER_FILE_LOAD = load.DB_TYPE == "mysql" and load.LOAD_MODE == "full"
+
+
+def download(url: str, month_dir: str, manifest: RunManifest) -> str:
+    """Downloads a ZIP file (see `extract.download_zip`), raising if the download failed."""
+    zip_file = extract.download_zip(url, month_dir, manifest)
+    if zip_file is None:
+        raise Exception(f"Failed to download {url}.")
+    return zip_file
+
+
+def transform_files(csv_file_paths: list[str]) -> list[tuple[str, str, tuple]]:
+    """
+    Transforms extracted files in a worker process (see `transform.transform_file`).
+
+    The inputs are left in place, they are removed by `commit_transforms` once recorded.
+
+    Args:
+        csv_file_paths (list[str]): The paths to the extracted CSV files.
+    Returns:
+        list[tuple[str, str, tuple]]: The input path, table name and transform result of each file.
+    """
+
+    results = []
+    for csv_file_path in csv_file_paths:
+        logging.info(f"Processing {csv_file_path}...")
+        table_name = get_table_name(csv_file_path)
+        results.append((csv_file_path, table_name, transform_file(csv_file_path, table_name)))
+    return results
+
+
+def commit_transforms(manifest: RunManifest, results: list[tuple[str, str, tuple]]):
+    """Records the files transformed by `transform_files` and removes their inputs."""
+    for csv_file_path, table_name, result in results:
+        commit_transform(csv_file_path, table_name, result, manifest)
+
+
+def get_zip_outputs(zip_name: str, manifest: RunManifest) -> dict[str, list[str]]:
+    """
+    Returns the transformed files of a ZIP file by table (its table, then the tables derived
+    from it), from the run manifest.
+    """
+
+    outputs = {}
+    for file in manifest.get("extracted", zip_name)["files"]:
+        record = manifest.get("transformed", file)
+        for table, output in get_record_outputs(record).items():
+            outputs.setdefault(table, []).append(output)
+    return outputs
+
+
+def reset_tables(manifest: RunManifest):
+    """
+    Recreates the tables and inserts the default and missing data, before any file is loaded.
+
+    An interrupted load of the month is resumed instead (see `RunManifest.start_load`).
+    """
+
+    if manifest.start_load():
+        return
+
+    load.drop_and_recreate_tables()
+
+    logging.info("Inserting default data...")
+    load.read_sql_file("src/sql/default_insert.sql")
+
+    logging.info("Inserting missing data...")
+    load.read_sql_file("src/sql/missing_data.sql")
+
+
+def load_summary_tables(manifest: RunManifest) -> list[str]:
+    """
+    Loads the summary tables of the month, merged from the partial counts of every
+    transformed file (see `load.get_table_files`), and returns the merged files.
+    """
+
+    outputs = [
+        output
+        for record in manifest.entries("transformed").values()
+        for output in get_record_outputs(record).values()
+    ]
+    summary_files = []
+    for table in load.TABLES_TO_LOAD.values():
+        if is_summary_table(table):
+            files = load.get_table_files(table, outputs)
+            if files:
+                load.load_csv_to_db(files, table, manifest=manifest)
+                summary_files += files
+    return summary_files
+
+
+def finish_load(month: str, manifest: RunManifest):
+    """
+    Loads the summary tables (see `load_summary_tables`), then records the month in
+    `load_log` and the run manifest, once every file is loaded.
+
+    Raises:
+        Exception: If any transformed or summary file is not recorded as loaded (see
+                   `load.check_files_loaded`). The manifest is left open, so the load resumes.
+    """
+
+    summary_files = load_summary_tables(manifest)
+    load.check_files_loaded(
+        manifest,
+        [
+            output
+            for record in manifest.entries("transformed").values()
+            for table, output in get_record_outputs(record).items()
+            if not is_summary_table(table)
+        ]
+        + summary_files,
+    )
+
+    logging.info("Saving load log...")
+    load.log_dataload(month)
+    manifest.finish_load()
+
+
+def run_dag_pipeline():
+    """
+    Runs the Extract, Transform and Load steps as a task graph, overlapping them per file.
+
+    Each ZIP file of the month becomes a chain of tasks: download -> extract -> transform ->
+    load, run in the pool of the resource it uses (see `TaskGraph`):
+    - "network": downloads, `performance.network_workers` at a time;
+    - "cpu": extractions and transforms, in `performance.cpu_workers` worker processes;
+    - "db": loads, `performance.db_workers` at a time, each on its own connection.
+    So a file is transformed while the next ones download, and loaded while the next ones
+    are transformed, and the run takes about as long as its busiest resource.
+
+    Loads only start after the tables are reset, and the main tables are loaded after every
+    lookup table. Files already done according to the run manifest are skipped.
+
+    The per-file load applies to a MySQL "full" load. With the other load modes or database
+    types, the month is loaded at once by `load.load_data` when every file is transformed.
+
+    Raises:
+        Exception: If no available months are found, or if any task failed.
+    """
+
+    months = extract.get_available_months()
+    if not months:
+        logging.error("No available months found.")
+        raise Exception("No available months found.")
+
+    month = ask_month(months) if config["settings"]["ask_user"] else months[0]
+    manifest = RunManifest(month)
+    METRICS.set_month(month)
+
+    month_dir = os.path.join(extract.DOWNLOAD_PATH, month)
+    extract_path = os.path.join(extract.EXTRACT_PATH, month)
+    os.makedirs(month_dir, exist_ok=True)
+    os.makedirs(extract_path, exist_ok=True)
+    os.makedirs(os.path.join(load.TRANSFORMED_PATH, month), exist_ok=True)
+
+    graph = TaskGraph(
+        {
+            "network": NETWORK_WORKERS,
+            "cpu": CPU_WORKERS,
+            "db": DB_WORKERS if PER_FILE_LOAD else 1,
+        },
+        process_resources=("cpu",),
+    )
+
+    # One connection per "db" worker thread
+    local = threading.local()
+    connections = []
+
+    def get_connection():
+        if not hasattr(local, "conn"):
+            local.conn = load.MYSQL_CONN.create_new_connection()
+            connections.append(local.conn)
+        return local.conn
+
+    def load_zip(zip_name: str) -> int:
+        return sum(
+            load.load_csv_to_db(files, table, manifest=manifest, conn=get_connection())
+            for table, files in get_zip_outputs(zip_name, manifest).items()
+            if not is_summary_table(table)
+        )
+
+    def add_transform_task(zip_name: str, extracted_files: list[str]):
+        pending_files = []
+        for file in extracted_files:
+            csv_file_path = os.path.join(extract_path, file)
+            if is_transformed(manifest.get("transformed", file)):
+                if os.path.exists(csv_file_path):
+                    os.remove(csv_file_path)
+            else:
+                pending_files.append(csv_file_path)
+
+        graph.add_task(
+            f"transform:{zip_name}",
+            transform_files,
+            pending_files,
+            resource="cpu",
+            callback=functools.partial(commit_transforms, manifest),
+        )
+
+    def on_extracted(zip_file: str, extracted_files: dict[str, dict]):
+        extract.commit_extraction(zip_file, extracted_files, manifest)
+        add_transform_task(os.path.basename(zip_file), list(extracted_files))
+
+    zips = {}
+    for url in extract.get_zip_files(month):
+        zip_name = os.path.basename(url)
+        table_name = get_table_name(zip_name)
+        if not table_name:
+            logging.warning(f"Could not determine table for {zip_name}, skipping.")
+            continue
+        zips[zip_name] = table_name
+
+        record = manifest.get("extracted", zip_name)
+        if record:
+            add_transform_task(zip_name, list(record["files"]))
+            continue
+
+        zip_file = os.path.join(month_dir, zip_name)
+        graph.add_task(
+            f"download:{zip_name}",
+            download,
+            url,
+            month_dir,
+            manifest,
+            resource="network",
+        )
+        graph.add_task(
+            f"extract:{zip_name}",
+            extract.extract_zip_members,
+            zip_file,
+            extract_path,
+            deps=[f"download:{zip_name}"],
+            resource="cpu",
+            callback=functools.partial(on_extracted, zip_file),
+        )
+
+    if PER_FILE_LOAD:
+        lookup_loads = [
+            f"load:{zip_name}"
+            for zip_name, table_name in zips.items()
+            if table_name not in FACT_TABLES
+        ]
+
+        graph.add_task("reset", reset_tables, manifest, resource="db")
+        for zip_name, table_name in zips.items():
+            deps = ["reset", f"transform:{zip_name}"]
+            if table_name in FACT_TABLES:
+                deps += lookup_loads
+            graph.add_task(
+                f"load:{zip_name}",
+                load_zip,
+                zip_name,
+                deps=deps,
+                resource="db",
+            )
+        graph.add_task(
+            "finish",
+            finish_load,
+            month,
+            manifest,
+            deps=[f"load:{zip_name}" for zip_name in zips],
+            resource="db",
+        )
+    else:
+        graph.add_task(
+            "load",
+            lambda: load.load_data(
+                [
+                    output
+                    for zip_name in zips
+                    for outputs in get_zip_outputs(zip_name, manifest).values()
+                    for output in outputs
+                ]
+            ),
+            deps=[f"transform:{zip_name}" for zip_name in zips],
+            resource="db",
+        )
+
+    try:
+        graph.run()
+    finally:
+        for conn in connections:
+            conn.close()
+
+    logging.info("Pipeline complete!")
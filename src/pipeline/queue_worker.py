@@ -0,0 +1,214 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+from constants.table_schema import FACT_TABLES
+import load.load_data as load
+from pipeline.dag_pipeline import PER_FILE_LOAD, finish_load, reset_tables
+from pipeline.work_queue import LEASE_SECONDS, WorkQueue
+from transform.transform_data import (
+    EXTRACT_PATH,
+    TRANSFORMED_PATH,
+    commit_transform,
+    get_record_outputs,
+    get_table_name,
+    is_summary_table,
+    is_transformed,
+    transform_file,
+)
+from utils.manifest import RunManifest
+from utils.metrics import METRICS
+
+POLL_INTERVAL = 1  # seconds between claims while the ready items are leased by other workers
+
+
+def enqueue_month(csv_files_paths: list[str]):
+    """
+    Queues the transform and load work items of a month's extracted files.
+
+    Each file gets a "transform" item. With a MySQL "full" load, each file also gets a "load"
+    item, after its transform and a single "reset" item (the main tables after every lookup
+    table), and a final "finish" item records the month. Otherwise a single "load" item loads
+    the month once every file is transformed. Items already queued are left as they are.
+
+    Args:
+        csv_files_paths (list[str]): The paths to the month's extracted files.
+    """
+
+    month = os.path.basename(os.path.dirname(csv_files_paths[0]))
+    os.makedirs(os.path.join(TRANSFORMED_PATH, month), exist_ok=True)
+    queue = WorkQueue()
+
+    transforms = {}
+    for csv_file_path in csv_files_paths:
+        name = os.path.basename(csv_file_path)
+        table_name = get_table_name(name)
+        if not table_name:
+            logging.warning(f"Could not determine table for {name}, skipping.")
+            continue
+        transforms[name] = (table_name, queue.add_item(month, "transform", name, table_name))
+
+    if PER_FILE_LOAD:
+        reset_id = queue.add_item(month, "reset", "tables")
+        lookup_loads = [
+            queue.add_item(month, "load", name, table_name, deps=[transform_id, reset_id])
+            for name, (table_name, transform_id) in transforms.items()
+            if table_name not in FACT_TABLES
+        ]
+        fact_loads = [
+            queue.add_item(
+                month, "load", name, table_name, deps=[transform_id, reset_id, *lookup_loads]
+            )
+            for name, (table_name, transform_id) in transforms.items()
+            if table_name in FACT_TABLES
+        ]
+        queue.add_item(month, "finish", "load", deps=lookup_loads + fact_loads)
+    else:
+        queue.add_item(
+            month,
+            "load",
+            "month",
+            deps=[transform_id for _, transform_id in transforms.values()],
+        )
+
+    logging.info(f"Queued {len(transforms)} files of {month}.")
+    queue.close()
+
+
+def run_item(item):
+    """
+    Runs a work item (see `enqueue_month`). Transforms and loads are skipped when the run
+    manifest records them as done, so an item run again after it finished is harmless. An
+    item can also run twice at the same time, when its lease is lost while it runs and
+    another worker claims it: transforms write to partial files unique to each process (see
+    `utils.helpers.get_partial_path`) renamed into place atomically, and a file loaded twice
+    keeps its first rows, as repeated keys do in a `LOAD DATA` load.
+
+    Args:
+        item (sqlite3.Row): The leased work item.
+    """
+
+    month, name, table_name = item["month"], item["name"], item["table_name"]
+    manifest = RunManifest(month)
+    METRICS.set_month(month)
+
+    match item["stage"]:
+        case "transform":
+            csv_file_path = os.path.join(EXTRACT_PATH, month, name)
+            if is_transformed(manifest.get("transformed", name)):
+                if os.path.exists(csv_file_path):
+                    os.remove(csv_file_path)
+                return
+            logging.info(f"Processing {csv_file_path}...")
+            result = transform_file(csv_file_path, table_name)
+            commit_transform(csv_file_path, table_name, result, manifest)
+        case "reset":
+            reset_tables(manifest)
+        case "load" if name == "month":
+            load.load_data(
+                [
+                    output
+                    for record in manifest.entries("transformed").values()
+                    for output in get_record_outputs(record).values()
+                ]
+            )
+        case "load":
+            # The file's table, then the tables exploded from it. The summary tables are
+            # loaded by the "finish" item, once every file is counted.
+            outputs = get_record_outputs(manifest.get("transformed", name))
+            for table, output_file in outputs.items():
+                if is_summary_table(table):
+                    continue
+                load.load_csv_to_db([output_file], table, manifest=manifest)
+                if not manifest.is_done("loaded", os.path.basename(output_file)):
+                    raise Exception(f"Failed to load {output_file}.")
+        case "finish":
+            finish_load(month, manifest)
+        case stage:
+            raise ValueError(f"Unknown work item stage: {stage}")
+
+
+def keep_lease(item_id: int, worker: str, stop_event: threading.Event):
+    """Renews the lease of an item every third of its duration, until `stop_event` is set."""
+    queue = WorkQueue()
+    try:
+        while not stop_event.wait(LEASE_SECONDS / 3):
+            if not queue.heartbeat(item_id, worker):
+                logging.warning(f"{worker} lost the lease of work item {item_id}.")
+                break
+    finally:
+        queue.close()
+
+
+def run_worker(worker: str | None = None):
+    """
+    Claims and runs work items until no item is pending or leased.
+
+    While an item runs, a heartbeat thread renews its lease. A failed item is given back to
+    the queue (see `WorkQueue.release`); when the worker dies, its lease expires and another
+    worker claims the item. The worker writes its own run metrics when it finishes.
+
+    Args:
+        worker (str | None): The worker id. Defaults to "{hostname}-{pid}".
+    """
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue()
+    processed = 0
+    logging.info(f"Worker {worker} started.")
+
+    while True:
+        item = queue.claim(worker)
+        if item is None:
+            if queue.count_unfinished() == 0:
+                break
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        description = f"{item['stage']} {item['month']}/{item['name']}"
+        logging.info(f"{worker} - Running {description} (attempt {item['attempts']})...")
+
+        stop_event = threading.Event()
+        heartbeat = threading.Thread(
+            target=keep_lease, args=(item["id"], worker, stop_event), name="heartbeat"
+        )
+        heartbeat.start()
+        try:
+            run_item(item)
+            error = None
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        finally:
+            stop_event.set()
+            heartbeat.join()
+
+        if error is None:
+            if not queue.complete(item["id"], worker):
+                logging.warning(f"{worker} - Finished {description} after losing its lease.")
+            processed += 1
+        else:
+            logging.error(f"{worker} - {description} failed: {error}")
+            queue.release(item["id"], worker, error)
+
+    logging.info(f"Worker {worker} finished, {processed} items processed.")
+    queue.close()
+    METRICS.write_report(job=worker)
+
+
+def log_progress():
+    """Logs the number of work items per month, stage and status, and the leased items."""
+    queue = WorkQueue()
+
+    for row in queue.get_progress():
+        logging.info(f"{row['month']} {row['stage']:<9} {row['status']:<9} {row['items']}")
+    for item in queue.get_leased_items():
+        remaining = item["lease_expires"] - time.time()
+        logging.info(
+            f"Leased: {item['stage']} {item['month']}/{item['name']} by {item['worker']} "
+            f"(attempt {item['attempts']}, lease {'expires in' if remaining > 0 else 'expired'} "
+            f"{abs(remaining):.0f}s)"
+        )
+
+    queue.close()
@@ -0,0 +1,180 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Callable
+
+from utils.metrics import METRICS
+
+
+def run_in_process(function: Callable, *args) -> tuple:
+    """Runs a task in a worker process, returning its result and the metrics it recorded."""
+    METRICS.reset()
+    return function(*args), METRICS.snapshot()
+
+
+class Task:
+    """
+    A unit of work of a `TaskGraph`.
+
+    Attributes:
+      name (str): The unique name of the task.
+      function (Callable): The function run by the task.
+      args (tuple): The arguments passed to `function`.
+      deps (list[str]): The names of the tasks that must succeed before this one starts.
+      resource (str): The resource pool the task runs in (e.g. "network", "cpu", "db").
+      callback (Callable | None): Called with the result in the coordinating thread, before
+                                  the dependent tasks start (e.g. to commit the result).
+    """
+
+    def __init__(self, name, function, args, deps, resource, callback):
+        self.name = name
+        self.function = function
+        self.args = args
+        self.deps = list(deps)
+        self.resource = resource
+        self.callback = callback
+
+
+class TaskGraph:
+    """
+    Runs a graph of dependent tasks, each in the worker pool of the resource it uses.
+
+    Every resource has its own pool with its own concurrency limit, so the tasks of
+    different resources (downloads, transforms, loads) run at the same time while the tasks
+    of a resource never exceed its limit. A task starts as soon as all its dependencies
+    succeeded. Tasks may be added while the graph runs (e.g. from a callback), and may
+    depend on tasks not added yet.
+
+    Resources listed in `process_resources` run in worker processes (for CPU-bound work
+    holding the GIL), the others in threads. Process tasks must be picklable: module-level
+    functions and plain arguments. The worker processes are forked before any thread starts.
+
+    The metrics recorded by process tasks (see `utils.metrics`) are merged into the
+    coordinator's, as each task completes.
+
+    When a task fails, the tasks depending on it are cancelled, the independent ones keep
+    running, and `run` raises once nothing is left to run.
+
+    Attributes:
+      workers (dict[str, int]): The concurrency limit of each resource.
+      process_resources (set[str]): The resources run in worker processes.
+      tasks (dict[str, Task]): The tasks, by name.
+      results (dict): The results of the tasks that succeeded, by name.
+      failed (set[str]): The names of the tasks that failed or were cancelled.
+      started (set[str]): The names of the tasks submitted (or cancelled) so far.
+    """
+
+    def __init__(self, workers: dict[str, int], process_resources: tuple[str, ...] = ()):
+        self.workers = workers
+        self.process_resources = set(process_resources)
+        self.tasks = {}
+        self.results = {}
+        self.failed = set()
+        self.started = set()
+
+    def add_task(
+        self,
+        name: str,
+        function: Callable,
+        *args,
+        deps: list[str] = [],
+        resource: str = "cpu",
+        callback: Callable | None = None,
+    ):
+        """Adds a task to the graph (see `Task`)."""
+        if name in self.tasks:
+            raise ValueError(f"Duplicated task: {name}")
+        self.tasks[name] = Task(name, function, args, deps, resource, callback)
+
+    def create_executors(self) -> dict:
+        """Creates the worker pool of each resource, starting the worker processes first."""
+        executors = {}
+        for resource, workers in self.workers.items():
+            if resource in self.process_resources:
+                executors[resource] = ProcessPoolExecutor(
+                    workers, mp_context=multiprocessing.get_context("fork")
+                )
+                # Forks every worker now, while no other thread holds a lock
+                executors[resource].submit(os.getpid).result()
+
+        for resource, workers in self.workers.items():
+            if resource not in self.process_resources:
+                executors[resource] = ThreadPoolExecutor(workers, thread_name_prefix=resource)
+
+        return executors
+
+    def submit_ready_tasks(self, executors: dict, running: dict[Future, str]):
+        """Cancels the tasks whose dependencies failed and submits the ready ones."""
+        changed = True
+        while changed:
+            changed = False
+            for name, task in list(self.tasks.items()):
+                if name in self.started:
+                    continue
+                if any(dep in self.failed for dep in task.deps):
+                    logging.warning(f"Cancelled {name}, a dependency failed.")
+                    self.started.add(name)
+                    self.failed.add(name)
+                    changed = True
+                elif all(dep in self.results for dep in task.deps):
+                    self.started.add(name)
+                    if task.resource in self.process_resources:
+                        future = executors[task.resource].submit(
+                            run_in_process, task.function, *task.args
+                        )
+                    else:
+                        future = executors[task.resource].submit(task.function, *task.args)
+                    running[future] = name
+
+    def run(self) -> dict:
+        """
+        Runs every task of the graph.
+
+        Returns:
+            dict: The results of the tasks, by name.
+        Raises:
+            Exception: If any task failed, was cancelled or depends on a task never added.
+        """
+
+        executors = self.create_executors()
+        running = {}
+
+        try:
+            self.submit_ready_tasks(executors, running)
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    task = self.tasks[name]
+                    try:
+                        result = future.result()
+                        if task.resource in self.process_resources:
+                            result, snapshot = result
+                            METRICS.merge(snapshot)
+                        if task.callback is not None:
+                            task.callback(result)
+                        self.results[name] = result
+                    except Exception as e:
+                        logging.error(f"Task {name} failed: {e}")
+                        self.failed.add(name)
+                self.submit_ready_tasks(executors, running)
+        finally:
+            for executor in executors.values():
+                executor.shutdown(cancel_futures=True)
+
+        unresolved = [name for name in self.tasks if name not in self.started]
+        if unresolved:
+            logging.error(f"Tasks never started, missing dependencies: {unresolved}")
+        if self.failed or unresolved:
+            raise Exception(
+                f"{len(self.failed) + len(unresolved)} of {len(self.tasks)} tasks did not complete."
+            )
+
+        return self.results
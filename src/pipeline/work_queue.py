@@ -0,0 +1,253 @@
+import os
+import sqlite3
+import time
+
+from utils.helpers import get_config
+
+# Configuration
+config = get_config()
+WORK_QUEUE_PATH = config["paths"]["work_queue_path"]
+LEASE_SECONDS = config["settings"]["work_lease_seconds"]
+MAX_ATTEMPTS = config["settings"]["work_max_attempts"]
+BUSY_TIMEOUT = 60  # seconds a connection waits for the queue lock
+
+QUEUE_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS work_items (
+        id INTEGER PRIMARY KEY,
+        month TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        name TEXT NOT NULL,
+        table_name TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        worker TEXT,
+        lease_expires REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        updated_at REAL,
+        UNIQUE (month, stage, name)
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS work_deps (
+        item_id INTEGER NOT NULL,
+        dep_id INTEGER NOT NULL,
+        PRIMARY KEY (item_id, dep_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_work_items_status ON work_items (status)",
+]
+
+
+class WorkQueue:
+    """
+    A lease-based work queue stored in a SQLite file shared by the workers.
+
+    Work items (e.g. one per file to transform or load) go from "pending" to "leased" when a
+    worker claims them, then to "done". A leased item must be renewed by heartbeats before
+    its lease expires (`settings.work_lease_seconds`); otherwise its worker is presumed dead
+    and the item can be claimed again. An item failing `settings.work_max_attempts` times is
+    marked "failed" and the items depending on it "cancelled".
+
+    An item is only claimed once all its dependencies are done. Claims run in `BEGIN
+    IMMEDIATE` transactions, so two workers never lease the same item. The SQLite file must
+    be on storage with working POSIX locks (a local disk or a volume shared by containers).
+
+    Each instance holds its own connection and must only be used by one thread.
+
+    Attributes:
+      conn (sqlite3.Connection): The connection to the queue file.
+    """
+
+    def __init__(self, path: str = WORK_QUEUE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        for statement in QUEUE_SCHEMA_SQL:
+            self.conn.execute(statement)
+
+    def close(self):
+        self.conn.close()
+
+    def add_item(
+        self,
+        month: str,
+        stage: str,
+        name: str,
+        table_name: str | None = None,
+        deps: list[int] = [],
+    ) -> int:
+        """
+        Adds a work item, unless the same item (month, stage, name) was already added.
+
+        Args:
+            month (str): The year and month in the format 'YYYY-MM'.
+            stage (str): The kind of work (e.g. "transform", "load").
+            name (str): The unit of work (e.g. an extracted file name).
+            table_name (str | None): The table of the unit, if any.
+            deps (list[int]): The ids of the items that must be done before this one.
+        Returns:
+            int: The id of the item.
+        """
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO work_items (month, stage, name, table_name, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (month, stage, name, table_name, time.time()),
+            )
+            item_id = self.conn.execute(
+                "SELECT id FROM work_items WHERE month = ? AND stage = ? AND name = ?",
+                (month, stage, name),
+            ).fetchone()["id"]
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO work_deps (item_id, dep_id) VALUES (?, ?)",
+                [(item_id, dep_id) for dep_id in deps],
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return item_id
+
+    def fail_item(self, item_id: int, error: str):
+        """Marks an item "failed" and cancels the items depending on it, directly or not."""
+        self.conn.execute(
+            "UPDATE work_items SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+            (error, time.time(), item_id),
+        )
+        self.conn.execute(
+            """
+            WITH RECURSIVE blocked (id) AS (
+                SELECT item_id FROM work_deps WHERE dep_id = ?
+                UNION
+                SELECT work_deps.item_id FROM work_deps JOIN blocked ON work_deps.dep_id = blocked.id
+            )
+            UPDATE work_items SET status = 'cancelled', updated_at = ?
+            WHERE id IN (SELECT id FROM blocked) AND status != 'done'
+            """,
+            (item_id, time.time()),
+        )
+
+    def claim(self, worker: str) -> sqlite3.Row | None:
+        """
+        Leases the first ready item: pending (or with an expired lease) and with all its
+        dependencies done.
+
+        Items whose lease expired after their last allowed attempt are failed first.
+
+        Args:
+            worker (str): The id of the claiming worker.
+        Returns:
+            sqlite3.Row | None: The leased item, or None if no item is ready.
+        """
+
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = self.conn.execute(
+                "SELECT id, worker FROM work_items "
+                "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS),
+            ).fetchall()
+            for item in expired:
+                self.fail_item(item["id"], f"Lease of {item['worker']} expired.")
+
+            item = self.conn.execute(
+                """
+                UPDATE work_items
+                SET status = 'leased', worker = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM work_items AS item
+                    WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?))
+                    AND NOT EXISTS (
+                        SELECT 1 FROM work_deps JOIN work_items AS dep ON dep.id = work_deps.dep_id
+                        WHERE work_deps.item_id = item.id AND dep.status != 'done'
+                    )
+                    ORDER BY id
+                    LIMIT 1
+                )
+                RETURNING *
+                """,
+                (worker, now + LEASE_SECONDS, now, now),
+            ).fetchone()
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return item
+
+    def heartbeat(self, item_id: int, worker: str) -> bool:
+        """
+        Renews the lease of an item.
+
+        Returns:
+            bool: False if the worker lost the lease (it expired and another worker took it).
+        """
+
+        cursor = self.conn.execute(
+            "UPDATE work_items SET lease_expires = ?, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + LEASE_SECONDS, time.time(), item_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, item_id: int, worker: str) -> bool:
+        """
+        Marks a leased item "done".
+
+        Returns:
+            bool: False if the worker no longer held the lease (the item is left as is).
+        """
+
+        cursor = self.conn.execute(
+            "UPDATE work_items SET status = 'done', lease_expires = NULL, error = NULL, "
+            "updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time(), item_id, worker),
+        )
+        return cursor.rowcount == 1
+
+    def release(self, item_id: int, worker: str, error: str):
+        """
+        Gives a failed item back to the queue, or fails it after its last allowed attempt.
+        """
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            item = self.conn.execute(
+                "SELECT attempts FROM work_items WHERE id = ? AND worker = ? AND status = 'leased'",
+                (item_id, worker),
+            ).fetchone()
+            if item is not None and item["attempts"] >= MAX_ATTEMPTS:
+                self.fail_item(item_id, error)
+            elif item is not None:
+                self.conn.execute(
+                    "UPDATE work_items SET status = 'pending', worker = NULL, "
+                    "lease_expires = NULL, error = ?, updated_at = ? WHERE id = ?",
+                    (error, time.time(), item_id),
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def count_unfinished(self) -> int:
+        """Returns the number of items still pending or leased."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM work_items WHERE status IN ('pending', 'leased')"
+        ).fetchone()[0]
+
+    def get_progress(self) -> list[sqlite3.Row]:
+        """Returns the number of items per month, stage and status."""
+        return self.conn.execute(
+            "SELECT month, stage, status, COUNT(*) AS items FROM work_items "
+            "GROUP BY month, stage, status ORDER BY month, stage, status"
+        ).fetchall()
+
+    def get_leased_items(self) -> list[sqlite3.Row]:
+        """Returns the leased items, with their worker and lease expiry."""
+        return self.conn.execute(
+            "SELECT * FROM work_items WHERE status = 'leased' ORDER BY id"
+        ).fetchall()
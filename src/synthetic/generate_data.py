@@ -0,0 +1,433 @@
+import functools
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from constants.csv_table_mapping import CSV_TABLE_MAPPING
+from constants.table_fields import TABLE_FIELDS
+from constants.table_schema import TABLE_SCHEMA
+from utils.helpers import get_config, get_partial_path
+
+# Configuration
+config = get_config()
+SYNTHETIC_PATH = config["paths"]["synthetic_path"]
+COMPANIES = config["synthetic"]["companies"]
+DUPLICATE_RATIO = config["synthetic"]["duplicate_ratio"]
+FILE_PARTS = config["synthetic"]["file_parts"]
+MALFORMED_RATIO = config["synthetic"]["malformed_ratio"]
+SEED = config["synthetic"]["seed"]
+CPU_WORKERS = config["performance"]["cpu_workers"] or os.cpu_count()
+WRITE_BATCH_ROWS = 10000  # lines joined per write to the ZIP member
+
+# ZIP file and member names of the RFB files, by `CSV_TABLE_MAPPING` prefix. The main tables
+# are split in `synthetic.file_parts` files ("Empresas0.zip", "Empresas1.zip"...)
+RFB_FILES = {
+    "cnae": ("Cnaes", "F.K03200$Z.D{date}.CNAECSV"),
+    "motivo": ("Motivos", "F.K03200$Z.D{date}.MOTICSV"),
+    "municipio": ("Municipios", "F.K03200$Z.D{date}.MUNICCSV"),
+    "natureza": ("Naturezas", "F.K03200$Z.D{date}.NATJUCSV"),
+    "pais": ("Paises", "F.K03200$Z.D{date}.PAISCSV"),
+    "qualifica": ("Qualificacoes", "F.K03200$Z.D{date}.QUALSCSV"),
+    "empresa": ("Empresas{part}", "K3241.K03200Y{part}.D{date}.EMPRECSV"),
+    "estabelecimento": ("Estabelecimentos{part}", "K3241.K03200Y{part}.D{date}.ESTABELE"),
+    "socio": ("Socios{part}", "K3241.K03200Y{part}.D{date}.SOCIOCSV"),
+    "simples": ("Simples", "F.K03200$W.SIMPLES.CSV.D{date}"),
+}
+SPLIT_TABLES = ["empresa", "estabelecimento", "socio"]
+
+# Rows of the lookup tables, close to the real files (they do not grow with the scale)
+LOOKUP_ROWS = {
+    "cnae": 1359,
+    "motivo": 60,
+    "municipio": 5571,
+    "natureza_juridica": 90,
+    "pais": 255,
+    "qualificacao_socio": 68,
+}
+# Rows per company of the main tables, close to the real proportions
+FILIAL_RATIO = 0.05  # companies with branches (1 to 3 filiais)
+SOCIO_RATIO = 0.3  # companies with partners (1 to 3 socios)
+SIMPLES_RATIO = 0.7  # companies in the simples file
+
+# Columns referencing a lookup or id table
+REFERENCES = {
+    "cod_cnae_fiscal": "cnae",
+    "cod_faixa_etaria": "id_faixa_etaria",
+    "cod_id_socio": "id_socio",
+    "cod_motivo_situacao_cadastral": "motivo",
+    "cod_municipio": "municipio",
+    "cod_natureza_juridica": "natureza_juridica",
+    "cod_pais": "pais",
+    "cod_pais_socio_estrangeiro": "pais",
+    "cod_porte": "id_porte_empresa",
+    "cod_qualificacao_do_responsavel": "qualificacao_socio",
+    "cod_qualificacao_representante_legal": "qualificacao_socio",
+    "cod_qualificacao_socio": "qualificacao_socio",
+    "cod_situacao_cadastral": "id_situacao_cadastral",
+}
+# Ratio of empty values and the value written for them, for the mostly empty columns
+EMPTY_VALUES = {
+    "cod_pais": (0.99, ""),
+    "cod_pais_socio_estrangeiro": (0.99, ""),
+    "complemento": (0.6, ""),
+    "correio_eletronico": (0.5, ""),
+    "data_exclusao_pelo_mei": (0.9, "00000000"),
+    "data_exclusao_pelo_simples": (0.8, "00000000"),
+    "data_situacao_especial": (1.0, ""),
+    "ddd_2": (0.9, ""),
+    "ddd_fax": (0.95, ""),
+    "ente_federativo_responsavel": (0.99, ""),
+    "nome_cidade_exterior": (0.99, ""),
+    "nome_fantasia": (0.5, ""),
+    "nome_representante_legal": (0.95, ""),
+    "situacao_especial": (0.99, ""),
+    "telefone_2": (0.9, ""),
+    "telefone_fax": (0.95, ""),
+}
+
+WORDS = [
+    "AGROPECUÁRIA", "ALIMENTAÇÃO", "ARAÚJO", "ASSOCIAÇÃO", "COMÉRCIO", "CONFECÇÕES",
+    "CONSTRUÇÃO", "CONSULTORIA", "DISTRIBUIDORA", "EDUCAÇÃO", "FERREIRA", "GONÇALVES",
+    "INDÚSTRIA", "JOÃO", "JOSÉ", "LTDA", "MARIA", "OLIVEIRA", "PARTICIPAÇÕES", "PEREIRA",
+    "SANTOS", "SAÚDE", "SERVIÇOS", "SILVA", "SOUZA", "SÃO", "TECNOLOGIA", "TRANSPORTES",
+]
+STREET_TYPES = ["ALAMEDA", "AVENIDA", "ESTRADA", "PRACA", "RODOVIA", "RUA", "TRAVESSA"]
+UFS = [
+    uf
+    for ufs in TABLE_SCHEMA["estabelecimento"]["partition"]["values"].values()
+    for uf in ufs
+    if uf != "EX"
+]
+CNPJ_WEIGHTS = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
+FIRST_DATE = date(1966, 1, 1)
+
+
+def get_sql_codes(path: str) -> dict[str, list[str]]:
+    """Returns the codes inserted by an SQL script (e.g. `default_insert.sql`), by table."""
+
+    with open(path, "r", encoding="utf-8") as file:
+        matches = re.findall(r"INSERT INTO (\w+) VALUES\s*\('([^']*)'", file.read())
+
+    codes = {}
+    for table, code in matches:
+        codes.setdefault(table, []).append(code)
+    return codes
+
+
+@functools.cache
+def get_codes(seed: int) -> dict[str, list[str]]:
+    """
+    Returns the codes of the lookup and id tables referenced by the main tables.
+
+    The id table codes are the ones of `default_insert.sql`. The lookup table codes are drawn
+    from the seed, out of the ones `missing_data.sql` inserts, so the loads never clash with
+    them.
+
+    Args:
+        seed (int): The seed of the dataset.
+    Returns:
+        dict[str, list[str]]: The sorted codes, by table.
+    """
+
+    codes = get_sql_codes("src/sql/default_insert.sql")
+    missing = get_sql_codes("src/sql/missing_data.sql")
+    for table, rows in LOOKUP_ROWS.items():
+        width = int(TABLE_SCHEMA[table]["columns"]["codigo"].split("(")[1].rstrip(")"))
+        excluded = set(missing.get(table, []))
+        rng = random.Random(f"{seed}:{table}")
+        drawn = rng.sample(range(10**width), min(rows + len(excluded), 10**width))
+        codes[table] = sorted(
+            [code for code in (f"{value:0{width}d}" for value in drawn) if code not in excluded][
+                :rows
+            ]
+        )
+    return codes
+
+
+def get_cnpj_basico(index: int, seed: int) -> str:
+    """Returns the CNPJ root of the company `index`, a permutation of the 8-digit numbers."""
+    return f"{(index * 48271 + seed) % 10**8:08d}"
+
+
+def get_cnpj_dv(cnpj: str) -> str:
+    """Returns the two check digits of the 12 first digits of a CNPJ."""
+
+    digits = [int(digit) for digit in cnpj]
+    for weights in (CNPJ_WEIGHTS[1:], CNPJ_WEIGHTS):
+        remainder = sum(digit * weight for digit, weight in zip(digits, weights)) % 11
+        digits.append(0 if remainder < 2 else 11 - remainder)
+    return f"{digits[-2]}{digits[-1]}"
+
+
+def get_text(rng: random.Random, words: int = 3) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(1, words)))
+
+
+def get_value(
+    column: str,
+    column_type: str,
+    dtype: str,
+    rng: random.Random,
+    codes: dict[str, list[str]],
+    last_day: int,
+) -> str:
+    """
+    Returns a random value of a column, in the RFB format.
+
+    Columns referencing a lookup or id table get one of its codes; other columns get a value
+    of their type: a "YYYYMMDD" date, a decimal with a comma, digits for the fixed-width codes
+    or words for the text.
+
+    Args:
+        column (str): The column name.
+        column_type (str): The column type in `TABLE_SCHEMA` (e.g. "char(8)").
+        dtype (str): The column type in `TABLE_FIELDS` (e.g. "str").
+        rng (random.Random): The random generator of the file.
+        codes (dict[str, list[str]]): The lookup and id table codes (see `get_codes`).
+        last_day (int): The number of days from `FIRST_DATE` to the month of the dataset.
+    Returns:
+        str: The value, unquoted.
+    """
+
+    empty = EMPTY_VALUES.get(column)
+    if empty and rng.random() < empty[0]:
+        return empty[1]
+
+    if column in REFERENCES:
+        return rng.choice(codes[REFERENCES[column]])
+    if column == "cod_cnae_fiscal_secundario":
+        return ",".join(rng.sample(codes["cnae"], rng.choice([0, 0, 0, 1, 2, 3])))
+    if column == "correio_eletronico":
+        return f"{rng.choice(WORDS).lower()}{rng.randrange(1000)}@email.com"
+    if column == "tipo_logradouro":
+        return rng.choice(STREET_TYPES)
+    if column == "uf":
+        return rng.choice(UFS)
+    if column.startswith("opcao_pelo"):
+        return rng.choice("SN")
+
+    if dtype == "date":
+        return (FIRST_DATE + timedelta(days=rng.randrange(last_day))).strftime("%Y%m%d")
+    if dtype == "float":
+        return f"{rng.randrange(1, 10**7)},{rng.choice(['00', '00', '50'])}"
+    if column_type.startswith(("char", "varchar")):
+        width = int(column_type.split("(")[1].rstrip(")"))
+        return f"{rng.randrange(10**width):0{width}d}"
+    if column == "numero":
+        return str(rng.randrange(1, 5000))
+    return get_text(rng)
+
+
+def get_main_rows(
+    table_name: str, start: int, stop: int, seed: int, rng: random.Random
+):
+    """
+    Yields the fixed values of the rows of a main table for the companies `start` to `stop`:
+    the keys, and the values depending on them.
+
+    Each company has an empresa row, a matriz estabelecimento (and sometimes filiais), and
+    sometimes socios and a simples row.
+    """
+
+    for index in range(start, stop):
+        cnpj_basico = get_cnpj_basico(index, seed)
+        if table_name == "empresa":
+            yield {"cnpj_basico": cnpj_basico}
+        elif table_name == "estabelecimento":
+            filiais = rng.randint(1, 3) if rng.random() < FILIAL_RATIO else 0
+            for ordem in range(1, filiais + 2):
+                cnpj_ordem = f"{ordem:04d}"
+                yield {
+                    "cnpj_basico": cnpj_basico,
+                    "cnpj_ordem": cnpj_ordem,
+                    "cnpj_dv": get_cnpj_dv(cnpj_basico + cnpj_ordem),
+                    "cod_id_matriz_filial": "1" if ordem == 1 else "2",
+                }
+        elif table_name == "socio":
+            socios = rng.randint(1, 3) if rng.random() < SOCIO_RATIO else 0
+            for _ in range(socios):
+                cod_id_socio = rng.choice("122223")
+                if cod_id_socio == "1":
+                    partner = get_cnpj_basico(rng.randrange(stop), seed) + "0001"
+                    cnpj_cpf_socio = partner + get_cnpj_dv(partner)
+                else:
+                    cnpj_cpf_socio = f"***{rng.randrange(10**6):06d}**"
+                yield {
+                    "cnpj_basico": cnpj_basico,
+                    "cod_id_socio": cod_id_socio,
+                    "cnpj_cpf_socio": cnpj_cpf_socio,
+                    "cod_faixa_etaria": "0" if cod_id_socio == "1" else rng.choice("123456789"),
+                    "numero_cpf_representante_legal": "***000000**",
+                }
+        elif table_name == "simples" and rng.random() < SIMPLES_RATIO:
+            yield {"cnpj_basico": cnpj_basico}
+
+
+def write_zip(
+    zip_path: str,
+    member_name: str,
+    table_name: str,
+    start: int,
+    stop: int,
+    month: str,
+    seed: int,
+) -> int:
+    """
+    Writes a synthetic RFB file as a ZIP with a single member.
+
+    The member is written like the RFB files: latin-1, every value quoted and separated by ";",
+    no header. A `synthetic.duplicate_ratio` of the rows is followed by a duplicate, half of
+    them identical and half with the same key and other values; a `synthetic.malformed_ratio`
+    of the rows (never the first one) gets an extra value, which makes the line malformed.
+    The rows only depend on the seed and the file name, so the files can be generated in
+    parallel and again.
+
+    Args:
+        zip_path (str): The path to the ZIP file (e.g. ".../Empresas0.zip").
+        member_name (str): The name of the file inside the ZIP.
+        table_name (str): The table of the file.
+        start (int): The index of the first company of the file (main tables only).
+        stop (int): The index after the last company of the file (main tables only).
+        month (str): The year and month of the dataset, in the format 'YYYY-MM'.
+        seed (int): The seed of the dataset.
+    Returns:
+        int: The number of lines written.
+    """
+
+    rng = random.Random(f"{seed}:{os.path.basename(zip_path)}")
+    codes = get_codes(seed)
+    columns = [
+        (column, TABLE_SCHEMA[table_name]["columns"][column], dtype)
+        for column, dtype in TABLE_FIELDS[table_name].items()
+    ]
+    last_day = (date.fromisoformat(f"{month}-01") - FIRST_DATE).days
+
+    if table_name in LOOKUP_ROWS:
+        rows = ({"codigo": code} for code in codes[table_name])
+    else:
+        rows = get_main_rows(table_name, start, stop, seed, rng)
+
+    def get_line(fixed: dict[str, str], malformed: bool = False) -> str:
+        values = [
+            fixed[column]
+            if column in fixed
+            else get_value(column, column_type, dtype, rng, codes, last_day)
+            for column, column_type, dtype in columns
+        ]
+        if malformed:
+            values.append(get_text(rng))
+        return ";".join(f'"{value}"' for value in values) + "\n"
+
+    lines = 0
+    partial_path = get_partial_path(zip_path)
+    with zipfile.ZipFile(partial_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        with zip_file.open(member_name, "w", force_zip64=True) as member:
+            batch = []
+            for fixed in rows:
+                first = lines == 0 and not batch
+                line = get_line(fixed, malformed=not first and rng.random() < MALFORMED_RATIO)
+                batch.append(line)
+                if rng.random() < DUPLICATE_RATIO:
+                    batch.append(line if rng.random() < 0.5 else get_line(fixed))
+                if len(batch) >= WRITE_BATCH_ROWS:
+                    member.write("".join(batch).encode("latin-1"))
+                    lines += len(batch)
+                    batch = []
+            member.write("".join(batch).encode("latin-1"))
+            lines += len(batch)
+    os.replace(partial_path, zip_path)
+
+    logging.info(f"Generated {zip_path} ({lines} lines).")
+    return lines
+
+
+def get_file_specs(month: str, companies: int) -> list[tuple[str, str, str, int, int]]:
+    """
+    Lists the files of a synthetic month, with the names of the RFB files of every
+    `CSV_TABLE_MAPPING` table.
+
+    Returns:
+        list[tuple]: The ZIP name, member name, table and company range of each file.
+    """
+
+    year, month_number = month.split("-")
+    file_date = f"{year[-1]}{month_number}13"
+
+    specs = []
+    for prefix, table_name in CSV_TABLE_MAPPING.items():
+        zip_name, member_name = RFB_FILES[prefix]
+        parts = FILE_PARTS if table_name in SPLIT_TABLES else 1
+        for part in range(parts):
+            specs.append(
+                (
+                    zip_name.format(part=part) + ".zip",
+                    member_name.format(part=part, date=file_date),
+                    table_name,
+                    part * companies // parts,
+                    (part + 1) * companies // parts,
+                )
+            )
+    return specs
+
+
+def generate_month(month: str, companies: int = COMPANIES, seed: int = SEED) -> list[str]:
+    """
+    Generates a synthetic month of RFB files to `{paths.synthetic_path}/{month}/`.
+
+    The files use the names, encoding and layout of the RFB release (see `write_zip`), with
+    `companies` CNPJ roots (`synthetic.companies`, about 60 million for a real release) and
+    lookup tables of the real size. The directory can be served over HTTP and used as
+    `data_source.base_url` to run the pipeline offline. The files are generated in
+    `performance.cpu_workers` processes; files of an earlier call with the same parameters
+    are kept.
+
+    Args:
+        month (str): The year and month of the dataset, in the format 'YYYY-MM'.
+        companies (int): The number of CNPJ roots.
+        seed (int): The seed of the random values; the same seed gives the same files.
+    Returns:
+        list[str]: The paths to the ZIP files.
+    """
+
+    month_dir = os.path.join(SYNTHETIC_PATH, month)
+    parameters = {
+        "companies": companies,
+        "seed": seed,
+        "duplicate_ratio": DUPLICATE_RATIO,
+        "file_parts": FILE_PARTS,
+        "malformed_ratio": MALFORMED_RATIO,
+    }
+    parameters_path = os.path.join(month_dir, "parameters.json")
+    if os.path.exists(parameters_path):
+        with open(parameters_path, "r") as file:
+            if json.load(file) != parameters:
+                logging.info(f"Removing {month_dir}, generated with other parameters.")
+                shutil.rmtree(month_dir)
+    os.makedirs(month_dir, exist_ok=True)
+    with open(parameters_path, "w") as file:
+        json.dump(parameters, file, indent=2)
+
+    zip_paths = []
+    with ProcessPoolExecutor(max_workers=CPU_WORKERS) as executor:
+        futures = []
+        for zip_name, member_name, table_name, start, stop in get_file_specs(month, companies):
+            zip_path = os.path.join(month_dir, zip_name)
+            zip_paths.append(zip_path)
+            if os.path.exists(zip_path):
+                logging.info(f"Skipping {zip_path}, already generated.")
+                continue
+            futures.append(
+                executor.submit(
+                    write_zip, zip_path, member_name, table_name, start, stop, month, seed
+                )
+            )
+        lines = sum(future.result() for future in as_completed(futures))
+
+    logging.info(f"Synthetic month {month} generated in {month_dir} ({lines} new lines).")
+    return zip_paths
@@ -0,0 +1,181 @@
+# Content-addressed cache of transformed files.
+#
+# An entry is keyed by the SHA-256 of the (decompressed) source bytes and a fingerprint of
+# everything else the output depends on (see `transform_data.get_transform_fingerprint`).
+# It is stored as `{key[:2]}/{key}{extension}`, with a `{key}.json` sidecar holding its row
+# count, and is hard-linked into (and out of) the month's `TRANSFORMED_PATH`, so a hit costs
+# no copy. The least recently used entries are evicted once the cache grows beyond
+# `performance.transform_cache_size_mb`.
+#
+# The cache is shared by concurrent processes (the DAG's CPU pool, queue workers): sidecars
+# are written atomically, eviction runs under a lock file, and an entry evicted while it is
+# read is a cache miss.
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from utils.helpers import get_config, get_partial_path, open_compressed
+
+# Configuration
+config = get_config()
+TRANSFORM_CACHE_PATH = config["paths"]["transform_cache_path"]
+TRANSFORM_CACHE_SIZE = config["performance"]["transform_cache_size_mb"] * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def is_cache_enabled() -> bool:
+    """Checks if the transform cache is enabled (`performance.transform_cache_size_mb` > 0)."""
+    return TRANSFORM_CACHE_SIZE > 0
+
+
+def get_cache_key(source_path: str, fingerprint: str) -> str:
+    """
+    Computes the cache key of a source file.
+
+    The source is hashed decompressed, so the key does not depend on how the extracted
+    file was compressed (gzip headers, for instance, carry a timestamp).
+
+    Args:
+        source_path (str): The path to the extracted file.
+        fingerprint (str): The fingerprint of the transform applied to it.
+    Returns:
+        str: The hex digest identifying the transformed output.
+    """
+
+    digest = hashlib.sha256()
+    with open_compressed(source_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    digest.update(fingerprint.encode())
+    return digest.hexdigest()
+
+
+def get_derived_key(key: str, name: str) -> str:
+    """
+    Returns the cache key of another output of the same transform (e.g. an exploded table),
+    derived from the key of its main output.
+    """
+    return hashlib.sha256(f"{key}:{name}".encode()).hexdigest()
+
+
+def get_entry_path(key: str, extension: str) -> str:
+    """Returns the path of a cache entry, e.g. "{cache}/ab/ab12....tsv.zst"."""
+    return os.path.join(TRANSFORM_CACHE_PATH, key[:2], f"{key}{extension}")
+
+
+def link_or_copy(source: str, target: str):
+    """
+    Hard-links a file to a new path, atomically replacing any existing file.
+
+    The file is copied instead when both paths are not on the same filesystem. The partial
+    path is unique to the process, so concurrent processes never share it.
+    """
+
+    partial_path = get_partial_path(target, unique=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(partial_path)
+    try:
+        os.link(source, partial_path)
+    except OSError:
+        shutil.copyfile(source, partial_path)
+    os.replace(partial_path, target)
+
+
+def fetch_cached_output(key: str, extension: str, output_file: str) -> int | None:
+    """
+    Places a cached transformed file at the output path, if cached.
+
+    Args:
+        key (str): The cache key (see `get_cache_key`).
+        extension (str): The output file extension (e.g. ".tsv.zst").
+        output_file (str): The path the transformed file is expected at.
+    Returns:
+        int | None: The number of rows of the cached file, or None on a cache miss (including
+                    an entry evicted by another process while it is read).
+    """
+
+    entry_path = get_entry_path(key, extension)
+    metadata_path = os.path.join(os.path.dirname(entry_path), f"{key}.json")
+    try:
+        with open(metadata_path, "r") as file:
+            rows = json.load(file)["rows"]
+        link_or_copy(entry_path, output_file)
+        os.utime(metadata_path)  # Marks the entry as recently used
+    except (FileNotFoundError, ValueError):
+        return None
+    return rows
+
+
+def store_output(key: str, extension: str, output_file: str, rows: int):
+    """
+    Adds a transformed file to the cache and evicts the least recently used entries.
+
+    Args:
+        key (str): The cache key (see `get_cache_key`).
+        extension (str): The output file extension (e.g. ".tsv.zst").
+        output_file (str): The path to the transformed file.
+        rows (int): The number of rows of the transformed file.
+    """
+
+    entry_path = get_entry_path(key, extension)
+    os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+    link_or_copy(output_file, entry_path)
+
+    # Written last and atomically, so an entry without a complete sidecar is never used
+    metadata_path = os.path.join(os.path.dirname(entry_path), f"{key}.json")
+    partial_path = get_partial_path(metadata_path, unique=True)
+    with open(partial_path, "w") as file:
+        json.dump({"rows": rows, "source": os.path.basename(output_file)}, file)
+    os.replace(partial_path, metadata_path)
+
+    evict_entries()
+
+
+def evict_entries():
+    """
+    Removes the least recently used cache entries until the cache fits in its size limit.
+
+    Entries are ordered by the modification time of their sidecar, refreshed on every hit.
+    Eviction runs under an exclusive lock on `{cache}/.lock`, and entries removed meanwhile
+    (e.g. replaced by another process) are skipped.
+    """
+
+    os.makedirs(TRANSFORM_CACHE_PATH, exist_ok=True)
+    with open(os.path.join(TRANSFORM_CACHE_PATH, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            entries = []
+            total_size = 0
+            for directory, _, files in os.walk(TRANSFORM_CACHE_PATH):
+                for file in files:
+                    if not file.endswith(".json") or file.startswith(".partial."):
+                        continue
+                    key = file.removesuffix(".json")
+                    paths = [
+                        os.path.join(directory, name)
+                        for name in files
+                        if name.startswith(key)
+                    ]
+                    try:
+                        size = sum(os.path.getsize(path) for path in paths)
+                        mtime = os.path.getmtime(os.path.join(directory, file))
+                    except FileNotFoundError:
+                        continue
+                    entries.append((mtime, key, size, paths))
+                    total_size += size
+
+            for _, key, size, paths in sorted(entries):
+                if total_size <= TRANSFORM_CACHE_SIZE:
+                    break
+                for path in paths:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                total_size -= size
+                logging.info(f"Evicted {key} from the transform cache.")
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,20 +1,48 @@
+import contextlib
 import csv
+import hashlib
+import json
 import logging
 import numpy as np
 import pandas as pd
 import os
+import time
+import warnings
 from constants.csv_table_mapping import CSV_TABLE_MAPPING
 from extract.extract_data import DOWNLOAD_PATH
-from utils.helpers import ask_month, create_logfile, load_config
+from utils.helpers import (
+    COMPRESSION_SUFFIXES,
+    OUTPUT_FORMAT_EXTENSIONS,
+    TSV_ESCAPES,
+    ask_month,
+    create_logfile,
+    get_config,
+    get_file_format,
+    get_partial_path,
+    open_compressed,
+)
+from utils.manifest import RunManifest, get_file_checksum
+from utils.metrics import METRICS
+import utils.profiling as profiling
+import transform.transform_cache as transform_cache
 from constants.table_fields import TABLE_FIELDS
+from constants.table_schema import TABLE_SCHEMA
 from constants.pandas_dtypes_map import PANDAS_DTYPES_MAP
 
 
 # Configuration
-config = load_config()
+config = get_config()
 EXTRACT_PATH = config["paths"]["extract_path"]
 TRANSFORMED_PATH = config["paths"]["transformed_path"]
 READ_CHUNK_SIZE = config["performance"]["read_chunk_size"]
+COMPRESSION = config["performance"]["compression"]
+COMPRESSION_LEVEL = config["performance"]["compression_level"]
+OUTPUT_FORMAT = config["performance"]["output_format"]
+TRANSFORM_VERSION = 2  # Bump when a code change alters the transformed output
+# Days of each month in a common year
+DAYS_IN_MONTH = {
+    1: 31, 2: 28, 3: 31, 4: 30, 5: 31, 6: 30, 7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31
+}
 
 
 def get_table_name(filename: str) -> str | None:
@@ -49,7 +77,9 @@ def get_output_file_path(csv_file_path: str, table_name: str) -> str:
     1. Extracting the month from the directory name of the input CSV file.
     2. Extracting the base name of the input CSV file.
     3. Extracting the file number from the base name (if present).
-    4. Constructing the output file name using the table name and file number.
+    4. Constructing the output file name using the table name, file number, the
+       `performance.output_format` extension and the `performance.compression` suffix
+       (e.g. "empresa_0.tsv.gz").
     5. Joining the TRANSFORMED_PATH, month, and constructed file name to form the full output file path.
     """
 
@@ -57,10 +87,99 @@ def get_output_file_path(csv_file_path: str, table_name: str) -> str:
     base_name = os.path.basename(csv_file_path)
     file_number = "".join(filter(str.isdigit, base_name.split("_")[0]))
 
-    file_name = f"{table_name}" + (f"_{file_number}" if file_number else "") + ".csv"
+    file_name = (
+        f"{table_name}"
+        + (f"_{file_number}" if file_number else "")
+        + OUTPUT_FORMAT_EXTENSIONS[OUTPUT_FORMAT]
+        + COMPRESSION_SUFFIXES[COMPRESSION]
+    )
     return os.path.join(TRANSFORMED_PATH, month, file_name)
 
 
+def get_derived_tables(table_name: str) -> list[str]:
+    """
+    Returns the tables the transform derives from a table: the tables exploded from one of
+    its list columns and its summary tables (see `TABLE_SCHEMA`).
+    """
+    return [
+        table
+        for table, schema in TABLE_SCHEMA.items()
+        if schema.get("explode", schema.get("aggregate", {})).get("table") == table_name
+    ]
+
+
+def is_summary_table(table_name: str) -> bool:
+    """Checks if a table is a summary table, aggregated by the transform (see `TABLE_SCHEMA`)."""
+    return "aggregate" in TABLE_SCHEMA[table_name]
+
+
+def get_record_outputs(record: dict) -> dict[str, str]:
+    """
+    Returns the output files of a "transformed" manifest record, by table.
+
+    Args:
+        record (dict): The record of an extracted file (see `commit_transform`).
+    Returns:
+        dict[str, str]: The output file of its table, then the ones of its derived tables.
+    """
+
+    outputs = {record["table"]: record["output"]}
+    for table, child in record.get("children", {}).items():
+        outputs[table] = child["output"]
+    return outputs
+
+
+def is_transformed(record: dict | None) -> bool:
+    """Checks if a "transformed" manifest record exists and all of its output files are present."""
+    return bool(record) and all(
+        os.path.exists(output) for output in get_record_outputs(record).values()
+    )
+
+
+def get_transform_fingerprint(table_name: str) -> str:
+    """
+    Returns a fingerprint of everything but the source bytes the output of a table depends on.
+
+    It covers the transform version, the table fields (and the definitions of the tables
+    derived from it), the filters and the output format and compression, so a cached output
+    is never reused after any of them changes.
+
+    Args:
+        table_name (str): The name of the table.
+    Returns:
+        str: The SHA-256 hex digest of the transform settings.
+    """
+
+    settings = {
+        "version": TRANSFORM_VERSION,
+        "table": table_name,
+        "fields": TABLE_FIELDS[table_name],
+        "derived": {table: TABLE_SCHEMA[table] for table in get_derived_tables(table_name)},
+        "estabelecimentos_apta_only": bool(config["settings"]["estabelecimentos_apta_only"]),
+        "output_format": OUTPUT_FORMAT,
+        "compression": COMPRESSION,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def is_valid_date(values: pd.Series) -> pd.Series:
+    """
+    Checks which values are valid `YYYYMMDD` dates (year 1 or later, existing month and day).
+
+    Args:
+        values (pd.Series): The date strings.
+
+    Returns:
+        pd.Series: A boolean mask, True for the valid dates.
+    """
+
+    parts = values.str.extract(r"^(\d{4})(\d{2})(\d{2})$").astype("float")
+    year, month, day = parts[0], parts[1], parts[2]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days = month.map(DAYS_IN_MONTH) + ((month == 2) & leap)
+    return (year >= 1) & (day >= 1) & (day <= days)
+
+
 def enforce_dtypes(df: pd.DataFrame, dtype_mapping: dict[str, str]) -> pd.DataFrame:
     """
     Ensures the dataframe columns have the correct types.
@@ -76,25 +195,29 @@ def enforce_dtypes(df: pd.DataFrame, dtype_mapping: dict[str, str]) -> pd.DataFr
         pandas_dtype = PANDAS_DTYPES_MAP[dtype]
 
         try:
-            if pandas_dtype == "string":
-                df[col] = df[col].astype(str).str.strip()
-            elif pandas_dtype == "Int64":
-                df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
-            elif pandas_dtype == "float64":
-                df[col] = pd.to_numeric(
-                    df[col].astype(str).str.replace(",", ".", regex=False),
-                    errors="coerce",
-                )
-            elif pandas_dtype == "boolean":
-                df[col] = (
-                    df[col]
-                    .astype(str)
-                    .str.lower()
-                    .map({"true": True, "false": False, "1": True, "0": False})
-                )
-            elif pandas_dtype == "datetime64[ns]":
-                df[col] = df[col].replace(["0", "", "0000-00-00"], r"\N")
-                
+            with profiling.section(col):
+                if pandas_dtype == "string":
+                    df[col] = df[col].astype(str).str.strip()
+                elif pandas_dtype == "Int64":
+                    df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+                elif pandas_dtype == "float64":
+                    df[col] = pd.to_numeric(
+                        df[col].astype(str).str.replace(",", ".", regex=False),
+                        errors="coerce",
+                    )
+                elif pandas_dtype == "boolean":
+                    df[col] = (
+                        df[col]
+                        .astype(str)
+                        .str.lower()
+                        .map({"true": True, "false": False, "1": True, "0": False})
+                    )
+                elif pandas_dtype == "datetime64[ns]":
+                    # Invalid dates (e.g. "00000000", "20241340") become NULL, as with
+                    # MySQL's STR_TO_DATE, so no backend rejects them
+                    values = df[col].astype(str).str.strip()
+                    df[col] = values.where(is_valid_date(values), r"\N")
+
         except Exception as e:
             logging.warning(f"Could not convert {col} to {pandas_dtype}: {e}")
 
@@ -118,7 +241,9 @@ def filter_estabelecimentos_apta(df: pd.DataFrame) -> pd.DataFrame:
     )
 
 
-def clean_dataframe(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+def clean_dataframe(
+    df: pd.DataFrame, table_name: str, counts: dict[str, int] | None = None
+) -> pd.DataFrame:
     """
     Cleans the given DataFrame by enforcing data types, removing whitespace,
     replacing empty strings with NaN, dropping duplicates, and resetting the index.
@@ -126,22 +251,32 @@ def clean_dataframe(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
     Parameters:
         df (pd.DataFrame): The DataFrame to be cleaned.
         table_name (str): The name of the table to determine the data types to enforce.
+        counts (dict[str, int] | None): If given, the numbers of duplicated rows dropped and
+                                        rows filtered out are added to its "rows_dropped"
+                                        and "rows_filtered" keys.
 
     Returns:
         pd.DataFrame: The cleaned DataFrame.
     """
 
     # Enforce datatypes
-    df = enforce_dtypes(df, TABLE_FIELDS[table_name])
+    with profiling.section("enforce_dtypes"):
+        df = enforce_dtypes(df, TABLE_FIELDS[table_name])
 
     # Remove leading/trailing whitespace from string columns
-    df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
+    with profiling.section("strip_whitespace"):
+        df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
 
     # Replace empty strings, NaN, None with \N (NULL in MySQL)
-    df = df.replace({"": r"\N", np.nan: r"\N", pd.NA: r"\N", None: r"\N"})
+    with profiling.section("replace_nulls"):
+        df = df.replace({"": r"\N", np.nan: r"\N", pd.NA: r"\N", None: r"\N"})
     
     # Drop duplicate rows
-    df.drop_duplicates(inplace=True)
+    rows = len(df)
+    with profiling.section("drop_duplicates"):
+        df.drop_duplicates(inplace=True)
+    if counts is not None:
+        counts["rows_dropped"] = counts.get("rows_dropped", 0) + rows - len(df)
 
     # Reset index
     df.reset_index(drop=True, inplace=True)
@@ -153,16 +288,192 @@ def clean_dataframe(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
         config["settings"]["estabelecimentos_apta_only"]
         and table_name == "estabelecimento"
     ):
-        df = filter_estabelecimentos_apta(df)
+        rows = len(df)
+        with profiling.section("filter_estabelecimentos_apta"):
+            df = filter_estabelecimentos_apta(df)
+        if counts is not None:
+            counts["rows_filtered"] = counts.get("rows_filtered", 0) + rows - len(df)
 
     return df
 
 
+def escape_tsv_values(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """
+    Escapes the string columns of a cleaned DataFrame the way `LOAD DATA` expects.
+
+    Backslashes, tabs and line breaks are written as "\\\\", "\\t", "\\n" and "\\r", so the
+    values can be written unquoted. The `\\N` NULL markers are kept as is.
+
+    Args:
+        df (pd.DataFrame): The cleaned DataFrame.
+        table_name (str): The name of the table to determine the string columns.
+
+    Returns:
+        pd.DataFrame: The DataFrame with escaped values.
+    """
+
+    escapes = str.maketrans(TSV_ESCAPES)
+    for col, dtype in TABLE_FIELDS[table_name].items():
+        if dtype == "str":
+            df[col] = df[col].where(df[col] == r"\N", df[col].str.translate(escapes))
+
+    return df
+
+
+def explode_list_column(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """
+    Builds the rows of an exploded table from a cleaned DataFrame of its source table.
+
+    The comma-separated list column is split and exploded with vectorized pandas operations,
+    one row per list value, and the other columns of the exploded table are copied from the
+    source row. NULL lists and empty values are left out, and a value repeated in a list is
+    kept once.
+
+    Args:
+        df (pd.DataFrame): The cleaned DataFrame of the source table.
+        table_name (str): The name of the exploded table.
+
+    Returns:
+        pd.DataFrame: The rows of the exploded table.
+    """
+
+    explode = TABLE_SCHEMA[table_name]["explode"]
+    columns = list(TABLE_FIELDS[table_name])
+    into = explode["into"]
+
+    exploded = (
+        df[[col for col in columns if col != into]]
+        .assign(**{into: df[explode["column"]].str.split(",")})
+        .explode(into)
+    )
+    exploded[into] = exploded[into].str.strip()
+    exploded = exploded[exploded[into].notna() & ~exploded[into].isin(["", r"\N"])]
+
+    return exploded[columns].drop_duplicates()
+
+
+def count_groups(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """
+    Counts the rows of a cleaned DataFrame of a source table by the groups of a summary table.
+
+    The group columns are copied from the source columns, or cut to their first characters
+    (e.g. the year and month of a `YYYYMMDD` date). Missing values are grouped as empty
+    strings, since the group columns make up the primary key of the summary table.
+
+    Args:
+        df (pd.DataFrame): The cleaned DataFrame of the source table.
+        table_name (str): The name of the summary table.
+
+    Returns:
+        pd.DataFrame: The group columns and the row count of each group.
+    """
+
+    group_by = TABLE_SCHEMA[table_name]["aggregate"]["group_by"]
+    count_column = list(TABLE_FIELDS[table_name])[-1]
+    groups = pd.DataFrame(
+        {
+            column: df[source] if length is None else df[source].str.slice(0, length)
+            for column, (source, length) in group_by.items()
+        }
+    ).replace(r"\N", "")
+
+    return groups.value_counts(dropna=False).rename(count_column).reset_index()
+
+
+def sum_counts(counts: list[pd.DataFrame], table_name: str) -> pd.DataFrame:
+    """
+    Merges partial counts of a summary table (see `count_groups`), summing the counts of
+    each group, sorted by group.
+    """
+
+    columns = list(TABLE_FIELDS[table_name])
+    if not counts:
+        return pd.DataFrame(columns=columns)
+
+    return (
+        pd.concat(counts, ignore_index=True)
+        .astype({columns[-1]: "int64"})
+        .groupby(columns[:-1], sort=True)[columns[-1]]
+        .sum()
+        .reset_index()
+    )
+
+
+def merge_summary_files(file_paths: list[str], table_name: str) -> str:
+    """
+    Merges the partial outputs of a summary table (one per source file) into a single
+    output of the month, `{table_name}.{extension}` next to them.
+
+    Each source file of a table is summarized on its own, by whichever worker transforms
+    it, so the same group appears in several partial outputs. They are summed here, before
+    the load, as the groups make up the primary key of the table.
+
+    Args:
+        file_paths (list[str]): The paths to the partial outputs.
+        table_name (str): The name of the summary table.
+    Returns:
+        str: The path to the merged output.
+    """
+
+    extension = OUTPUT_FORMAT_EXTENSIONS[OUTPUT_FORMAT] + COMPRESSION_SUFFIXES[COMPRESSION]
+    output_file = os.path.join(os.path.dirname(file_paths[0]), f"{table_name}{extension}")
+
+    counts = []
+    for file_path in file_paths:
+        if file_path == output_file:
+            continue
+        if get_file_format(file_path) == "tsv":
+            options = {"sep": "\t", "quoting": csv.QUOTE_NONE}
+        else:
+            options = {"sep": ";"}
+        counts.append(
+            pd.read_csv(file_path, dtype=str, keep_default_na=False, **options)
+        )
+
+    partial_file = get_partial_path(output_file)
+    with open_compressed(
+        partial_file, "wt", COMPRESSION_LEVEL, encoding="utf-8", newline=""
+    ) as output:
+        write_chunk(sum_counts(counts, table_name), table_name, output, True)
+    os.replace(partial_file, output_file)
+
+    logging.info(f"Merged {len(counts)} {table_name} outputs into {output_file}.")
+    return output_file
+
+
+def write_chunk(chunk: pd.DataFrame, table_name: str, output, header: bool):
+    """
+    Writes a cleaned chunk to an open output in `performance.output_format`: ";"-separated
+    CSV with quoted text (csv), or tab-separated unquoted values escaped for `LOAD DATA` (tsv).
+    """
+
+    if OUTPUT_FORMAT == "tsv":
+        with profiling.section("escape_tsv_values"):
+            chunk = escape_tsv_values(chunk, table_name)
+        with profiling.section("to_csv"):
+            chunk.to_csv(
+                output,
+                index=False,
+                sep="\t",
+                header=header,
+                quoting=csv.QUOTE_NONE,
+            )
+    else:
+        with profiling.section("to_csv"):
+            chunk.to_csv(
+                output,
+                index=False,
+                sep=";",
+                header=header,
+                quoting=csv.QUOTE_NONNUMERIC,
+            )
+
+
 def remove_existing_files(csv_files_paths: list[str]):
     """
     Removes existing output files for the given list of CSV file paths.
-    This function checks if an output file already exists for each CSV file path
-    in the provided list. If an output file exists, it is deleted.
+    This function checks if an output file (or the output file of a table derived from it)
+    already exists for each CSV file path in the provided list. If it exists, it is deleted.
     Args:
         csv_files_paths (list[str]): A list of paths to CSV files.
     Returns:
@@ -182,52 +493,62 @@ def remove_existing_files(csv_files_paths: list[str]):
             logging.warning(f"Could not determine table for {csv_file_path}, skipping.")
             continue
 
-        output_file = get_output_file_path(csv_file_path, table_name)
-        if os.path.exists(output_file):
-            os.remove(output_file)
-            logging.info(f"Deleted old output file {output_file}.")
+        for table in [table_name, *get_derived_tables(table_name)]:
+            output_file = get_output_file_path(csv_file_path, table)
+            if os.path.exists(output_file):
+                os.remove(output_file)
+                logging.info(f"Deleted old output file {output_file}.")
 
 
-def process_csv(csv_file_path: str) -> str | None:
+def write_transformed_csv(
+    csv_file_path: str,
+    table_name: str,
+    output,
+    derived_outputs: dict | None = None,
+) -> dict[str, int]:
     """
-    Processes a CSV file by reading it in chunks, cleaning the data, and writing the transformed data to a new CSV file.
+    Reads a CSV file in chunks, cleans each chunk and writes it to an open output.
 
-    The function performs the following steps:
-    1. Determines the table name based on the CSV file path.
-    2. Reads the CSV file in chunks, with each chunk being processed separately.
-    3. Cleans the data in each chunk using the `clean_dataframe` function.
-    4. Writes the cleaned data to a new CSV file in the specified output directory.
-    5. Removes the original CSV file after processing is complete.
+    The tables derived from the table are built from each cleaned chunk while it is in
+    memory, and written to their own outputs, if given:
+    - the rows of the exploded tables (see `explode_list_column`), chunk by chunk;
+    - the counts of the summary tables (see `count_groups`), merged across the chunks and
+      written once the file is read.
 
     Notes:
     - The CSV file is expected to be encoded in "latin-1" and use ";" as the separator.
-    - The function handles bad lines by issuing a warning and skipping them.
-    - The pandas dtypes are converted later in clean_dataframe function.
+      It may be compressed (".gz" or ".zst"), in which case it is decompressed on the fly.
+    - Bad lines are skipped with a warning.
+    - The rows read, written, skipped, dropped and filtered, the bad lines and the latency of
+      each chunk are recorded in the run metrics (see `utils.metrics`).
+    - When profiling, the cleaning steps and columns of one chunk every
+      `performance.profile_sample_chunks` are timed (see `utils.profiling`).
+    - The outputs are written in `performance.output_format` (see `write_chunk`).
     - If the number of columns in a chunk does not match the expected number of columns, the chunk is skipped.
-    - The function logs progress and any errors encountered during processing.
 
     Args:
         csv_file_path (str): The path to the CSV file to be processed.
+        table_name (str): The table the CSV file belongs to.
+        output: A text file object the transformed CSV (with header) is written to. It is not closed.
+        derived_outputs (dict | None): The text file objects the derived tables are written
+                                       to, by table name. They are not closed.
     Returns:
-        str | None: The path to the output file if processing is successful, otherwise None.
+        dict[str, int]: The number of rows written to each output, by table name.
     Raises:
-        Exception: If an error occurs during processing, logs the error and returns None.
+        Exception: If an error occurs while reading, cleaning or writing the data.
     """
 
-    logging.info(f"Processing {csv_file_path}...")
-
-    table_name = get_table_name(csv_file_path)
-    if not table_name:
-        logging.warning(
-            f"Warning: Could not determine table for {csv_file_path}, skipping."
-        )
-        return None
-
-    output_file = get_output_file_path(csv_file_path, table_name)
     expected_columns = list(TABLE_FIELDS[table_name].keys())
-
-    try:
-        first_chunk = True
+    file_name = os.path.basename(csv_file_path)
+    counts = {"rows_read": 0, "rows_written": 0, "rows_skipped": 0}
+    derived_outputs = derived_outputs or {}
+    derived_rows = dict.fromkeys(derived_outputs, 0)
+    summary_counts = {table: [] for table in derived_outputs if is_summary_table(table)}
+
+    chunk_index = 0
+    chunk_start = time.perf_counter()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", pd.errors.ParserWarning)
         for chunk in pd.read_csv(
             csv_file_path,
             encoding="latin-1",
@@ -238,44 +559,291 @@ def process_csv(csv_file_path: str) -> str | None:
             low_memory=False,
             chunksize=READ_CHUNK_SIZE,
         ):
+            counts["rows_read"] += len(chunk)
+            profiling.sample_chunk(chunk_index)
             if len(chunk.columns) != len(expected_columns):
                 logging.warning(
                     f"Warning: {csv_file_path} has {len(chunk.columns)} columns but expected {len(expected_columns)}. Skipping chunk."
                 )
+                counts["rows_skipped"] += len(chunk)
                 continue
 
             chunk.columns = expected_columns
-            chunk = clean_dataframe(chunk, table_name)
-            chunk.to_csv(
-                output_file,
-                mode="a",
-                index=False,
-                sep=";",
-                header=first_chunk,
-                encoding="utf-8",
-                quoting=csv.QUOTE_NONNUMERIC,
+            with profiling.section("clean_dataframe"):
+                chunk = clean_dataframe(chunk, table_name, counts)
+            for table, derived_output in derived_outputs.items():
+                if table in summary_counts:
+                    with profiling.section(f"count_{table}"):
+                        summary_counts[table].append(count_groups(chunk, table))
+                    continue
+                with profiling.section(f"explode_{table}"):
+                    exploded = explode_list_column(chunk, table)
+                    write_chunk(exploded, table, derived_output, chunk_index == 0)
+                derived_rows[table] += len(exploded)
+            write_chunk(chunk, table_name, output, chunk_index == 0)
+            counts["rows_written"] += len(chunk)
+            chunk_index += 1
+
+            # Reading, cleaning and writing the chunk
+            chunk_end = time.perf_counter()
+            METRICS.observe("transform", "chunk_seconds", chunk_end - chunk_start)
+            chunk_start = chunk_end
+
+    # Bad lines are reported by pandas as "Skipping line N: ..." warnings
+    counts["bad_lines"] = 0
+    for warning in caught:
+        if issubclass(warning.category, pd.errors.ParserWarning):
+            counts["bad_lines"] += str(warning.message).count("Skipping line")
+            logging.warning(f"{csv_file_path}: {str(warning.message).strip()}")
+        else:
+            warnings.showwarning(
+                warning.message, warning.category, warning.filename, warning.lineno
+            )
+
+    for name, value in counts.items():
+        METRICS.add("transform", name, value, file_name)
+    for table, table_counts in summary_counts.items():
+        summary = sum_counts(table_counts, table)
+        write_chunk(summary, table, derived_outputs[table], True)
+        derived_rows[table] = len(summary)
+
+    for table, rows in derived_rows.items():
+        METRICS.add(
+            "transform",
+            "rows_summarized" if table in summary_counts else "rows_exploded",
+            rows,
+            file_name,
+        )
+
+    return {table_name: counts["rows_written"], **derived_rows}
+
+
+def transform_file(
+    csv_file_path: str, table_name: str
+) -> tuple[str, int, str, dict[str, dict]]:
+    """
+    Transforms an extracted CSV file into its output file, leaving the input in place.
+
+    The cleaned data is written to a hidden partial file, renamed to the output file once
+    complete, and so are the tables derived from the table (see `get_derived_tables`).
+    With the transform cache enabled, the cached outputs are hard-linked instead when the
+    same source was already transformed with the same settings, and fresh outputs are added
+    to the cache (see `transform.transform_cache`).
+
+    Args:
+        csv_file_path (str): The path to the CSV file to be processed.
+        table_name (str): The table the CSV file belongs to.
+    Returns:
+        tuple[str, int, str, dict[str, dict]]: The path to the output file, its number of rows,
+                                               its checksum and the "output", "rows" and
+                                               "sha256" of each derived table.
+    Raises:
+        Exception: If an error occurs while reading, cleaning or writing the data.
+    """
+
+    output_files = {
+        table: get_output_file_path(csv_file_path, table)
+        for table in [table_name, *get_derived_tables(table_name)]
+    }
+    extension = OUTPUT_FORMAT_EXTENSIONS[OUTPUT_FORMAT] + COMPRESSION_SUFFIXES[COMPRESSION]
+    file_name = os.path.basename(csv_file_path)
+
+    with METRICS.timer("transform", file_name), profiling.profile_unit("transform", file_name):
+        rows = None
+        if transform_cache.is_cache_enabled():
+            cache_key = transform_cache.get_cache_key(
+                csv_file_path, get_transform_fingerprint(table_name)
             )
-            first_chunk = False
+            # The derived tables are cached under keys derived from the source's key
+            cache_keys = {
+                table: transform_cache.get_derived_key(cache_key, table)
+                for table in output_files
+                if table != table_name
+            }
+            cache_keys[table_name] = cache_key
+            rows = {}
+            for table, output_file in output_files.items():
+                rows[table] = transform_cache.fetch_cached_output(
+                    cache_keys[table], extension, output_file
+                )
+                if rows[table] is None:
+                    rows = None
+                    break
+            if rows is not None:
+                logging.info(f"Reused the cached transform of {csv_file_path}.")
+                METRICS.add("transform", "cache_hits", 1, file_name)
+
+        if rows is None:
+            # Unique partial files, so two workers transforming the same file never write
+            # into each other's outputs
+            partial_files = {
+                table: get_partial_path(output_file, unique=True)
+                for table, output_file in output_files.items()
+            }
+            try:
+                with contextlib.ExitStack() as stack:
+                    outputs = {
+                        table: stack.enter_context(
+                            open_compressed(
+                                partial_files[table],
+                                "wt",
+                                COMPRESSION_LEVEL,
+                                encoding="utf-8",
+                                newline="",
+                            )
+                        )
+                        for table in output_files
+                    }
+                    output = outputs.pop(table_name)
+                    rows = write_transformed_csv(csv_file_path, table_name, output, outputs)
+            except Exception:
+                for partial_file in partial_files.values():
+                    if os.path.exists(partial_file):
+                        os.remove(partial_file)
+                raise
+            for table, output_file in output_files.items():
+                os.replace(partial_files[table], output_file)
+            METRICS.add("transform", "bytes", os.path.getsize(csv_file_path), file_name)
+
+            if transform_cache.is_cache_enabled():
+                for table, output_file in output_files.items():
+                    transform_cache.store_output(
+                        cache_keys[table], extension, output_file, rows[table]
+                    )
+
+    output_file = output_files.pop(table_name)
+    derived = {
+        table: {
+            "output": derived_file,
+            "rows": rows[table],
+            "sha256": get_file_checksum(derived_file),
+        }
+        for table, derived_file in output_files.items()
+    }
+    return output_file, rows[table_name], get_file_checksum(output_file), derived
+
+
+def commit_transform(
+    csv_file_path: str,
+    table_name: str,
+    result: tuple[str, int, str, dict[str, dict]],
+    manifest: RunManifest | None = None,
+):
+    """
+    Records a transformed file in the run manifest, then removes its input.
+
+    The outputs of the tables derived from it are recorded under the "children" key of its
+    record (see `get_record_outputs`).
+
+    Args:
+        csv_file_path (str): The path to the extracted CSV file.
+        table_name (str): The table the CSV file belongs to.
+        result (tuple[str, int, str, dict[str, dict]]): The output file, row count, checksum
+                                                        and derived outputs (see `transform_file`).
+        manifest (RunManifest | None): The run manifest of the month, if any.
+    """
 
-        os.remove(csv_file_path)
-        logging.info(f"Finished processing and removed {csv_file_path}.")
-        return output_file
+    output_file, rows, checksum, derived = result
+    if manifest is not None:
+        manifest.mark_done(
+            "transformed",
+            os.path.basename(csv_file_path),
+            output=output_file,
+            table=table_name,
+            rows=rows,
+            sha256=checksum,
+            children=derived,
+        )
+
+    os.remove(csv_file_path)
+    logging.info(f"Finished processing and removed {csv_file_path}.")
+
+
+def process_csv(csv_file_path: str, manifest: RunManifest | None = None) -> str | None:
+    """
+    Processes a CSV file by reading it in chunks, cleaning the data, and writing the transformed data to a new CSV file.
+
+    The function performs the following steps:
+    1. Determines the table name based on the CSV file path.
+    2. Transforms the file into its output file (see `transform_file`), reading it in chunks
+       and cleaning each chunk with the `clean_dataframe` function.
+    3. Records the file in the run manifest, with the output checksum and row count.
+    4. Removes the original CSV file after processing is complete.
+
+    Notes:
+    - See `write_transformed_csv` for the reading and cleaning details.
+    - The pandas dtypes are converted later in clean_dataframe function.
+    - The function logs progress and any errors encountered during processing.
+
+    Args:
+        csv_file_path (str): The path to the CSV file to be processed.
+        manifest (RunManifest | None): The run manifest of the month, if any.
+    Returns:
+        str | None: The path to the output file if processing is successful, otherwise None.
+    Raises:
+        Exception: If an error occurs during processing, logs the error and returns None.
+    """
+
+    logging.info(f"Processing {csv_file_path}...")
+
+    table_name = get_table_name(csv_file_path)
+    if not table_name:
+        logging.warning(
+            f"Warning: Could not determine table for {csv_file_path}, skipping."
+        )
+        return None
+
+    try:
+        result = transform_file(csv_file_path, table_name)
+        commit_transform(csv_file_path, table_name, result, manifest)
+        return result[0]
     except Exception as e:
         logging.error(f"Error processing {csv_file_path}: {e}")
         return None
 
 
+def get_latest_extracted_data() -> list[str]:
+    """
+    Retrieves the extracted data files of the latest (or user-selected) month.
+
+    Returns:
+        list[str]: A list of file paths for the extracted files in the selected month.
+    Raises:
+        Exception: If no available months are found in the extraction path.
+    """
+
+    months = sorted(os.listdir(EXTRACT_PATH), reverse=True)
+    if not months:
+        logging.error("No available months found.")
+        raise Exception("No available months found.")
+
+    if config["settings"]["ask_user"]:
+        month = ask_month(months)
+    else:
+        month = months[0]
+
+    return [
+        os.path.join(EXTRACT_PATH, month, file)
+        for file in sorted(os.listdir(os.path.join(EXTRACT_PATH, month)))
+    ]
+
+
 def transform_data(csv_files_paths: list[str] = []) -> list[str]:
     """
     Transforms the data from the given CSV file paths.
     If no CSV file paths are provided, it will look for available months in the
     extraction path, ask the user to select a month (if configured to do so),
     and use the CSV files from the selected month.
+
+    Files already transformed according to the run manifest are not transformed again,
+    so an interrupted run resumes with the remaining files.
+
     Args:
         csv_files_paths (list[str], optional): List of paths to the CSV files to be transformed.
                                                Defaults to an empty list.
     Returns:
-        list[str]: List of paths to the transformed data files.
+        list[str]: List of paths to the transformed data files of the month (with the files of
+                   the derived tables), including the ones transformed by previous runs.
     Raises:
         Exception: If no available months are found in the extraction path.
     Logs:
@@ -283,35 +851,35 @@ def transform_data(csv_files_paths: list[str] = []) -> list[str]:
     """
 
     if not len(csv_files_paths) > 0:
-        # Getting available months
-        months = sorted(os.listdir(EXTRACT_PATH), reverse=True)
-        if not months:
-            logging.error("No available months found.")
-            raise Exception("No available months found.")
-
-        if config["settings"]["ask_user"]:
-            month = ask_month(months)
-        else:
-            month = months[0]
+        csv_files_paths = get_latest_extracted_data()
 
-        csv_files_paths = [
-            os.path.join(EXTRACT_PATH, month, file)
-            for file in sorted(os.listdir(os.path.join(EXTRACT_PATH, month)))
-        ]
-    else:
-        month = os.path.basename(os.path.dirname(csv_files_paths[0]))
+    month = os.path.basename(os.path.dirname(csv_files_paths[0]))
+    manifest = RunManifest(month)
+    METRICS.set_month(month)
 
     transformed_path = os.path.join(TRANSFORMED_PATH, month)
     os.makedirs(transformed_path, exist_ok=True)
-    remove_existing_files(csv_files_paths)
-
-    transformed_data = []
 
+    pending_files = []
     for csv_file_path in csv_files_paths:
-        output_file = process_csv(csv_file_path)
+        if is_transformed(manifest.get("transformed", os.path.basename(csv_file_path))):
+            logging.info(f"Skipping {csv_file_path}, already transformed.")
+            if os.path.exists(csv_file_path):
+                os.remove(csv_file_path)
+        else:
+            pending_files.append(csv_file_path)
+
+    remove_existing_files(pending_files)
+
+    for csv_file_path in pending_files:
+        output_file = process_csv(csv_file_path, manifest)
         if output_file:
             logging.info(f"{output_file} created.")
-            transformed_data.append(output_file)
 
     logging.info("Transformation completed!")
-    return transformed_data
+    return [
+        output
+        for record in manifest.entries("transformed").values()
+        for output in get_record_outputs(record).values()
+        if os.path.exists(output)
+    ]
@@ -1,11 +1,9 @@
-import psycopg2
-import mysql.connector
-from utils.helpers import load_config
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import sqlite3
+from utils.helpers import get_config
 
+# The database drivers are imported on first connection, so only the configured one is loaded
 # Configuration
-config = load_config()
+config = get_config()
 
 DB_TYPE = config["database"]["type"]
 DB_HOST = config["database"]["host"]
@@ -13,6 +11,7 @@ DB_USERNAME = config["database"]["username"]
 DB_PASSWORD = config["database"]["password"]
 DB_NAME = config["database"]["database_name"]
 DB_PORT = config["database"]["port"]
+DB_PATH = config["database"]["path"]
 
 SQL_ALCHEMY_MYSQL_URL = (
     f"mysql+mysqlconnector://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
@@ -20,7 +19,10 @@ SQL_ALCHEMY_MYSQL_URL = (
 SQL_ALCHEMY_PG_URL = (
     f"postgresql://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
-PG_URL = f"dbname={DB_NAME} user={DB_USERNAME} host={DB_HOST} port={DB_HOST} password={DB_PASSWORD}"
+SQL_ALCHEMY_SQLITE_URL = f"sqlite:///{DB_PATH}"
+PG_URL = f"dbname={DB_NAME} user={DB_USERNAME} host={DB_HOST} port={DB_PORT} password={DB_PASSWORD}"
+# The driver modules, which must not be imported before a step connects
+DRIVER_MODULES = ["duckdb", "mysql.connector", "psycopg2", "sqlalchemy"]
 
 # Classes definition
 
@@ -56,6 +58,8 @@ class MySQLConn:
         self.port = port
 
     def connect(self, host, user, password, database, port):
+        import mysql.connector
+
         if self.conn is None:
             self.conn = mysql.connector.connect(
                 host=host,
@@ -79,12 +83,15 @@ class MySQLConn:
         return self.conn
     
     def create_new_connection(self):
+        import mysql.connector
+
         return mysql.connector.connect(
             host=self.host,
             user=self.user,
             password=self.password,
             database=self.database,
             port=self.port,
+            allow_local_infile=True,
         )
 
     def close_connection(self):
@@ -106,6 +113,8 @@ class Psycopg2Conn:
           Establishes a connection to the PostgreSQL database if not already connected.
         get_connection():
           Returns the current connection object, establishing a connection if not already connected.
+        create_new_connection():
+          Returns a new, independent connection object (e.g. for use in another thread).
         close_connection():
           Closes the connection to the PostgreSQL database if it is open.
     """
@@ -115,6 +124,8 @@ class Psycopg2Conn:
         self.url = url
 
     def connect(self):
+        import psycopg2
+
         if self.conn is None:
             self.conn = psycopg2.connect(self.url)
 
@@ -123,6 +134,11 @@ class Psycopg2Conn:
             self.connect()
         return self.conn
 
+    def create_new_connection(self):
+        import psycopg2
+
+        return psycopg2.connect(self.url)
+
     def close_connection(self):
         if self.conn is not None:
             self.conn.close()
@@ -135,24 +151,31 @@ class SQLAlchemyConn:
 
     Attributes:
       url (str): The database URL.
+      engine_options (dict): Keyword arguments of `create_engine` (e.g. `pool_size`).
 
     Methods:
       connect():
         Establishes a connection to the database and initializes the session factory.
       get_session():
         Returns a new session object. If the connection is not established, it will call connect() first.
+      get_pooled_connection():
+        Checks a connection out of the engine's pool. Closing it returns it to the pool.
       close_connection():
         Closes the database connection and disposes of the engine.
     """
 
-    def __init__(self, url):
+    def __init__(self, url, **engine_options):
         self.engine = None
         self.Session = None
         self.url = url
+        self.engine_options = engine_options
 
     def connect(self):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+
         if self.engine is None:
-            self.engine = create_engine(self.url)
+            self.engine = create_engine(self.url, **self.engine_options)
             self.Session = sessionmaker(bind=self.engine)
 
     def get_session(self):
@@ -160,6 +183,11 @@ class SQLAlchemyConn:
             self.connect()
         return self.Session()
 
+    def get_pooled_connection(self):
+        if self.engine is None:
+            self.connect()
+        return self.engine.connect()
+
     def get_engine(self):
         return self.engine
 
@@ -170,6 +198,68 @@ class SQLAlchemyConn:
             self.Session = None
 
 
+class SQLiteConn:
+    """
+    A class used to manage a connection to an embedded SQLite database file.
+
+    Attributes:
+      path (str): The path to the database file. It is created if it does not exist.
+      conn (sqlite3.Connection or None): The connection object to the SQLite database.
+
+    Methods:
+      get_connection():
+        Returns the current connection object, establishing a connection if not already connected.
+      close_connection():
+        Closes the connection to the SQLite database if it is open.
+    """
+
+    def __init__(self, path):
+        self.conn = None
+        self.path = path
+
+    def get_connection(self):
+        if self.conn is None:
+            self.conn = sqlite3.connect(self.path)
+        return self.conn
+
+    def close_connection(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class DuckDBConn:
+    """
+    A class used to manage a connection to an embedded DuckDB database file.
+
+    Attributes:
+      path (str): The path to the database file. It is created if it does not exist.
+      conn (duckdb.DuckDBPyConnection or None): The connection object to the DuckDB database.
+
+    Methods:
+      get_connection():
+        Returns the current connection object, establishing a connection if not already connected.
+      close_connection():
+        Closes the connection to the DuckDB database if it is open.
+    """
+
+    def __init__(self, path):
+        self.conn = None
+        self.path = path
+
+    def get_connection(self):
+        import duckdb
+
+        if self.conn is None:
+            self.conn = duckdb.connect(self.path)
+        return self.conn
+
+    def close_connection(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
 # Export connections instances
 match (DB_TYPE):
     case "postgresql":
@@ -184,3 +274,7 @@ match (DB_TYPE):
             port=DB_PORT,
         )
         SQL_ALCHEMY_MYSQL_CONN = SQLAlchemyConn(SQL_ALCHEMY_MYSQL_URL)
+    case "duckdb":
+        EMBEDDED_CONN = DuckDBConn(DB_PATH)
+    case "sqlite":
+        EMBEDDED_CONN = SQLiteConn(DB_PATH)
@@ -1,44 +1,351 @@
-from sqlalchemy import Table, Column, String, Integer, Float, Boolean, MetaData
-from constants.table_fields import TABLE_FIELDS
-from utils.database.conn import SQL_ALCHEMY_CONN
+import re
 
-metadata = MetaData()
+from constants.table_schema import TABLE_SCHEMA
+from utils.helpers import get_config
 
-SQL_TYPE_MAP = {
-    "str": String,
-    "float": Float,
+# Configuration
+config = get_config()
+ROW_FORMAT = config["performance"]["row_format"]
+
+# Backend types of the `TABLE_SCHEMA` column types. "{}" is replaced by the type arguments.
+# Fixed-width codes are ASCII CHARs in MySQL (1 byte per character instead of up to 4),
+# PostgreSQL gains nothing from CHAR so they stay VARCHARs there.
+COLUMN_TYPES = {
+    "mysql": {
+        "char": "CHAR({}) CHARACTER SET ascii",
+        "varchar": "VARCHAR({})",
+        "text": "TEXT",
+        "date": "DATE",
+        "decimal": "DECIMAL({})",
+        "integer": "BIGINT",
+    },
+    "postgresql": {
+        "char": "VARCHAR({})",
+        "varchar": "VARCHAR({})",
+        "text": "TEXT",
+        "date": "DATE",
+        "decimal": "NUMERIC({})",
+        "integer": "BIGINT",
+    },
+    "duckdb": {
+        "char": "VARCHAR",
+        "varchar": "VARCHAR",
+        "text": "VARCHAR",
+        "date": "DATE",
+        "decimal": "DECIMAL({})",
+        "integer": "BIGINT",
+    },
+    "sqlite": {
+        "char": "TEXT",
+        "varchar": "TEXT",
+        "text": "TEXT",
+        "date": "TEXT",
+        "decimal": "REAL",
+        "integer": "INTEGER",
+    },
+}
+LOAD_LOG_SQL = {
+    "mysql": """
+    CREATE TABLE IF NOT EXISTS load_log (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        selected_year_month VARCHAR(7) NOT NULL,
+        processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "postgresql": """
+    CREATE TABLE IF NOT EXISTS load_log (
+        id SERIAL PRIMARY KEY,
+        selected_year_month VARCHAR(7) NOT NULL,
+        processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "duckdb": """
+    CREATE TABLE IF NOT EXISTS load_log (
+        selected_year_month VARCHAR(7) NOT NULL,
+        processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "sqlite": """
+    CREATE TABLE IF NOT EXISTS load_log (
+        selected_year_month VARCHAR(7) NOT NULL,
+        processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+}
+# Backends with a text search index on the `TABLE_SCHEMA` search columns (see
+# `get_search_index_sql`), and the statements run once before building them. DuckDB has
+# no built-in n-gram index (its `fts` extension indexes whole words and must be installed).
+SEARCH_DATABASES = ["mysql", "postgresql", "sqlite"]
+SEARCH_SETUP_SQL = {
+    "postgresql": ["CREATE EXTENSION IF NOT EXISTS pg_trgm;"],
 }
 
 
-def create_tables():
-    """Creates tables in PostgreSQL if they do not exist."""
-    tables = {}
+def get_column_type(column_type: str, db_type: str) -> str:
+    """
+    Converts a `TABLE_SCHEMA` column type (e.g. "char(8)") to the type of a backend.
+
+    Args:
+        column_type (str): The backend-neutral column type.
+        db_type (str): The database type ("mysql", "postgresql", "duckdb" or "sqlite").
+    Returns:
+        str: The backend column type (e.g. "CHAR(8) CHARACTER SET ascii").
+    """
+
+    kind, arguments = re.fullmatch(r"(\w+)(?:\((.+)\))?", column_type).groups()
+    return COLUMN_TYPES[db_type][kind].format(arguments)
+
+
+def get_index_name(table_name: str, columns: list[str]) -> str:
+    """Returns the name of the index of a table on the given columns."""
+    return f"idx_{table_name}_{'_'.join(columns)}"
+
+
+def get_create_table_sql(
+    table_name: str,
+    db_type: str,
+    table_suffix: str = "",
+    with_keys: bool = True,
+    historical: bool = False,
+    unlogged: bool = False,
+) -> str:
+    """
+    Generates the `CREATE TABLE` statement of a `TABLE_SCHEMA` table for a backend.
+
+    Generated columns are only created in MySQL and PostgreSQL. In MySQL, the table also
+    gets `performance.row_format` as its `ROW_FORMAT` and its partitions.
+
+    Args:
+        table_name (str): The name of the table in `TABLE_SCHEMA`.
+        db_type (str): The database type ("mysql", "postgresql", "duckdb" or "sqlite").
+        table_suffix (str): Suffix appended to the table name (e.g. "_new").
+        with_keys (bool): If False, the primary key and indexes are left out, to be built
+                          after the load (see `get_primary_key_sql` and `get_index_sql`).
+        historical (bool): MySQL only. Adds the `ref_month` column (YYYYMM) to the table and
+                           its primary key, and partitions the table by month. Only a
+                           placeholder partition is created, months are added on load.
+        unlogged (bool): PostgreSQL only. Creates the table UNLOGGED.
+    Returns:
+        str: The SQL statement.
+    """
+
+    schema = TABLE_SCHEMA[table_name]
+    definitions = [
+        f"{column} {get_column_type(column_type, db_type)}"
+        for column, column_type in schema["columns"].items()
+    ]
+
+    if db_type in ["mysql", "postgresql"]:
+        for column, (column_type, source_columns) in schema.get("generated", {}).items():
+            expression = (
+                f"CONCAT({', '.join(source_columns)})"
+                if db_type == "mysql"
+                else " || ".join(source_columns)
+            )
+            definitions.append(
+                f"{column} {get_column_type(column_type, db_type)} "
+                f"GENERATED ALWAYS AS ({expression}) STORED"
+            )
+
+    primary_key = list(schema["primary_key"])
+    if historical:
+        definitions.append("ref_month INT NOT NULL")
+        primary_key.append("ref_month")
+
+    if with_keys:
+        definitions.append(f"PRIMARY KEY ({', '.join(primary_key)})")
+        if db_type == "mysql":
+            definitions.extend(
+                f"INDEX {get_index_name(table_name, columns)} ({', '.join(columns)})"
+                for columns in schema.get("indexes", [])
+            )
+
+    options = ""
+    if db_type == "mysql":
+        options = f" ROW_FORMAT={ROW_FORMAT.upper()}"
+        if historical:
+            options += " PARTITION BY LIST (ref_month) (PARTITION p000000 VALUES IN (0))"
+        elif "partition" in schema:
+            partitions = ",\n        ".join(
+                f"PARTITION {name} VALUES IN ({', '.join(repr(value) for value in values)})"
+                for name, values in schema["partition"]["values"].items()
+            )
+            options += (
+                f" PARTITION BY LIST COLUMNS({schema['partition']['column']}) (\n"
+                f"        {partitions}\n    )"
+            )
+
+    create = "CREATE UNLOGGED TABLE" if unlogged else "CREATE TABLE"
+    if historical:
+        create += " IF NOT EXISTS"
+    columns = ",\n        ".join(definitions)
+    return f"""
+    {create} {table_name}{table_suffix} (
+        {columns}
+    ){options}"""
+
+
+def get_create_tables_sql(
+    db_type: str, tables: list[str] | None = None, **kwargs
+) -> list[str]:
+    """
+    Generates the `CREATE TABLE` statements of the `load_log` table and the given tables.
+
+    Args:
+        db_type (str): The database type ("mysql", "postgresql", "duckdb" or "sqlite").
+        tables (list[str] | None): The tables to create. Defaults to every `TABLE_SCHEMA` table.
+        **kwargs: Passed to `get_create_table_sql` (e.g. `table_suffix`, `with_keys`).
+    Returns:
+        list[str]: The SQL statements.
+    """
+
+    return [LOAD_LOG_SQL[db_type]] + [
+        get_create_table_sql(table, db_type, **kwargs)
+        for table in (tables if tables is not None else TABLE_SCHEMA)
+    ]
+
+
+def get_primary_key_sql(table_name: str, db_type: str) -> str:
+    """
+    Generates the statement adding the primary key of a table created without keys.
+
+    DuckDB and SQLite cannot add a primary key to an existing table, so a unique index
+    (`pk_{table_name}`) is built instead.
+
+    Args:
+        table_name (str): The name of the table in `TABLE_SCHEMA`.
+        db_type (str): The database type ("mysql", "postgresql", "duckdb" or "sqlite").
+    Returns:
+        str: The SQL statement.
+    """
+
+    keys = ", ".join(TABLE_SCHEMA[table_name]["primary_key"])
+    if db_type in ["duckdb", "sqlite"]:
+        return f"CREATE UNIQUE INDEX pk_{table_name} ON {table_name} ({keys});"
+    return f"ALTER TABLE {table_name} ADD PRIMARY KEY ({keys});"
+
+
+def get_index_sql(table_name: str, db_type: str) -> list[str]:
+    """
+    Generates the `CREATE INDEX` statements of a table created without keys.
+
+    Indexes on generated columns are left out for DuckDB and SQLite, where those columns
+    are not created.
+
+    Args:
+        table_name (str): The name of the table in `TABLE_SCHEMA`.
+        db_type (str): The database type ("mysql", "postgresql", "duckdb" or "sqlite").
+    Returns:
+        list[str]: The SQL statements.
+    """
+
+    schema = TABLE_SCHEMA[table_name]
+    statements = []
+    for columns in schema.get("indexes", []):
+        if db_type in ["duckdb", "sqlite"] and any(
+            column in schema.get("generated", {}) for column in columns
+        ):
+            continue
+        statements.append(
+            f"CREATE INDEX {get_index_name(table_name, columns)} "
+            f"ON {table_name} ({', '.join(columns)});"
+        )
+    return statements
+
+
+def get_search_table_name(table_name: str, column: str) -> str:
+    """Returns the name of the search table of a search column (MySQL and SQLite)."""
+    return f"search_{table_name}_{column}"
+
+
+def get_search_index_sql(
+    table_name: str, column: str, db_type: str, historical: bool = False
+) -> list[str]:
+    """
+    Generates the statements (re)building the text search index of a search column.
+
+    - MySQL: a FULLTEXT index with the n-gram parser on a search table holding the primary
+      key and the column of the rows with a value. InnoDB has no FULLTEXT indexes on
+      partitioned tables, so it cannot be built on the table itself. Matching follows the
+      column collation (accent- and case-insensitive by default).
+    - PostgreSQL: a trigram GIN index on the column (`pg_trgm`, see `SEARCH_SETUP_SQL`),
+      used by `ILIKE` searches.
+    - SQLite: an FTS5 search table with the trigram tokenizer, holding the primary key
+      (unindexed) and the column of the rows with a value.
+
+    Args:
+        table_name (str): The name of the table in `TABLE_SCHEMA`.
+        column (str): The search column.
+        db_type (str): The database type ("mysql", "postgresql" or "sqlite").
+        historical (bool): MySQL only. Keeps the `ref_month` column in the search table.
+    Returns:
+        list[str]: The SQL statements, to run in order (none for the other backends).
+    """
+
+    keys = list(TABLE_SCHEMA[table_name]["primary_key"])
+    if historical:
+        keys.append("ref_month")
+    search_table = get_search_table_name(table_name, column)
+    select = (
+        f"SELECT {', '.join(keys)}, {column} FROM {table_name} "
+        f"WHERE {column} IS NOT NULL AND {column} <> ''"
+    )
+
+    match db_type:
+        case "mysql":
+            return [
+                f"DROP TABLE IF EXISTS {search_table};",
+                f"CREATE TABLE {search_table} ROW_FORMAT={ROW_FORMAT.upper()} AS {select};",
+                f"ALTER TABLE {search_table} ADD FULLTEXT INDEX ft_{search_table} ({column}) "
+                f"WITH PARSER ngram;",
+            ]
+        case "postgresql":
+            index = f"ft_{table_name}_{column}"
+            return [
+                f"DROP INDEX IF EXISTS {index};",
+                f"CREATE INDEX {index} ON {table_name} USING gin ({column} gin_trgm_ops);",
+            ]
+        case "sqlite":
+            columns = ", ".join([*(f"{key} UNINDEXED" for key in keys), column])
+            return [
+                f"DROP TABLE IF EXISTS {search_table};",
+                f"CREATE VIRTUAL TABLE {search_table} USING fts5({columns}, tokenize='trigram');",
+                f"INSERT INTO {search_table} {select};",
+            ]
+    return []
+
 
-    for table_name, fields in TABLE_FIELDS.items():
-        columns = [
-            Column(column_name, SQL_TYPE_MAP[column_type])
-            for column_name, column_type in fields.items()
-        ]
+def get_search_query(
+    table_name: str, column: str, term: str, db_type: str, indexed: bool = True
+) -> tuple[str, tuple]:
+    """
+    Builds the query for the primary keys of the rows whose search column contains a term.
 
-        # Add primary key (assumes first column is the PK)
-        columns[0].primary_key = True
+    With `indexed`, MySQL and SQLite query the search table (the term is matched as a
+    phrase, of at least 3 characters in SQLite). Otherwise, and on PostgreSQL and DuckDB, the
+    table is queried with `LIKE` (`ILIKE` on PostgreSQL and DuckDB), which PostgreSQL serves
+    from the trigram index when it exists.
 
-        tables[table_name] = Table(table_name, metadata, *columns)
+    Args:
+        table_name (str): The name of the table in `TABLE_SCHEMA`.
+        column (str): The search column.
+        term (str): The searched text.
+        db_type (str): The database type ("mysql", "postgresql", "duckdb" or "sqlite").
+        indexed (bool): Whether the search index of the column exists.
+    Returns:
+        tuple[str, tuple]: The SQL statement and its parameters.
+    """
 
-    with SQL_ALCHEMY_CONN.get_session() as conn:
-        metadata.create_all(conn)
-    print("Tables created successfully.")
-    
-    return tables
+    keys = ", ".join(TABLE_SCHEMA[table_name]["primary_key"])
+    placeholder = "%s" if db_type in ["mysql", "postgresql"] else "?"
 
+    if indexed and db_type in ["mysql", "sqlite"]:
+        search_table = get_search_table_name(table_name, column)
+        if db_type == "mysql":
+            condition = f"MATCH ({column}) AGAINST ({placeholder} IN BOOLEAN MODE)"
+        else:
+            condition = f"{search_table} MATCH {placeholder}"
+        phrase = '"' + term.replace('"', "") + '"'
+        return f"SELECT {keys} FROM {search_table} WHERE {condition}", (phrase,)
 
-# empresa = Table(
-#     "empresa", metadata,
-#     Column("cnpj", String, primary_key=True),
-#     Column("razao_social", String),
-#     Column("codigo_natureza_juridica", String),
-#     Column("qualificacao_do_responsavel", String),
-#     Column("capital_social", Float),
-#     Column("porte", String),
-#     Column("ente_federativo_responsavel", String),
-# )
+    operator = "ILIKE" if db_type in ["postgresql", "duckdb"] else "LIKE"
+    return (
+        f"SELECT {keys} FROM {table_name} WHERE {column} {operator} {placeholder}",
+        (f"%{term}%",),
+    )
@@ -1,7 +1,7 @@
 import mysql.connector
-from utils.helpers import load_config
+from utils.helpers import get_config
 
-config = load_config()
+config = get_config()
 DB_HOST = config["database"]["host"]
 DB_USERNAME = config["database"]["username"]
 DB_PASSWORD = config["database"]["password"]
@@ -0,0 +1,100 @@
+import csv
+import heapq
+import os
+import pandas as pd
+from typing import Iterator
+
+from utils.helpers import get_file_format, unescape_tsv_value
+
+KEY_SEPARATOR = "\x1f"
+
+
+def write_sorted_runs(
+    file_paths: list[str], key_columns: list[str], run_dir: str, chunk_size: int
+) -> list[str]:
+    """
+    Splits transformed CSV files into sorted runs for an external merge sort.
+
+    Each file is read in chunks of `chunk_size` rows. Every row is prefixed with its key
+    (the `key_columns` joined by `KEY_SEPARATOR`) and a hash of all its values, and each
+    chunk is written to its own run file sorted by key. The sort is stable, so rows with
+    the same key keep their original order across runs. TSV values are unescaped first, so
+    runs hold the same values whatever the format of the transformed files.
+
+    Args:
+        file_paths (list[str]): Paths to the transformed files (with header).
+        key_columns (list[str]): The columns that make up the sort key.
+        run_dir (str): Directory where the run files are written.
+        chunk_size (int): Number of rows sorted in memory at once.
+    Returns:
+        list[str]: The paths to the run files, in input order.
+    """
+
+    os.makedirs(run_dir, exist_ok=True)
+    run_paths = []
+
+    for file_path in file_paths:
+        is_tsv = get_file_format(file_path) == "tsv"
+        for chunk in pd.read_csv(
+            file_path,
+            sep="\t" if is_tsv else ";",
+            quoting=csv.QUOTE_NONE if is_tsv else csv.QUOTE_MINIMAL,
+            dtype=str,
+            keep_default_na=False,
+            encoding="utf-8",
+            chunksize=chunk_size,
+        ):
+            if is_tsv:
+                chunk = chunk.map(unescape_tsv_value)
+            columns = list(chunk.columns)
+            chunk.insert(
+                0,
+                "_hash",
+                pd.util.hash_pandas_object(chunk[columns], index=False).astype(str),
+            )
+            chunk.insert(0, "_key", chunk[key_columns].agg(KEY_SEPARATOR.join, axis=1))
+            chunk.sort_values("_key", kind="mergesort", inplace=True)
+
+            run_path = os.path.join(run_dir, f"run_{len(run_paths)}.csv")
+            chunk.to_csv(
+                run_path, index=False, header=False, sep=";", encoding="utf-8"
+            )
+            run_paths.append(run_path)
+
+    return run_paths
+
+
+def merge_sorted_runs(run_paths: list[str]) -> Iterator[list[str]]:
+    """
+    Merges sorted run files into a single stream of rows ordered by key.
+
+    Args:
+        run_paths (list[str]): Paths to the run files written by `write_sorted_runs`.
+    Yields:
+        list[str]: Rows as `[key, row_hash, *values]`, ordered by key.
+    """
+
+    files = [open(path, "r", encoding="utf-8", newline="") for path in run_paths]
+    try:
+        readers = [csv.reader(file, delimiter=";") for file in files]
+        yield from heapq.merge(*readers, key=lambda row: row[0])
+    finally:
+        for file in files:
+            file.close()
+
+
+def unique_by_key(rows: Iterator[list[str]]) -> Iterator[list[str]]:
+    """
+    Drops rows whose key repeats the previous row's key, keeping the first occurrence.
+
+    Args:
+        rows (Iterator[list[str]]): Rows ordered by key, as yielded by `merge_sorted_runs`.
+    Yields:
+        list[str]: The first row for each key.
+    """
+
+    previous_key = None
+    for row in rows:
+        if row[0] != previous_key:
+            previous_key = row[0]
+            yield row
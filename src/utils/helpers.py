@@ -1,12 +1,27 @@
+import errno
+import fcntl
+import functools
+import gzip
+import io
 import os
+import re
 import shutil
+import socket
 import subprocess
+import threading
+import time
+import zstandard
 from ruamel.yaml import YAML
 from datetime import datetime
 
 CONFIG_PATH = "config/config.yaml"
 yaml = YAML()
 yaml.preserve_quotes = True
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+FIFO_OPEN_INTERVAL = 0.05  # seconds between attempts to open a pipe for writing
+OUTPUT_FORMAT_EXTENSIONS = {"csv": ".csv", "tsv": ".tsv"}
+TSV_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+TSV_UNESCAPES = {"t": "\t", "n": "\n", "r": "\r", "0": "\0"}
 
 
 def log_message(message):
@@ -48,12 +63,196 @@ def load_config(config_path=CONFIG_PATH):
     return config
 
 
+@functools.cache
+def get_config(config_path=CONFIG_PATH):
+    """
+    Returns the configuration, loaded once per process and shared by every module.
+
+    Changes made to the returned data are seen by the modules imported afterwards.
+
+    Args:
+        config_path (str): Path to the YAML configuration file.
+
+    Returns:
+        dict: Configuration data.
+    """
+    return load_config(config_path)
+
+
 def save_config(config, config_path=CONFIG_PATH):
     """Saves updated configuration back to config.yaml"""
     with open(config_path, "w") as file:
         yaml.dump(config, file)
 
 
+def split_sql_statements(sql_script: str, delimiter: str = ";") -> list[str]:
+    """
+    Splits a SQL script into statements, dropping comment lines and empty statements.
+
+    Args:
+        sql_script (str): The SQL script.
+        delimiter (str): The delimiter used to separate SQL statements.
+    Returns:
+        list[str]: The SQL statements.
+    """
+
+    statements = []
+    for statement in sql_script.split(delimiter):
+        statement = "\n".join(
+            line for line in statement.splitlines() if not line.strip().startswith("--")
+        ).strip()
+        if statement:
+            statements.append(statement)
+
+    return statements
+
+
+def strip_compression_suffix(path: str) -> str:
+    """Removes the compression suffix (e.g. ".gz") from a file path, if any."""
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if suffix and path.endswith(suffix):
+            return path[: -len(suffix)]
+    return path
+
+
+def is_compressed(path: str) -> bool:
+    """Checks if a file path has a compression suffix."""
+    return strip_compression_suffix(path) != path
+
+
+def get_file_format(path: str) -> str | None:
+    """
+    Returns the output format ("csv" or "tsv") of a transformed file from its extension.
+
+    Compression suffixes and the ".fifo" suffix of named pipes are ignored.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str | None: The format, or None if the extension is not recognized.
+    """
+
+    path = strip_compression_suffix(path.removesuffix(".fifo"))
+    for output_format, extension in OUTPUT_FORMAT_EXTENSIONS.items():
+        if path.endswith(extension):
+            return output_format
+    return None
+
+
+def unescape_tsv_value(value: str) -> str:
+    """
+    Reverts the `LOAD DATA` escaping of a TSV value (e.g. "\\t" back to a tab).
+
+    The `\\N` NULL marker is returned as is.
+    """
+
+    if value == r"\N" or "\\" not in value:
+        return value
+    return re.sub(r"\\(.)", lambda m: TSV_UNESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def get_partial_path(path: str, unique: bool = False) -> str:
+    """
+    Returns the hidden path a file is written to before being renamed to `path`.
+
+    The suffixes are kept, so the partial file is (de)compressed like the final one.
+    With `unique`, the path also holds the host name and process id, for files that
+    several processes can write at the same time (e.g. a work item re-claimed by another
+    worker while its first worker still runs it).
+    """
+
+    owner = f"{socket.gethostname()}-{os.getpid()}." if unique else ""
+    return os.path.join(os.path.dirname(path), f".partial.{owner}{os.path.basename(path)}")
+
+
+def open_compressed(path: str, mode: str = "rb", compression_level: int = 3, **kwargs):
+    """
+    Opens a file, transparently (de)compressing it according to its suffix.
+
+    Files ending in ".gz" are opened with gzip, files ending in ".zst" with zstandard,
+    and any other file is opened as is.
+
+    Args:
+        path (str): Path to the file.
+        mode (str): The file mode, as in `open` (e.g. "rb", "wt").
+        compression_level (int): The compression level used when writing.
+        **kwargs: Text mode arguments (e.g. `encoding`, `newline`).
+
+    Returns:
+        A file object.
+    """
+
+    if path.endswith(COMPRESSION_SUFFIXES["gzip"]):
+        if "w" in mode:
+            kwargs["compresslevel"] = compression_level
+        return gzip.open(path, mode, **kwargs)
+    if path.endswith(COMPRESSION_SUFFIXES["zstd"]):
+        if "w" in mode:
+            kwargs["cctx"] = zstandard.ZstdCompressor(level=compression_level)
+        elif "b" in mode:
+            # Buffered, so binary reads support `readline` like the other codecs
+            return io.BufferedReader(zstandard.open(path, mode))
+        return zstandard.open(path, mode, **kwargs)
+    return open(path, mode.replace("t", ""), **kwargs)
+
+
+def open_fifo_for_writing(fifo_path: str, stop_event: threading.Event, mode: str = "w", **kwargs):
+    """
+    Opens the write end of a named pipe once a reader has opened its read end.
+
+    The pipe is polled in non-blocking mode, so the writer never hangs on a reader that
+    failed before opening the pipe.
+
+    Args:
+        fifo_path (str): The path to the named pipe.
+        stop_event (threading.Event): Set when the reader failed or is done.
+        mode (str): The file mode ("w" or "wb").
+        **kwargs: Text mode arguments (e.g. `encoding`, `newline`).
+
+    Returns:
+        A file object writing to the pipe.
+
+    Raises:
+        Exception: If `stop_event` was set before a reader opened the pipe.
+    """
+
+    while True:
+        if stop_event.is_set():
+            raise Exception(f"No reader opened {fifo_path}.")
+        try:
+            fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO:  # ENXIO: no reader yet
+                raise
+            time.sleep(FIFO_OPEN_INTERVAL)
+
+    # Back to blocking writes, so the writer waits for the reader instead of failing
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) & ~os.O_NONBLOCK)
+    return os.fdopen(fd, mode, **kwargs)
+
+
+def release_fifo_reader(fifo_path: str, reader: threading.Thread):
+    """
+    Waits for the thread reading a named pipe, opening and closing its write end until it is
+    done, so a reader blocked in `open()` gets an empty pipe instead of waiting forever for a
+    writer that failed before opening it.
+
+    Args:
+        fifo_path (str): The path to the named pipe.
+        reader (threading.Thread): The thread reading the pipe.
+    """
+
+    while reader.is_alive():
+        try:
+            os.close(os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK))
+        except OSError as e:
+            if e.errno != errno.ENXIO:  # ENXIO: no reader yet
+                raise
+        reader.join(FIFO_OPEN_INTERVAL)
+
+
 def is_running_in_wsl() -> bool:
     """Checks if the script is running in a WSL environment."""
     with open("/proc/version", "r") as f:
@@ -0,0 +1,157 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from utils.helpers import get_config
+
+# Configuration
+config = get_config()
+MANIFEST_PATH = config["paths"]["manifest_path"]
+STAGES = ["downloaded", "extracted", "transformed", "loaded"]
+CHECKSUM_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def get_file_checksum(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """
+    A durable record of the pipeline units (source files) finished for a month.
+
+    The manifest is a JSON file at `{paths.manifest_path}/{month}.json` holding, for each
+    stage ("downloaded", "extracted", "transformed", "loaded"), the files that finished
+    it, with their checksums and row counts:
+
+        {"month": "2024-01",
+         "stages": {"downloaded": {"Empresas0.zip": {"size": ..., "sha256": ...}}, ...},
+         "load_finished": false}
+
+    Every change is written atomically (temporary file, fsync, rename), so a crash leaves
+    either the previous or the new manifest on disk. Changes are made on the latest contents
+    under a lock file, so several processes (e.g. queue workers) can share a manifest. The
+    steps mark a unit done only after its output is complete, and delete its input only
+    after that, so a restarted run only redoes the unfinished units.
+
+    Attributes:
+      month (str): The year and month in the format 'YYYY-MM'.
+      path (str): The path to the manifest file.
+      data (dict): The manifest contents.
+    """
+
+    def __init__(self, month: str):
+        self.month = month
+        self.path = os.path.join(MANIFEST_PATH, f"{month}.json")
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Reads the manifest from disk, or starts an empty one."""
+        if os.path.exists(self.path):
+            with open(self.path, "r") as file:
+                self.data = json.load(file)
+        else:
+            self.data = {"month": self.month, "stages": {}, "load_finished": False}
+        for stage in STAGES:
+            self.data["stages"].setdefault(stage, {})
+
+    @contextlib.contextmanager
+    def update(self):
+        """
+        Context manager for a change of the manifest, committed on exit.
+
+        The change is made on the latest contents, under the lock of this instance and an
+        exclusive lock on `{path}.lock` shared with the other processes.
+        """
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock, open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.reload()
+                yield self.data
+                self.save()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self):
+        """Writes the manifest atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.data, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self.path)
+
+    def entries(self, stage: str) -> dict[str, dict]:
+        """Returns the units that finished a stage, by name."""
+        return self.data["stages"][stage]
+
+    def get(self, stage: str, name: str) -> dict | None:
+        """Returns the record of a unit for a stage, or None if it did not finish it."""
+        return self.data["stages"][stage].get(name)
+
+    def is_done(self, stage: str, name: str) -> bool:
+        """Checks if a unit finished a stage."""
+        return name in self.data["stages"][stage]
+
+    def get_pending(self, stage: str, names: list[str]) -> list[str]:
+        """Returns the units of `names` that did not finish a stage, in order."""
+        return [name for name in names if name not in self.data["stages"][stage]]
+
+    def mark_done(self, stage: str, name: str, **details):
+        """
+        Records that a unit finished a stage and commits the manifest.
+
+        Args:
+            stage (str): The stage ("downloaded", "extracted", "transformed" or "loaded").
+            name (str): The unit name (the base name of its input file).
+            **details: Details stored with the record (e.g. `rows`, `sha256`).
+        """
+
+        with self.update() as data:
+            data["stages"][stage][name] = {
+                **details,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            }
+
+    def start_load(self, resumable: bool = True) -> bool:
+        """
+        Starts a load of the month.
+
+        An interrupted load (some files loaded, but not finished) is resumed if `resumable`,
+        otherwise the "loaded" stage is cleared and the load starts over.
+
+        Args:
+            resumable (bool): If the load mode can resume a load file by file.
+        Returns:
+            bool: True if an interrupted load is resumed.
+        """
+
+        with self.update() as data:
+            loaded = data["stages"]["loaded"]
+            if resumable and loaded and not data["load_finished"]:
+                logging.info(
+                    f"Resuming the load of {self.month}, {len(loaded)} files already loaded."
+                )
+                return True
+
+            data["stages"]["loaded"] = {}
+            data["load_finished"] = False
+            return False
+
+    def finish_load(self):
+        """Records that the load of the month finished."""
+        with self.update() as data:
+            data["load_finished"] = True
@@ -0,0 +1,262 @@
+import contextlib
+import json
+import logging
+import os
+import resource
+import threading
+import time
+from datetime import datetime
+
+from utils.helpers import get_config
+
+# Configuration
+config = get_config()
+METRICS_PATH = config["paths"]["metrics_path"]
+METRIC_PREFIX = "rfb_cnpj_etl"
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]  # seconds
+
+
+def get_peak_rss() -> int:
+    """Returns the peak resident set size of the current process, in bytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+
+
+class Metrics:
+    """
+    The counters and latency histograms of a run, per stage and per file.
+
+    The stages record what they process (e.g. `add("download", "bytes", n, file)`, or
+    `timer("load", file)` around a file load), and the run writes them as a JSON report and a
+    Prometheus textfile at the end (see `write_report`). Rates are derived in the report:
+    `mb_per_second` from `bytes` and `seconds`, `rows_per_second` from `rows_written` and
+    `seconds`. Stage totals add up the time of every file, so with concurrent workers their
+    rates are per worker.
+
+    Worker processes start from an empty instance (`reset`) and send their `snapshot` back,
+    to be merged into the coordinator's instance (`merge`).
+
+    Attributes:
+      month (str | None): The year and month processed, in the format 'YYYY-MM'.
+      started_at (float): The start time of the run, as a timestamp.
+      counters (dict[tuple, float]): The counter values, by (stage, file, name). The file is
+                                     None for counters of the stage as a whole.
+      histograms (dict[tuple, dict]): The histograms, by (stage, name): the count per
+                                      `LATENCY_BUCKETS` bucket (and a last +Inf one), the sum
+                                      and the count of the observed values.
+      peak_rss (int): The highest peak RSS reported by merged worker processes, in bytes.
+      lock (threading.Lock): Serializes updates from several threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears the metrics and restarts the run clock."""
+        self.month = None
+        self.started_at = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.peak_rss = 0
+
+    def set_month(self, month: str):
+        self.month = month
+
+    def add(self, stage: str, name: str, value: float, file: str | None = None):
+        """Adds a value to a counter of a stage, or of a file of the stage."""
+        key = (stage, file, name)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, stage: str, name: str, value: float):
+        """Records a value (usually a latency in seconds) in a histogram of a stage."""
+        bucket = next(
+            (index for index, bound in enumerate(LATENCY_BUCKETS) if value <= bound),
+            len(LATENCY_BUCKETS),
+        )
+        with self.lock:
+            histogram = self.histograms.setdefault(
+                (stage, name),
+                {"counts": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0, "count": 0},
+            )
+            histogram["counts"][bucket] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    @contextlib.contextmanager
+    def timer(self, stage: str, file: str | None = None):
+        """
+        Context manager adding its duration to the `seconds` counter of a stage (and file), and
+        to the `file_seconds` histogram of the stage.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(stage, "seconds", elapsed, file)
+            self.observe(stage, "file_seconds", elapsed)
+
+    def snapshot(self) -> dict:
+        """Returns the metrics as plain data, to be sent to another process and merged."""
+        with self.lock:
+            return {
+                "month": self.month,
+                "counters": [[*key, value] for key, value in self.counters.items()],
+                "histograms": [
+                    [*key, histogram["counts"], histogram["sum"], histogram["count"]]
+                    for key, histogram in self.histograms.items()
+                ],
+                "peak_rss": max(self.peak_rss, get_peak_rss()),
+            }
+
+    def merge(self, snapshot: dict):
+        """Adds the metrics of a snapshot taken in another process (see `snapshot`)."""
+        for stage, file, name, value in snapshot["counters"]:
+            self.add(stage, name, value, file)
+
+        with self.lock:
+            self.month = self.month or snapshot["month"]
+            self.peak_rss = max(self.peak_rss, snapshot["peak_rss"])
+            for stage, name, counts, total, count in snapshot["histograms"]:
+                histogram = self.histograms.setdefault(
+                    (stage, name),
+                    {"counts": [0] * (len(LATENCY_BUCKETS) + 1), "sum": 0, "count": 0},
+                )
+                histogram["counts"] = [a + b for a, b in zip(histogram["counts"], counts)]
+                histogram["sum"] += total
+                histogram["count"] += count
+
+    def get_report(self) -> dict:
+        """
+        Builds the run report: the totals, per-file counters and histograms of each stage,
+        with the derived rates, the run duration and the peak memory use.
+
+        Returns:
+            dict: The report, as written to the JSON file.
+        """
+
+        def add_rates(values: dict) -> dict:
+            seconds = values.get("seconds")
+            if seconds:
+                if "bytes" in values:
+                    values["mb_per_second"] = values["bytes"] / (1024 * 1024) / seconds
+                if "rows_written" in values:
+                    values["rows_per_second"] = values["rows_written"] / seconds
+            return values
+
+        with self.lock:
+            stages = {}
+            for (stage, file, name), value in sorted(
+                self.counters.items(), key=lambda item: (item[0][0], item[0][1] or "", item[0][2])
+            ):
+                entry = stages.setdefault(stage, {"totals": {}, "files": {}, "histograms": {}})
+                entry["totals"][name] = entry["totals"].get(name, 0) + value
+                if file is not None:
+                    entry["files"].setdefault(file, {})[name] = value
+
+            for (stage, name), histogram in sorted(self.histograms.items()):
+                entry = stages.setdefault(stage, {"totals": {}, "files": {}, "histograms": {}})
+                entry["histograms"][name] = {
+                    "buckets": LATENCY_BUCKETS + ["+Inf"],
+                    **histogram,
+                }
+
+            for entry in stages.values():
+                add_rates(entry["totals"])
+                for values in entry["files"].values():
+                    add_rates(values)
+
+            finished_at = time.time()
+            children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+            return {
+                "month": self.month,
+                "started_at": datetime.fromtimestamp(self.started_at).isoformat(timespec="seconds"),
+                "finished_at": datetime.fromtimestamp(finished_at).isoformat(timespec="seconds"),
+                "duration_seconds": finished_at - self.started_at,
+                "peak_rss_bytes": max(self.peak_rss, get_peak_rss()),
+                "peak_children_rss_bytes": children_rss,
+                "stages": stages,
+            }
+
+    def get_prometheus_text(self, report: dict, job: str) -> str:
+        """
+        Formats the totals and histograms of a report in the Prometheus text format.
+
+        Every metric is labelled with the job and month; stage metrics also with their stage.
+
+        Args:
+            report (dict): The run report (see `get_report`).
+            job (str): The name of the process that ran (e.g. "pipeline", or a worker id).
+        Returns:
+            str: The Prometheus textfile contents.
+        """
+
+        base_labels = f'job="{job}",month="{report["month"] or ""}"'
+        families = {}
+
+        def add_sample(family: str, kind: str, value: float, labels: str = "", suffix: str = ""):
+            samples = families.setdefault(f"{METRIC_PREFIX}_{family}", (kind, []))[1]
+            samples.append(f"{METRIC_PREFIX}_{family}{suffix}{{{base_labels}{labels}}} {value}")
+
+        add_sample("run_duration_seconds", "gauge", report["duration_seconds"])
+        add_sample("run_finished_timestamp_seconds", "gauge", time.time())
+        add_sample("peak_rss_bytes", "gauge", report["peak_rss_bytes"])
+        add_sample("peak_children_rss_bytes", "gauge", report["peak_children_rss_bytes"])
+
+        for stage, entry in report["stages"].items():
+            for name, value in entry["totals"].items():
+                add_sample(name, "gauge", value, f',stage="{stage}"')
+            for name, histogram in entry["histograms"].items():
+                cumulative = 0
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    cumulative += count
+                    add_sample(
+                        name, "histogram", cumulative, f',stage="{stage}",le="{bound}"', "_bucket"
+                    )
+                add_sample(name, "histogram", histogram["sum"], f',stage="{stage}"', "_sum")
+                add_sample(name, "histogram", histogram["count"], f',stage="{stage}"', "_count")
+
+        # The samples of a metric are grouped under its TYPE line
+        lines = []
+        for family, (kind, samples) in families.items():
+            lines.append(f"# TYPE {family} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, job: str = "pipeline") -> str:
+        """
+        Writes the run report to `{paths.metrics_path}/{month}_{job}_{started_at}.json`, and the
+        Prometheus textfile to `{paths.metrics_path}/{job}.prom`.
+
+        The textfile is replaced atomically on every run, so the node_exporter textfile
+        collector pointed at `paths.metrics_path` always exposes the last run of each job.
+
+        Args:
+            job (str): The name of the process that ran (e.g. "pipeline", or a worker id).
+        Returns:
+            str: The path to the JSON report.
+        """
+
+        os.makedirs(METRICS_PATH, exist_ok=True)
+        report = self.get_report()
+
+        started_at = datetime.fromtimestamp(self.started_at).strftime("%Y-%m-%dT%H-%M-%S")
+        report_path = os.path.join(
+            METRICS_PATH, f"{report['month'] or 'run'}_{job}_{started_at}.json"
+        )
+        with open(report_path, "w") as file:
+            json.dump(report, file, indent=2)
+
+        textfile_path = os.path.join(METRICS_PATH, f"{job}.prom")
+        with open(f"{textfile_path}.tmp", "w") as file:
+            file.write(self.get_prometheus_text(report, job))
+        os.replace(f"{textfile_path}.tmp", textfile_path)
+
+        logging.info(f"Run metrics written to {report_path}.")
+        return report_path
+
+
+# Metrics of the current process
+METRICS = Metrics()
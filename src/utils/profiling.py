@@ -0,0 +1,200 @@
+import contextlib
+import cProfile
+import linecache
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+
+from utils.helpers import get_config
+
+# Configuration
+config = get_config()
+PROFILE_PATH = config["paths"]["profile_path"]
+PROFILE_SAMPLE_CHUNKS = config["performance"]["profile_sample_chunks"]
+TRACEMALLOC_FRAMES = 10  # frames kept per allocation traceback
+TRACEMALLOC_TOP = 25  # allocation sites listed per file
+
+# The profile of the file processed by each thread
+local = threading.local()
+# Memory is traced while any unit is profiled, by any thread
+tracing_lock = threading.Lock()
+tracing_units = 0
+# cProfile runs in a single thread of the process at a time (see `profile_unit`)
+profiler_thread = None
+
+
+def is_enabled() -> bool:
+    """Checks if profiling is on (`settings.profile`, or the `--profile` option)."""
+    return bool(config["settings"]["profile"])
+
+
+class FileProfile:
+    """
+    The profile of a unit of work (usually a file) processed by a thread.
+
+    Attributes:
+      stage (str): The stage processing the unit (e.g. "transform").
+      name (str): The unit name (e.g. the base name of the input file).
+      profiler (cProfile.Profile | None): The profiler of the unit, or None if another
+                                          thread held the process profiler when it started.
+      sections (dict[str, float]): The time spent in each sampled section, in seconds, by
+                                   ";"-separated section stack (e.g. "clean_dataframe;strip").
+      stack (list[str]): The sections currently open.
+      sampling (bool): If the current chunk is sampled (see `sample_chunk`).
+    """
+
+    def __init__(self, stage: str, name: str):
+        self.stage = stage
+        self.name = name
+        self.profiler = None
+        self.sections = {}
+        self.stack = []
+        self.sampling = False
+
+    def get_output_path(self, extension: str) -> str:
+        name = re.sub(r"[^a-zA-Z0-9_.-]", "_", self.name)
+        return os.path.join(PROFILE_PATH, f"{self.stage}_{name}{extension}")
+
+    def write(self, peak_memory: int, snapshot: tracemalloc.Snapshot):
+        """
+        Writes the profile files of the unit to `paths.profile_path`:
+        - `{stage}_{name}.pstats`: the cProfile statistics (for pstats, snakeviz, flameprof...),
+          if the unit held the process profiler;
+        - `{stage}_{name}.folded`: the sampled section timings as collapsed stacks, in
+          microseconds (for flamegraph.pl, speedscope...), if any section was timed;
+        - `{stage}_{name}.memory.txt`: the peak traced memory of the process (see
+          `profile_unit`) and the top sites of the allocations still alive at the end.
+        """
+
+        os.makedirs(PROFILE_PATH, exist_ok=True)
+        if self.profiler is not None:
+            self.profiler.dump_stats(self.get_output_path(".pstats"))
+
+        if self.sections:
+            # Collapsed stacks hold the time spent in a section itself, out of its subsections
+            self_times = dict(self.sections)
+            for stack, seconds in self.sections.items():
+                parent = stack.rpartition(";")[0]
+                if parent in self_times:
+                    self_times[parent] -= seconds
+            with open(self.get_output_path(".folded"), "w") as file:
+                for stack, seconds in sorted(self_times.items()):
+                    file.write(f"{self.stage};{stack} {max(round(seconds * 1_000_000), 0)}\n")
+
+        with open(self.get_output_path(".memory.txt"), "w") as file:
+            file.write(
+                f"Peak traced memory (process-wide): {peak_memory / (1024 * 1024):.1f} MB\n\n"
+            )
+            for stat in snapshot.statistics("traceback")[:TRACEMALLOC_TOP]:
+                file.write(f"{stat.size / 1024:.1f} KB in {stat.count} blocks\n")
+                file.writelines(
+                    f"    {line}\n" for line in stat.traceback.format(most_recent_first=True)
+                )
+
+
+@contextlib.contextmanager
+def profile_unit(stage: str, name: str):
+    """
+    Context manager profiling a unit of work of the current thread, if profiling is on.
+
+    The unit runs under cProfile and tracemalloc, and its profile files are written when it
+    ends (see `FileProfile.write`). Nested units are not profiled separately.
+
+    Only one thread of the process runs cProfile at a time, since Python 3.12 refuses a
+    second active profiler: units started while another thread holds it only get their
+    sections and memory. cProfile is also skipped if the process is already profiled. On
+    Python 3.12+, the statistics of the profiled unit include the calls of the other threads.
+
+    Memory is only traced while units are profiled, which keeps the snapshots small. It is
+    traced per process: the snapshot of a unit includes the allocations of the units run by
+    other threads at the same time, and its peak is the process peak since tracing started,
+    that is, since the first of the units running together started. The peak is never reset
+    while other units are traced, so it is an upper bound of the unit's own peak.
+
+    Args:
+        stage (str): The stage processing the unit (e.g. "transform").
+        name (str): The unit name (e.g. the base name of the input file).
+    """
+
+    if not is_enabled() or getattr(local, "profile", None) is not None:
+        yield
+        return
+
+    global tracing_units, profiler_thread
+    profile = FileProfile(stage, name)
+    with tracing_lock:
+        if tracing_units == 0:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracing_units += 1
+        if profiler_thread is None:
+            profile.profiler = cProfile.Profile()
+            try:
+                profile.profiler.enable()
+                profiler_thread = threading.get_ident()
+            except ValueError:
+                logging.warning(
+                    f"Another profiler is active, {stage} {name} is profiled without cProfile."
+                )
+                profile.profiler = None
+
+    local.profile = profile
+    try:
+        yield
+    finally:
+        local.profile = None
+        with tracing_lock:
+            if profile.profiler is not None:
+                profile.profiler.disable()
+                profiler_thread = None
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, linecache.__file__),
+                ]
+            )
+            tracing_units -= 1
+            if tracing_units == 0:
+                tracemalloc.stop()
+        profile.write(peak_memory, snapshot)
+        logging.info(f"Profile of {stage} {name} written to {PROFILE_PATH}.")
+
+
+def sample_chunk(index: int):
+    """
+    Marks whether the chunk `index` of the current unit is sampled: one chunk every
+    `performance.profile_sample_chunks`, starting with the first one.
+    """
+    profile = getattr(local, "profile", None)
+    if profile is not None:
+        profile.sampling = index % PROFILE_SAMPLE_CHUNKS == 0
+
+
+@contextlib.contextmanager
+def section(name: str):
+    """
+    Context manager timing a section of the current unit on sampled chunks.
+
+    Sections nest, and their times are written as collapsed stacks (see `FileProfile.write`).
+    Outside a profiled unit or a sampled chunk, it does nothing.
+
+    Args:
+        name (str): The section name (e.g. a step or column name).
+    """
+
+    profile = getattr(local, "profile", None)
+    if profile is None or not profile.sampling:
+        yield
+        return
+
+    profile.stack.append(name)
+    stack = ";".join(profile.stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.sections[stack] = profile.sections.get(stack, 0) + time.perf_counter() - start
+        profile.stack.pop()
@@ -0,0 +1,39 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# The modules import each other from src/ and read config/config.yaml relative to the root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+os.chdir(ROOT)
+
+from constants.table_fields import TABLE_FIELDS  # noqa: E402
+from utils.helpers import get_config  # noqa: E402
+
+# The tests use embedded databases, never the configured server
+get_config()["database"]["type"] = "duckdb"
+
+
+@pytest.fixture
+def write_transformed(tmp_path):
+    """
+    Returns a function writing a transformed CSV file of a table into a month directory,
+    with `\\N` in the columns a row does not set, and returning its path.
+    """
+
+    month_dir = tmp_path / "cleaned" / "2000-01"
+    month_dir.mkdir(parents=True, exist_ok=True)
+
+    def write(name: str, table_name: str, rows: list[dict]) -> str:
+        columns = list(TABLE_FIELDS[table_name])
+        path = month_dir / name
+        with open(path, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file, delimiter=";", quoting=csv.QUOTE_NONNUMERIC)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow([row.get(column, r"\N") for column in columns])
+        return str(path)
+
+    return write
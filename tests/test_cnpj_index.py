@@ -0,0 +1,90 @@
+import pytest
+
+import lookup.cnpj_index as cnpj_index
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch, write_transformed):
+    monkeypatch.setattr(cnpj_index, "INDEX_PATH", str(tmp_path / "index"))
+    monkeypatch.setattr(cnpj_index, "READ_CHUNK_SIZE", 2)
+    establishments = [
+        ("00337939", "0001", "46", "Zeros"),
+        ("00337939", "0002", "27", "Tab\there"),
+        ("00337939", "0001", "46", "Repetida"),
+        ("12345678", "0001", "95", "Outra"),
+        ("1234567X", "0001", "95", "Invalida"),
+        ("99999999", "9999", "99", r"\N"),
+    ]
+    transformed_data = [
+        write_transformed(
+            "estabelecimento.csv",
+            "estabelecimento",
+            [
+                {"cnpj_basico": basico, "cnpj_ordem": ordem, "cnpj_dv": dv, "nome_fantasia": name}
+                for basico, ordem, dv, name in establishments
+            ],
+        ),
+        write_transformed(
+            "empresa.csv", "empresa", [{"cnpj_basico": "00337939", "razao_social": "Empresa"}]
+        ),
+        # An empty table gets an empty records file, which cannot be memory-mapped
+        write_transformed("simples.csv", "simples", []),
+    ]
+    return cnpj_index.build_cnpj_index(transformed_data)
+
+
+def names(records) -> list:
+    return [None if record is None else record["nome_fantasia"] for record in records]
+
+
+def test_get(index_dir):
+    index = cnpj_index.CnpjIndex("estabelecimento", index_dir)
+    assert len(index) == 4  # without the repeated and the invalid keys
+
+    assert index.get("00.337.939/0001-46")["nome_fantasia"] == "Zeros"
+    assert index.get("00337939000146")["cnpj_ordem"] == "0001"
+    assert index.get("00337939000227")["nome_fantasia"] == "Tab\there"
+    assert index.get("99999999999999")["nome_fantasia"] is None
+    assert index.get("00337939000300") is None
+    assert index.get("337939000146") is None  # missing leading zeros
+    assert index.get("") is None
+
+    empresa = cnpj_index.CnpjIndex("empresa", index_dir)
+    assert empresa.get("00.337.939")["razao_social"] == "Empresa"
+    assert empresa.get("00337939000146") is None
+    index.close()
+    empresa.close()
+
+
+def test_get_many(index_dir):
+    index = cnpj_index.CnpjIndex("estabelecimento", index_dir)
+
+    records = index.get_many(
+        ["12.345.678/0001-95", "00000000000000", "00337939000146", "1", "00337939000146", ""]
+    )
+    assert names(records) == ["Outra", None, "Zeros", None, "Zeros", None]
+    assert index.get_many([]) == []
+    index.close()
+
+
+def test_get_by_prefix(index_dir):
+    index = cnpj_index.CnpjIndex("estabelecimento", index_dir)
+
+    assert names(index.get_by_prefix("00.337.939")) == ["Zeros", "Tab\there"]
+    assert names(index.get_by_prefix("003379390002")) == ["Tab\there"]
+    assert names(index.get_by_prefix("9")) == [None]
+    assert names(index.get_by_prefix("0")) == ["Zeros", "Tab\there"]
+    assert index.get_by_prefix("11") == []
+    assert index.get_by_prefix("") == []
+    assert index.get_by_prefix("003379390001460") == []
+    index.close()
+
+
+def test_empty_table(index_dir):
+    index = cnpj_index.CnpjIndex("simples", index_dir)
+
+    assert len(index) == 0
+    assert index.get("00337939") is None
+    assert index.get_many(["00337939", "x"]) == [None, None]
+    assert index.get_by_prefix("0") == []
+    index.close()
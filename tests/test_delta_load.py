@@ -0,0 +1,96 @@
+import csv
+import importlib
+
+import pytest
+
+import utils.database.conn as database_conn
+
+
+@pytest.fixture
+def delta_load(monkeypatch):
+    # The module imports the MySQL connection, which only exists with database.type: mysql
+    monkeypatch.setattr(database_conn, "MYSQL_CONN", None, raising=False)
+    module = importlib.import_module("load.delta_load")
+    monkeypatch.setattr(module, "SORT_CHUNK_SIZE", 2)
+    return module
+
+
+def read_set(path) -> list[list[str]]:
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return list(csv.reader(file, delimiter=";"))
+
+
+def test_diff_sorted_rows(delta_load):
+    previous = [["a", "1", "A"], ["b", "1", "B"], ["d", "1", "D"]]
+    current = [["b", "2", "B2"], ["c", "1", "C"], ["d", "1", "D"], ["e", "1", "E"]]
+
+    assert list(delta_load.diff_sorted_rows(iter(previous), iter(current))) == [
+        ("delete", ["a", "1", "A"]),
+        ("update", ["b", "2", "B2"]),
+        ("insert", ["c", "1", "C"]),
+        ("insert", ["e", "1", "E"]),
+    ]
+    assert list(delta_load.diff_sorted_rows(iter([]), iter([]))) == []
+    assert list(delta_load.diff_sorted_rows(iter(previous[:1]), iter([]))) == [
+        ("delete", ["a", "1", "A"])
+    ]
+
+
+def test_build_table_delta(delta_load, tmp_path, write_transformed):
+    previous = [
+        write_transformed(
+            "simples_previous_0.csv",
+            "simples",
+            [
+                {"cnpj_basico": "44444444", "opcao_pelo_simples": "S"},
+                {"cnpj_basico": "11111111", "opcao_pelo_simples": "S"},
+                {"cnpj_basico": "22222222", "opcao_pelo_simples": "S"},
+            ],
+        ),
+        write_transformed(
+            "simples_previous_1.csv",
+            "simples",
+            [{"cnpj_basico": "33333333", "opcao_pelo_simples": "S"}],
+        ),
+    ]
+    current = [
+        write_transformed(
+            "simples_current_0.csv",
+            "simples",
+            [
+                {"cnpj_basico": "55555555", "opcao_pelo_simples": "N"},
+                {"cnpj_basico": "33333333", "opcao_pelo_simples": "S"},
+                {"cnpj_basico": "22222222", "opcao_pelo_simples": "N", "data_exclusao_pelo_simples": "20240131"},
+                # Repeated keys keep their first row, as in the full load
+                {"cnpj_basico": "33333333", "opcao_pelo_simples": "N"},
+            ],
+        ),
+    ]
+    delta_dir = tmp_path / "delta"
+    delta_dir.mkdir()
+
+    counts = delta_load.build_table_delta(previous, current, "simples", str(delta_dir))
+
+    assert counts == {"insert": 1, "update": 1, "delete": 2}
+    assert read_set(delta_dir / "simples_insert.csv") == [
+        ["55555555", "N", r"\N", r"\N", r"\N", r"\N", r"\N"]
+    ]
+    assert read_set(delta_dir / "simples_update.csv") == [
+        ["22222222", "N", r"\N", "20240131", r"\N", r"\N", r"\N"]
+    ]
+    assert read_set(delta_dir / "simples_delete.csv") == [["11111111"], ["44444444"]]
+    assert not (delta_dir / "runs" / "simples").exists()
+
+    batches = list(delta_load.read_batches(str(delta_dir / "simples_update.csv"), 10))
+    assert batches == [[("22222222", "N", None, "20240131", None, None, None)]]
+
+
+def test_upsert_converts_dates(delta_load):
+    sql = delta_load.get_upsert_sql("simples")
+
+    assert sql.count("%s") == 7
+    assert "STR_TO_DATE(NULLIF(%s, ''), '%%Y%%m%%d')" in sql
+    assert "VALUES (%s, %s, STR_TO_DATE" in sql
+    assert sql.endswith("data_exclusao_pelo_mei = new.data_exclusao_pelo_mei")
+    # mysql-connector interpolates with the % operator, which leaves the format literal
+    assert "'%Y%m%d'" in sql % tuple(["x"] * 7)
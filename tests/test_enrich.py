@@ -0,0 +1,72 @@
+import pandas as pd
+import pytest
+
+import export.enrich as enrich
+
+
+@pytest.fixture
+def month(tmp_path, monkeypatch, write_transformed):
+    monkeypatch.setattr(enrich, "SORTED_PATH", str(tmp_path / "sorted"))
+    monkeypatch.setattr(enrich, "EXPORT_PATH", str(tmp_path / "export"))
+    monkeypatch.setattr(enrich, "EXPORT_FORMAT", "csv")
+    monkeypatch.setattr(enrich, "READ_CHUNK_SIZE", 2)
+    monkeypatch.setattr(enrich, "SORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(
+        enrich, "COLUMNS", ["empresa.razao_social", "estabelecimento.nome_fantasia"]
+    )
+    return [
+        write_transformed(
+            "estabelecimento.csv",
+            "estabelecimento",
+            [
+                {"cnpj_basico": "11111111", "cnpj_ordem": ordem, "cnpj_dv": "00", "nome_fantasia": name}
+                for ordem, name in [("0001", "A"), ("0002", "B"), ("0003", "C")]
+            ],
+        ),
+        write_transformed(
+            "empresa.csv", "empresa", [{"cnpj_basico": "11111111", "razao_social": "Um"}]
+        ),
+    ]
+
+
+def enrich_cnpjs(tmp_path, transformed_data: list[str], cnpjs: list[str]) -> pd.DataFrame:
+    input_file = tmp_path / "input.csv"
+    input_file.write_text("cnpj\n" + "\n".join(cnpjs) + "\n", encoding="utf-8")
+    result = enrich.enrich_file(str(input_file), transformed_data)
+    return pd.read_csv(result["file"], sep=";", dtype=str, keep_default_na=False)
+
+
+def test_keys_straddling_chunks(tmp_path, month):
+    # The three establishments of one company are split across input chunks of 2 rows
+    enriched = enrich_cnpjs(
+        tmp_path, month, ["11.111.111/0003-00", "11111111000100", "11111111000200"]
+    )
+
+    assert enriched["razao_social"].tolist() == ["Um", "Um", "Um"]
+    assert enriched["nome_fantasia"].tolist() == ["A", "B", "C"]
+
+
+def test_repeated_cnpj_straddling_chunks(tmp_path, month):
+    enriched = enrich_cnpjs(
+        tmp_path, month, ["11111111000100", "11111111000200", "11111111000200"]
+    )
+
+    assert enriched["nome_fantasia"].tolist() == ["A", "B", "B"]
+    assert enriched["razao_social"].tolist() == ["Um", "Um", "Um"]
+
+
+def test_input_past_table_end(tmp_path, month):
+    enriched = enrich_cnpjs(
+        tmp_path, month, ["11111111000100", "22222222000200", "33333333000100"]
+    )
+
+    assert enriched["razao_social"].tolist() == ["Um", "", ""]
+    assert enriched["nome_fantasia"].tolist() == ["A", "", ""]
+
+
+def test_invalid_cnpjs(tmp_path, month):
+    enriched = enrich_cnpjs(tmp_path, month, ["abc", "111", "11111111000300"])
+
+    assert enriched["cnpj"].tolist() == ["abc", "111", "11111111000300"]
+    assert enriched["razao_social"].tolist() == ["", "", "Um"]
+    assert enriched["nome_fantasia"].tolist() == ["", "", "C"]
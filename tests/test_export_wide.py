@@ -0,0 +1,61 @@
+import pandas as pd
+
+import export.export_wide as export_wide
+
+
+def test_export_wide(tmp_path, monkeypatch, write_transformed):
+    monkeypatch.setattr(export_wide, "EXPORT_PATH", str(tmp_path / "export"))
+    monkeypatch.setattr(export_wide, "EXPORT_FORMAT", "csv")
+    monkeypatch.setattr(export_wide, "COMPRESSION", "none")
+    # More partitions than companies, so some partitions are empty
+    monkeypatch.setattr(export_wide, "PARTITIONS", 8)
+    monkeypatch.setattr(export_wide, "READ_CHUNK_SIZE", 1)
+    # No simples files, and only two of the lookup tables
+    transformed_data = [
+        write_transformed(
+            "estabelecimento_0.csv",
+            "estabelecimento",
+            [
+                {"cnpj_basico": "11111111", "cnpj_ordem": "0001", "cnpj_dv": "91", "cod_cnae_fiscal": "0111301", "data_inicio_atividade": "20200115"},
+                {"cnpj_basico": "11111111", "cnpj_ordem": "0002", "cnpj_dv": "72", "cod_cnae_fiscal": "9999999", "cod_municipio": "0001"},
+            ],
+        ),
+        write_transformed(
+            "estabelecimento_1.csv",
+            "estabelecimento",
+            [{"cnpj_basico": "22222222", "cnpj_ordem": "0001", "cnpj_dv": "30"}],
+        ),
+        write_transformed(
+            "empresa_0.csv",
+            "empresa",
+            [
+                {"cnpj_basico": "11111111", "razao_social": "Um", "capital_social": "10.5"},
+                {"cnpj_basico": "11111111", "razao_social": "Repetida"},
+            ],
+        ),
+        write_transformed(
+            "cnae.csv", "cnae", [{"codigo": "0111301", "descricao": "Cultivo de arroz"}]
+        ),
+        write_transformed("municipio.csv", "municipio", [{"codigo": "0001", "descricao": r"\N"}]),
+    ]
+
+    export_file = export_wide.export_wide(transformed_data)
+
+    assert export_file == str(tmp_path / "export" / "estabelecimento_wide_2000-01.csv")
+    assert sorted(p.name for p in (tmp_path / "export").iterdir()) == [
+        "estabelecimento_wide_2000-01.csv"
+    ]
+    df = pd.read_csv(export_file, sep=";", dtype=str, keep_default_na=False)
+    assert list(df.columns) == list(export_wide.get_wide_fields())
+    rows = df.set_index("cnpj_completo").to_dict("index")
+    assert sorted(rows) == ["11111111000191", "11111111000272", "22222222000130"]
+
+    first = rows["11111111000191"]
+    assert (first["razao_social"], first["capital_social"]) == ("Um", "10.5")
+    assert (first["cnae_fiscal"], first["data_inicio_atividade"]) == ("Cultivo de arroz", "2020-01-15")
+    assert first["opcao_pelo_simples"] == ""
+
+    second = rows["11111111000272"]
+    assert (second["cnae_fiscal"], second["municipio"], second["pais"]) == ("", "", "")
+
+    assert rows["22222222000130"]["razao_social"] == ""
@@ -0,0 +1,36 @@
+import os
+import zipfile
+
+import synthetic.generate_data as generate_data
+
+
+def read_month(monkeypatch, path, seed: int) -> dict[str, bytes]:
+    monkeypatch.setattr(generate_data, "SYNTHETIC_PATH", str(path))
+    contents = {}
+    for zip_path in generate_data.generate_month("2000-01", companies=40, seed=seed):
+        with zipfile.ZipFile(zip_path) as zip_file:
+            (member,) = zip_file.namelist()
+            contents[f"{os.path.basename(zip_path)}/{member}"] = zip_file.read(member)
+    return contents
+
+
+def test_generate_month_is_deterministic(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_data, "CPU_WORKERS", 2)
+    monkeypatch.setattr(generate_data, "FILE_PARTS", 2)
+
+    first = read_month(monkeypatch, tmp_path / "first", seed=7)
+    again = read_month(monkeypatch, tmp_path / "again", seed=7)
+    other = read_month(monkeypatch, tmp_path / "other", seed=8)
+
+    assert len(first) == len(generate_data.get_file_specs("2000-01", 40))
+    assert first == again
+    assert first.keys() == other.keys()
+    assert [name for name in first if first[name] != other[name]] != []
+    # Every company is in one of the split files, with the CNPJ root given by the seed
+    empresas = b"".join(content for name, content in first.items() if "EMPRE" in name)
+    roots = {line.split(b";")[0].strip(b'"').decode() for line in empresas.splitlines()}
+    assert roots == {generate_data.get_cnpj_basico(index, 7) for index in range(40)}
+
+    # Another seed in the same directory replaces the files
+    regenerated = read_month(monkeypatch, tmp_path / "first", seed=8)
+    assert regenerated == other
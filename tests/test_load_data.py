@@ -0,0 +1,10 @@
+import pytest
+
+import load.load_data as load_data
+
+
+def test_rollback_swap_requires_mysql(monkeypatch):
+    monkeypatch.setattr(load_data, "DB_TYPE", "duckdb")
+
+    with pytest.raises(ValueError, match="mysql"):
+        load_data.rollback_shadow_swap()
@@ -0,0 +1,76 @@
+import datetime
+import sqlite3
+
+import duckdb
+import pytest
+
+import load.load_embedded as load_embedded
+
+CNAE_CSV = (
+    '"codigo";"descricao"\n'
+    '"0111301";"Cultivo de arroz"\n'
+    '"0111302";"Cultivo de milho; ""safra"""\n'
+    '"0111301";"Duplicado"\n'
+    '"0111307";"\\N"\n'
+)
+# Escaped tab, newline and backslashes ("C:\dir\new" must not get a newline), and a NULL
+CNAE_TSV = (
+    "codigo\tdescricao\n"
+    "0111303\tTab\\there\n"
+    "0111304\tLinha\\nnova\n"
+    "0111305\tC:\\\\dir\\\\new\n"
+    "0111306\t\\N\n"
+)
+SIMPLES_TSV = (
+    "cnpj_basico\topcao_pelo_simples\tdata_opcao_pelo_simples\tdata_exclusao_pelo_simples\t"
+    "opcao_pelo_mei\tdata_opcao_pelo_mei\tdata_exclusao_pelo_mei\n"
+    "12345678\tS\t20200115\t\\N\tN\t20211301\t2021\n"
+)
+
+
+def connect(db_type: str, path: str):
+    if db_type == "duckdb":
+        return duckdb.connect(path)
+    return sqlite3.connect(path)
+
+
+def as_date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+@pytest.mark.parametrize("db_type", ["duckdb", "sqlite"])
+def test_load_embedded(db_type, tmp_path, monkeypatch):
+    monkeypatch.setattr(load_embedded, "DB_TYPE", db_type)
+    files = {"cnae_0.csv": CNAE_CSV, "cnae_1.tsv": CNAE_TSV, "simples_0.tsv": SIMPLES_TSV}
+    for name, content in files.items():
+        (tmp_path / name).write_text(content, encoding="utf-8")
+    load_csv = (
+        load_embedded.load_csv_duckdb if db_type == "duckdb" else load_embedded.load_csv_sqlite
+    )
+
+    conn = connect(db_type, str(tmp_path / f"test.{db_type}"))
+    load_embedded.create_tables(conn)
+    cnae_files = [str(tmp_path / "cnae_0.csv"), str(tmp_path / "cnae_1.tsv")]
+    assert load_csv(conn, cnae_files, "cnae") == 8
+    assert load_csv(conn, [str(tmp_path / "simples_0.tsv")], "simples") == 1
+    load_embedded.build_keys_and_indexes(conn)
+
+    cnae = dict(conn.execute("SELECT codigo, descricao FROM cnae;").fetchall())
+    assert cnae == {
+        "0111301": "Cultivo de arroz",
+        "0111302": 'Cultivo de milho; "safra"',
+        "0111303": "Tab\there",
+        "0111304": "Linha\nnova",
+        "0111305": "C:\\dir\\new",
+        "0111306": None,
+        "0111307": None,
+    }
+
+    simples = conn.execute(
+        "SELECT data_opcao_pelo_simples, data_exclusao_pelo_simples, "
+        "data_opcao_pelo_mei, data_exclusao_pelo_mei FROM simples;"
+    ).fetchall()
+    assert [[as_date(value) for value in row] for row in simples] == [
+        [datetime.date(2020, 1, 15), None, None, None]
+    ]
+    conn.close()
@@ -0,0 +1,60 @@
+import importlib
+import os
+
+import pytest
+
+import utils.database.conn as database_conn
+
+# A scratch PostgreSQL database, e.g. "dbname=rfb_test user=postgres host=localhost".
+# Its managed tables are dropped and recreated.
+PG_DSN = os.environ.get("RFB_TEST_PG_DSN")
+
+pytestmark = pytest.mark.skipif(not PG_DSN, reason="RFB_TEST_PG_DSN is not set")
+
+
+@pytest.fixture
+def load_postgres(monkeypatch):
+    # The module reads its connection at import, and the tests are configured for DuckDB
+    monkeypatch.setattr(
+        database_conn, "PG_CONN", database_conn.Psycopg2Conn(PG_DSN), raising=False
+    )
+    module = importlib.import_module("load.load_postgres")
+    monkeypatch.setattr(module, "PG_CONN", database_conn.PG_CONN)
+    conn = database_conn.PG_CONN.get_connection()
+    module.reset_tables(conn)
+    yield module
+    database_conn.PG_CONN.close_connection()
+
+
+def test_copy_and_finalize(load_postgres, tmp_path, write_transformed):
+    simples = write_transformed(
+        "simples.csv",
+        "simples",
+        [
+            {"cnpj_basico": "11111111", "opcao_pelo_simples": "S", "data_opcao_pelo_simples": "20200115"},
+            {"cnpj_basico": "22222222", "opcao_pelo_simples": "N"},
+            {"cnpj_basico": "11111111", "opcao_pelo_simples": "N"},
+        ],
+    )
+    cnae = tmp_path / "cnae.tsv"
+    cnae.write_text("codigo\tdescricao\n0111301\tTab\\there\n0111302\t\\N\n", encoding="utf-8")
+
+    assert load_postgres.copy_csv_to_db(simples, "simples") == 3
+    assert load_postgres.copy_csv_to_db(str(cnae), "cnae") == 2
+    load_postgres.finalize_table("simples")
+
+    with load_postgres.PG_CONN.get_connection().cursor() as cursor:
+        cursor.execute(
+            "SELECT cnpj_basico, opcao_pelo_simples, data_opcao_pelo_simples::text "
+            "FROM simples ORDER BY cnpj_basico;"
+        )
+        assert cursor.fetchall() == [("11111111", "S", "2020-01-15"), ("22222222", "N", None)]
+        cursor.execute("SELECT codigo, descricao FROM cnae WHERE codigo LIKE '011130_' ORDER BY codigo;")
+        assert cursor.fetchall() == [("0111301", "Tab\there"), ("0111302", None)]
+
+
+def test_only_full_loads_are_supported(load_postgres, monkeypatch):
+    monkeypatch.setattr(load_postgres, "LOAD_MODE", "shadow")
+
+    with pytest.raises(ValueError, match="load_mode"):
+        load_postgres.load_data_postgres(["unused.csv"], "2000-01")
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+import load.load_stream as load_stream
+
+
+class FifoReadingConnection:
+    """Stands in for a MySQL connection: `LOAD DATA` opens the pipe and reads it to the end."""
+
+    def __init__(self, fifo_path: str, loads: list):
+        self.fifo_path = fifo_path
+        self.loads = loads
+        self.autocommit = True
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql: str):
+        with open(self.fifo_path, "r") as fifo:
+            self.loads.append(fifo.read())
+        self.rowcount = 0
+
+    def commit(self):
+        self.loads.append("commit")
+
+    def rollback(self):
+        self.loads.append("rollback")
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def stream(tmp_path, monkeypatch):
+    csv_file = tmp_path / "2000-01" / "Estabelecimentos0.csv"
+    csv_file.parent.mkdir()
+    csv_file.write_text("", encoding="utf-8")
+    monkeypatch.setattr(
+        load_stream,
+        "get_output_file_path",
+        lambda path, table: str(tmp_path / f"{table}.csv"),
+    )
+    loads = []
+    conn = FifoReadingConnection(str(tmp_path / "estabelecimento.csv.fifo"), loads)
+    monkeypatch.setattr(
+        load_stream,
+        "MYSQL_CONN",
+        type("Conn", (), {"create_new_connection": lambda self: conn})(),
+        raising=False,
+    )
+    return str(csv_file), loads
+
+
+def run_with_timeout(function, *args):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=function(*args)), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "stream_csv_to_db hung"
+    return result["value"]
+
+
+def test_failure_before_opening_the_pipe(stream, monkeypatch):
+    csv_file, loads = stream
+
+    def fail_open(*args, **kwargs):
+        raise OSError("Cannot open the derived output.")
+
+    monkeypatch.setattr(load_stream, "open_compressed", fail_open)
+
+    assert run_with_timeout(load_stream.stream_csv_to_db, csv_file) is None
+    assert loads == ["", "rollback"]
+
+
+def test_failure_while_transforming(stream, monkeypatch):
+    csv_file, loads = stream
+
+    def fail_transform(csv_file_path, table_name, output, derived_outputs):
+        output.write("header\n")
+        raise ValueError("Bad chunk.")
+
+    monkeypatch.setattr(load_stream, "write_transformed_csv", fail_transform)
+
+    assert run_with_timeout(load_stream.stream_csv_to_db, csv_file) is None
+    assert loads == ["header\n", "rollback"]
+
+
+@pytest.mark.parametrize(
+    "db_type, load_mode", [("mysql", "shadow"), ("mysql", "historical"), ("postgresql", "full")]
+)
+def test_unsupported_setups_are_rejected(db_type, load_mode, monkeypatch):
+    monkeypatch.setattr(load_stream, "DB_TYPE", db_type)
+    monkeypatch.setattr(load_stream, "LOAD_MODE", load_mode)
+
+    with pytest.raises(ValueError, match="streaming_load"):
+        load_stream.stream_data(["unused.csv"])
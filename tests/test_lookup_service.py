@@ -0,0 +1,170 @@
+import http.client
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import load.load_embedded as load_embedded
+import lookup.lookup_service as lookup_service
+
+CNPJ = "11111111000191"
+
+
+def test_record_cache():
+    cache = lookup_service.RecordCache(max_size=2, ttl=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts "b", the least recently used
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+    cache.put("a", 1, state=(1, "2024-01"))
+    assert cache.get("a", (1, "2024-01")) == 1
+    assert cache.get("a", (2, "2024-02")) is None
+    assert cache.get("a", (1, "2024-01")) is None  # dropped on the mismatch
+
+    expiring = lookup_service.RecordCache(max_size=2, ttl=0.05)
+    expiring.put("a", 1)
+    time.sleep(0.1)
+    assert expiring.get("a") is None
+    assert len(expiring) == 0
+
+
+def test_request_batcher():
+    batches = []
+    release = threading.Event()
+
+    def fetch(cnpjs):
+        release.wait(timeout=5)
+        batches.append(cnpjs)
+        if "failing" in cnpjs:
+            raise RuntimeError("database down")
+        return {cnpj: {"cnpj": cnpj} for cnpj in cnpjs if cnpj != "missing"}
+
+    batcher = lookup_service.RequestBatcher(fetch, batch_size=3, wait=1, workers=1)
+    futures = [batcher.submit(cnpj) for cnpj in ["a", "b", "a", "missing", "failing"]]
+    release.set()
+
+    assert [future.result(timeout=5) for future in futures[:3]] == [
+        {"cnpj": "a"},
+        {"cnpj": "b"},
+        {"cnpj": "a"},
+    ]
+    assert futures[3].exception(timeout=5) is futures[4].exception(timeout=5)
+    assert isinstance(futures[4].exception(), RuntimeError)
+    # The repeated CNPJ counts towards the batch size, but is fetched once
+    assert batches == [["a", "b"], ["missing", "failing"]]
+    assert (batcher.batches, batcher.batched) == (1, 2)
+
+
+class FakeService:
+    def lookup(self, cnpj):
+        if cnpj == "99999999999999":
+            raise RuntimeError("database down")
+        return {"cnpj": cnpj} if cnpj == CNPJ else None
+
+    def get_stats(self):
+        return {"requests": 1}
+
+
+@pytest.fixture
+def server():
+    server = lookup_service.ThreadingHTTPServer(("127.0.0.1", 0), lookup_service.LookupHandler)
+    server.daemon_threads = True
+    server.service = FakeService()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_handler(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+
+    def get(path):
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    # All on one persistent connection
+    assert get("/cnpj/11.111.111/0001-91") == (200, {"cnpj": CNPJ})
+    assert get(f"/cnpj/{CNPJ}?fields=all") == (200, {"cnpj": CNPJ})
+    assert get("/cnpj/22222222000191")[0] == 404
+    assert get("/cnpj/123")[0] == 400
+    assert get("/cnpj/abc")[0] == 404
+    assert get("/cnpj/99999999999999") == (500, {"error": "Lookup failed."})
+    assert get("/stats") == (200, {"requests": 1})
+    conn.close()
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    path = str(tmp_path / "lookup.sqlite")
+    monkeypatch.setattr(load_embedded, "DB_TYPE", "sqlite")
+    # Also written from the batcher thread, while the service reads
+    conn = sqlite3.connect(path, check_same_thread=False)
+    load_embedded.create_tables(conn)
+    conn.execute(
+        "INSERT INTO estabelecimento (cnpj_basico, cnpj_ordem, cnpj_dv, nome_fantasia) "
+        "VALUES ('11111111', '0001', '91', 'Antiga');"
+    )
+    conn.execute("INSERT INTO empresa (cnpj_basico, razao_social) VALUES ('11111111', 'Um');")
+    conn.commit()
+
+    monkeypatch.setattr(lookup_service, "DB_TYPE", "sqlite")
+    monkeypatch.setitem(lookup_service.SQL_ALCHEMY_URLS, "sqlite", f"sqlite:///{path}")
+    monkeypatch.setattr(lookup_service, "POOL_SIZE", 1)
+    monkeypatch.setattr(lookup_service, "BATCH_WAIT_SECONDS", 0)
+    yield conn
+    conn.close()
+
+
+def log_load(conn, month: str):
+    conn.execute(
+        "INSERT INTO load_log (selected_year_month, processed_at) "
+        f"VALUES ('{month}', '{month}-28 00:00:00');"
+    )
+    conn.commit()
+
+
+def test_service_without_loads(database, monkeypatch):
+    monkeypatch.setattr(lookup_service, "LOAD_MODE", "historical")
+    service = lookup_service.LookupService()
+
+    assert service.load_state == (0, None)
+    assert service.lookup(CNPJ) is None
+    assert service.get_stats()["month"] is None
+    service.pool.close_connection()
+
+
+def test_service_drops_records_of_older_loads(database, monkeypatch):
+    monkeypatch.setattr(lookup_service, "LOAD_MODE", "full")
+    log_load(database, "2024-01")
+    service = lookup_service.LookupService()
+    fetch = service.batcher.fetch
+
+    def fetch_then_load(cnpjs):
+        # A new month is loaded and recorded while the batch is in flight
+        records = fetch(cnpjs)
+        database.execute("UPDATE estabelecimento SET nome_fantasia = 'Nova';")
+        log_load(database, "2024-02")
+        service.check_load_log()
+        return records
+
+    service.batcher.fetch = fetch_then_load
+    record = service.lookup(CNPJ)
+    assert (record["month"], record["estabelecimento"]["nome_fantasia"]) == ("2024-01", "Antiga")
+    assert record["empresa"]["razao_social"] == "Um"
+
+    service.batcher.fetch = fetch
+    record = service.lookup(CNPJ)
+    assert (record["month"], record["estabelecimento"]["nome_fantasia"]) == ("2024-02", "Nova")
+    assert service.lookup(CNPJ) is record
+    assert service.cache.hits == 1
+    service.pool.close_connection()
@@ -0,0 +1,41 @@
+import threading
+
+import utils.profiling as profiling
+
+
+def test_concurrent_units(tmp_path, monkeypatch):
+    monkeypatch.setitem(profiling.config["settings"], "profile", True)
+    monkeypatch.setattr(profiling, "PROFILE_PATH", str(tmp_path))
+    started = threading.Barrier(2)
+    errors = []
+
+    def run(name: str):
+        try:
+            with profiling.profile_unit("transform", name):
+                profiling.sample_chunk(0)
+                with profiling.section("clean"):
+                    started.wait(timeout=5)
+                    sum(range(1000))
+                started.wait(timeout=5)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run, args=(f"file{i}.csv",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert len([name for name in files if name.endswith(".pstats")]) == 1
+    for i in range(2):
+        assert f"transform_file{i}.csv.folded" in files
+        assert f"transform_file{i}.csv.memory.txt" in files
+    assert profiling.profiler_thread is None
+    assert profiling.tracing_units == 0
+
+    # The profiler is free again for the next unit
+    with profiling.profile_unit("load", "next.csv"):
+        pass
+    assert (tmp_path / "load_next.csv.pstats").exists()
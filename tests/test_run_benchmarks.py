@@ -0,0 +1,29 @@
+import benchmark.run_benchmarks as run_benchmarks
+
+
+def test_compare(monkeypatch):
+    monkeypatch.setattr(run_benchmarks, "TOLERANCE", 0.2)
+    baseline = {"seconds": 10.0, "peak_rss_mb": 100.0}
+
+    within = {"seconds": 11.9, "peak_rss_mb": 80.0}
+    assert run_benchmarks.compare("load", within, baseline) == []
+    assert (within["seconds_change"], within["peak_rss_mb_change"]) == (0.19, -0.2)
+
+    over = {"seconds": 12.5, "peak_rss_mb": 130.0}
+    regressions = run_benchmarks.compare("load", over, baseline)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("load: seconds 12.5 is 25% over the baseline 10.0")
+    assert regressions[1].startswith("load: peak_rss_mb 130.0 is 30% over")
+
+
+def test_compare_skips_short_durations(monkeypatch):
+    monkeypatch.setattr(run_benchmarks, "TOLERANCE", 0.2)
+    short = run_benchmarks.MIN_COMPARED_SECONDS / 2
+
+    result = {"seconds": short * 10, "peak_rss_mb": 100.0}
+    assert run_benchmarks.compare("startup", result, {"seconds": short, "peak_rss_mb": 100.0}) == []
+    assert "seconds_change" not in result
+    assert result["peak_rss_mb_change"] == 0
+
+    # Metrics missing on either side are not compared
+    assert run_benchmarks.compare("export", {"seconds": 5.0}, {"peak_rss_mb": 1.0}) == []
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+
+from utils.database.conn import DRIVER_MODULES
+
+STARTUP_BUDGET = 3.0  # seconds to import main and the step modules
+
+# Imports main and the step modules with every socket connection failing, and reports the
+# time taken and the database drivers imported
+STARTUP_CODE = """
+import json, socket, sys, time
+def refuse_connect(sock, address):
+    raise OSError(f"Connection to {address} attempted at startup.")
+socket.socket.connect = refuse_connect
+start = time.perf_counter()
+import main
+import extract.extract_data, transform.transform_data, load.load_data
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "drivers": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def test_startup_is_lazy_and_fast():
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_CODE % DRIVER_MODULES],
+        env={**os.environ, "PYTHONPATH": "src"},
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    result = json.loads(output.splitlines()[-1])
+
+    assert result["drivers"] == []
+    assert result["seconds"] < STARTUP_BUDGET
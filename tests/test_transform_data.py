@@ -0,0 +1,19 @@
+import pandas as pd
+
+from transform.transform_data import enforce_dtypes
+
+
+def test_invalid_dates_become_null():
+    df = pd.DataFrame(
+        {"data": ["20240229", "20230229", "20241340", "00000000", "0", "", "20241231 "]}
+    )
+
+    assert enforce_dtypes(df, {"data": "date"})["data"].tolist() == [
+        "20240229",
+        r"\N",
+        r"\N",
+        r"\N",
+        r"\N",
+        r"\N",
+        "20241231",
+    ]
@@ -0,0 +1,119 @@
+import functools
+import multiprocessing
+import time
+
+import pytest
+
+import pipeline.queue_worker as queue_worker
+import pipeline.work_queue as work_queue
+from pipeline.work_queue import WorkQueue
+
+
+@pytest.fixture
+def queue_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "LEASE_SECONDS", 60)
+    monkeypatch.setattr(work_queue, "MAX_ATTEMPTS", 2)
+    return str(tmp_path / "work_queue.db")
+
+
+def get_status(queue: WorkQueue, item_id: int) -> str:
+    return queue.conn.execute(
+        "SELECT status FROM work_items WHERE id = ?", (item_id,)
+    ).fetchone()["status"]
+
+
+def test_items_are_leased_once_and_in_dependency_order(queue_path):
+    queue = WorkQueue(queue_path)
+    first = queue.add_item("2000-01", "transform", "a.csv")
+    second = queue.add_item("2000-01", "load", "a.csv", deps=[first])
+    assert queue.add_item("2000-01", "transform", "a.csv") == first
+
+    assert queue.claim("w1")["id"] == first
+    assert queue.claim("w2") is None  # the load waits for its transform
+
+    assert queue.complete(first, "w1")
+    assert queue.claim("w2")["id"] == second
+    assert not queue.complete(second, "w1")
+    assert queue.complete(second, "w2")
+    assert queue.count_unfinished() == 0
+
+
+def test_expired_lease_is_claimed_again(queue_path, monkeypatch):
+    queue = WorkQueue(queue_path)
+    item_id = queue.add_item("2000-01", "transform", "a.csv")
+
+    monkeypatch.setattr(work_queue, "LEASE_SECONDS", -1)  # leases expire at once
+    assert queue.claim("w1")["id"] == item_id
+    claimed = queue.claim("w2")
+    assert claimed["id"] == item_id and claimed["attempts"] == 2
+
+    assert not queue.heartbeat(item_id, "w1")
+    assert not queue.complete(item_id, "w1")
+    # The last allowed attempt expires too: the item fails
+    assert queue.claim("w3") is None
+    assert get_status(queue, item_id) == "failed"
+
+
+def test_release_retries_then_fails_and_cancels_dependents(queue_path):
+    queue = WorkQueue(queue_path)
+    item_id = queue.add_item("2000-01", "transform", "a.csv")
+    dependent = queue.add_item("2000-01", "load", "a.csv", deps=[item_id])
+    final = queue.add_item("2000-01", "finish", "load", deps=[dependent])
+
+    queue.claim("w1")
+    queue.release(item_id, "w1", "first error")
+    assert get_status(queue, item_id) == "pending"
+
+    queue.claim("w1")
+    queue.release(item_id, "w1", "second error")
+    assert get_status(queue, item_id) == "failed"
+    assert get_status(queue, dependent) == "cancelled"
+    assert get_status(queue, final) == "cancelled"
+    assert queue.count_unfinished() == 0
+
+
+def run_recorded_item(queue_path: str, item):
+    """Stands in for `queue_worker.run_item`: checks the dependencies are done, then works."""
+    queue = WorkQueue(queue_path)
+    pending_deps = queue.conn.execute(
+        "SELECT COUNT(*) FROM work_deps JOIN work_items ON work_items.id = work_deps.dep_id "
+        "WHERE work_deps.item_id = ? AND work_items.status != 'done'",
+        (item["id"],),
+    ).fetchone()[0]
+    queue.close()
+    if pending_deps:
+        raise Exception(f"Ran {item['name']} before its dependencies.")
+    time.sleep(0.05)
+
+
+def test_several_worker_processes_drain_the_queue(queue_path, monkeypatch):
+    queue = WorkQueue(queue_path)
+    transforms = [queue.add_item("2000-01", "transform", f"{n}.csv") for n in range(8)]
+    loads = [
+        queue.add_item("2000-01", "load", f"{n}.csv", deps=[transform_id])
+        for n, transform_id in enumerate(transforms)
+    ]
+    queue.add_item("2000-01", "finish", "load", deps=loads)
+
+    monkeypatch.setattr(queue_worker, "WorkQueue", functools.partial(WorkQueue, queue_path))
+    monkeypatch.setattr(queue_worker, "POLL_INTERVAL", 0.05)
+    monkeypatch.setattr(
+        queue_worker, "run_item", functools.partial(run_recorded_item, queue_path)
+    )
+    monkeypatch.setattr(queue_worker.METRICS, "write_report", lambda **kwargs: None)
+
+    # Forked, so the workers inherit the stand-ins above
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=queue_worker.run_worker, args=(f"w{n}",)) for n in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+        assert worker.exitcode == 0
+
+    items = queue.conn.execute("SELECT status, worker, attempts FROM work_items").fetchall()
+    assert [item["status"] for item in items] == ["done"] * 17
+    assert all(item["attempts"] == 1 for item in items)
+    assert {item["worker"] for item in items} == {"w0", "w1"}